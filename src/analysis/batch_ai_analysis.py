@@ -9,7 +9,8 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 sys.path.append(project_root)
 
-from src.database.utils import create_connection
+from src.database import queries
+from src.database.utils import create_connection, add_new_tags_to_mapping
 from src.analysis.ai_analysis_helper_functions import construct_prompt, process_route_response, save_analysis_results
 
 def get_system_prompt():
@@ -203,6 +204,7 @@ def process_batch_results(batch_id: str):
         print(f"Processing results from: {results_file}")
         processed_count = 0
         failed_count = 0
+        processed_route_ids = []
 
         with create_connection() as conn:
             cursor = conn.cursor()
@@ -226,6 +228,7 @@ def process_batch_results(batch_id: str):
                             save_analysis_results(cursor, processed_result)
                             conn.commit()
                             processed_count += 1
+                            processed_route_ids.append(processed_result['route_id'])
                             print(
                                 f"Processed and saved analysis for route {processed_result['route_id']}")
                     except Exception as e:
@@ -234,6 +237,11 @@ def process_batch_results(batch_id: str):
                         conn.rollback()
                         continue
 
+            if processed_route_ids:
+                add_new_tags_to_mapping(cursor)
+                queries.refresh_route_tags(cursor, processed_route_ids)
+                conn.commit()
+
             print(
                 f"\nProcessing complete. Processed: {processed_count}, Failed: {failed_count}")
 
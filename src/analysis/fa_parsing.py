@@ -1,5 +1,12 @@
-import re
+from functools import lru_cache
 import pandas as pd
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(project_root)
+
+from src.analysis import patterns
 
 
 def parse_section(section, ascent_type, date_patterns,
@@ -9,18 +16,18 @@ def parse_section(section, ascent_type, date_patterns,
 
     year = None
 
-    full_year_match = re.search(r'\b(?:18|19|20)\d{2}\b', section)
+    full_year_match = patterns.FULL_YEAR.search(section)
     if full_year_match:
         year = full_year_match.group()
-        section = re.sub(full_year_match.group(), '', section)
+        section = section.replace(year, '')
     else:
         # Try date patterns if no full year found
         for pattern in date_patterns:
-            date_match = re.search(pattern, section)
+            date_match = pattern.search(section)
             if date_match:
                 date_str = date_match.group()
                 # Extract year from the end of the date string
-                year = re.search(r'(?:18|19|20)?\d{2,4}$', date_str).group()
+                year = patterns.TRAILING_YEAR.search(date_str).group()
 
                 # Handle 2-digit vs 4-digit years
                 if len(year) == 2:
@@ -29,19 +36,18 @@ def parse_section(section, ascent_type, date_patterns,
                 elif len(year) == 4:
                     year = year
 
-                section = re.sub(pattern, '', section)
+                section = pattern.sub('', section)
                 break
 
         # Try year pattern if no date found
         if not year:
-            year_match = re.search(year_pattern, section)
+            year_match = year_pattern.search(section)
             if year_match:
                 # Get the full match including any decade suffix
                 full_match = year_match.group()
                 year = clean_year(full_match)
                 # Remove the entire match from the section
-                matched_text = re.escape(full_match)
-                section = re.sub(f'{matched_text}', '', section).strip()
+                section = section.replace(full_match, '').strip()
     # Process names
     for name in process_names(section):
         cleaned_name = clean_name(name)
@@ -68,30 +74,12 @@ def parse_fa_data(fa_string) -> list[dict]:
     results = []
     fa_string = fa_string.lower()
 
-    # Define patterns
-    date_patterns = [
-        # Full dates: MM/DD/YY or MM-DD-YY
-        r'\d{1,2}[-/]\d{1,2}[-/](?:18|19|20)?\d{2}',
-        # Month/Year: MM/YY or MM/YYYY
-        r'\d{1,2}[-/](?:18|19|20)?\d{2}',
-        r'\d{1,2}[-/]\d{4}',                           # Month/Year: MM/YYYY
-    ]
-    # Simplified year pattern that includes decade suffix and 1800s
-    year_pattern = r'(?:18|19|20)?\d{2,4}(?:\'s|s)?'
-
-    ascent_types = [
-        ('ffa', 'FFA'),  # First Free Ascent
-        ('fca', 'FCA'),  # First Clean Ascent
-        ('fa', 'FA'),    # First Ascent
-    ]
+    date_patterns = patterns.FA_DATE_PATTERNS
+    year_pattern = patterns.FA_YEAR
 
     remaining_text = fa_string
-    for search_type, result_type in ascent_types:
-        sections = re.split(
-            rf'{search_type}\W*',
-            remaining_text,
-            maxsplit=1,
-            flags=re.IGNORECASE)
+    for split_pattern, result_type in patterns.ASCENT_TYPE_SPLITS:
+        sections = split_pattern.split(remaining_text, maxsplit=1)
         if len(sections) > 1:
             results.extend(
                 parse_section(
@@ -111,6 +99,21 @@ def parse_fa_data(fa_string) -> list[dict]:
     return results
 
 
+def parse_fa_batch(fa_strings) -> list[list[dict]]:
+    """
+    Parse many FA strings at once, returning one result list per input.
+    Identical strings (common across routes in the same area) are only parsed once.
+    """
+    parsed = {}
+    results = []
+    for fa_string in fa_strings:
+        key = None if not fa_string or pd.isna(fa_string) else fa_string
+        if key not in parsed:
+            parsed[key] = parse_fa_data(key)
+        results.append([dict(row) for row in parsed[key]])
+    return results
+
+
 def clean_year(year_str):
     """Clean and standardize year format"""
     if not year_str:
@@ -120,25 +123,23 @@ def clean_year(year_str):
         # check if it's a decade (ends with 's or s)
         if year_str.lower().endswith('s') or year_str.lower().endswith("'s"):
             # Extract base year
-            base_year = re.search(
-                r'(?:18|19|20)?\d{2}|\d{4}',
-                year_str).group()
+            base_year = patterns.DECADE_BASE_YEAR.search(year_str).group()
             if len(base_year) == 2:
                 base_year = f"19{base_year}"
             # Return middle of decade (1950s = 1965)
             return str(int(base_year) + 5)
 
         # Handle 4-digit years
-        if re.match(r'^\d{4}$', year_str):
+        if patterns.FOUR_DIGIT_YEAR.match(year_str):
             return year_str
 
         # Handle 2-digit years - but prefer full year if available
-        full_year_match = re.search(r'(?:18|19|20)\d{2}', year_str)
+        full_year_match = patterns.CENTURY_YEAR.search(year_str)
         if full_year_match:
             return full_year_match.group()
 
         # If only 2 digits, assume 19xx unless specified otherwise
-        year_match = re.search(r'\d{2}', year_str)
+        year_match = patterns.TWO_DIGITS.search(year_str)
         if year_match:
             year_num = int(year_match.group())
             return f"20{year_num}" if year_num < 50 else f"19{year_num}"
@@ -150,55 +151,24 @@ def clean_year(year_str):
         return None
 
 
+@lru_cache(maxsize=65536)
 def clean_name(name):
     """Clean and standardize climber names"""
     # Remove leading/trailing punctuation
-    name = re.sub(r'^[\W_]+|[\W_]+$', '', name)
+    name = patterns.EDGE_PUNCTUATION.sub('', name)
 
     # Remove common noise words and patterns
-    noise_patterns = [
-        r'\b(?:and|with)\b',
-        r'\b(?:trad|sport|mixed|aid|free|solo|1st|first|then|bolted)\b',
-        r'\b(?:gear|now|retrobolted)\b',
-        r'\b(?:or earlier|or later)\b',
-        r'\b(?:did|the|ascent|first|free|ascent)\b',
-        r'\b(?:company|partner|partners)\b',
-        r'\b(?:lead|leads|leader|leading|led)\b',
-        r'\b(?:original|originally)\b',
-        r'\b(?:1st|first)\b',
-        r'(?:P|p)\d+(?:[-:]|\s+[-:]|\s*[.:])\s*',
-        r'(?:P|p)\d+[-\s]*[-–]\s*(?:P|p)?\d+[-:]?\s*[.:]?\s*',
-        r'(?:^|\s*\.?\s*)(?:P|p)?\d+[-:]?\s*[.:]',
-        r'(?:^|\s*\.?\s*)(?:P|p)?\d+[-\s]*[-–]\s*\d+[-:]?\s*[.:]?',
-        r'(?:^|\s*\.?\s*)(?:P|p)?\d+(?:[-:]|\s+[-:]|\s*[.:])\s*',
-        r'\.\s*\d+[-:]?\s*[.:]',
-        r'\d{1,2}[-/]\d{1,2}[-/](?:20)?\d{2}',
-        r'\d{1,2}/\d{1,2}(?:/\d{2,4})?',
-        r'\b(?:january|february|march|april|may|june|july|august|september|october|november|december)\b(?:\s+(?:\d{1,4}|early|late|mid|spring|summer|fall|winter)|\s*$)',
-        r'\b(?:jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec)\b(?:\s+(?:\d{1,4}|early|late|mid|spring|summer|fall|winter)|\s*$)',
-        r'\b(?:spring|summer|fall|winter)\b',
-        r'\b(?:early|late|mid)\b',
-        r'\b(?:circa|c\.|ca\.|approximately|approx\.)\b',
-        r'\b(?:unknown|various)\b',
-        r'\b(?:et\.? al\.?)\b',
-        r'\b(?:did the first free ascent)\b',
-        r'\b(?:ffa|fa)\b',
-        r'\b(?:on|in|at|by|the)\b',
-        r'\b\d{4}\b',
-        r'\?',
-    ]
-
-    for pattern in noise_patterns:
-        name = re.sub(pattern, '', name, flags=re.IGNORECASE)
+    for pattern in patterns.NAME_NOISE_PATTERNS:
+        name = pattern.sub('', name)
 
     # Clean up any remaining artifacts
-    name = re.sub(r'\s+', ' ', name)
+    name = patterns.WHITESPACE_RUN.sub(' ', name)
     name = name.strip()
 
     # Skip if only numbers/spaces/symbols remain or if it's a generic term
     if (not name or
-        re.match(r'^[\d\s\W]+$', name) or
-            name.lower() in ['company', 'partner', 'partners', 'lead', 'original']):
+        patterns.NO_LETTERS.match(name) or
+            name.lower() in patterns.GENERIC_NAMES):
         return ""
 
     name = ' '.join(word.capitalize() for word in name.split())
@@ -210,7 +180,7 @@ def process_names(section):
     name_pairs = []
     # Split on commas, forward slashes, and dashes first
     # Split on /, comma, and standalone dashes
-    parts = re.split(r'[,/]|-(?!\w)', section)
+    parts = patterns.NAME_SPLIT.split(section)
     parts = [p.strip() for p in parts if p.strip()]
 
     for part in parts:
@@ -246,7 +216,7 @@ def process_names(section):
                     name_pairs.append(f"{first2} {last_name}")
                     continue
 
-            names = re.split(r'\s+(?:and|&)\s+', part, flags=re.IGNORECASE)
+            names = patterns.NAME_CONNECTOR_SPLIT.split(part)
             name_pairs.extend(names)
         else:
             name_pairs.append(part)
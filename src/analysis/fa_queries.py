@@ -1,4 +1,4 @@
-from src.analysis.filters_ctes import add_user_filter, add_fa_name_filter, get_deduped_ticks_cte
+from src.analysis.filters_ctes import add_user_filter, add_fa_name_filter, get_deduped_ticks_cte, metric_params
 import os
 import sys
 
@@ -23,7 +23,7 @@ def get_top_first_ascensionists(
     ORDER BY fa_count desc
     LIMIT 10
     """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id, year_start, year_end))
     return result.values.tolist()
 
 
@@ -60,7 +60,7 @@ def get_first_ascensionist_by_decade(
     GROUP BY FLOOR(fa.year::int/10)*10
     ORDER BY decade
     """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id, year_start, year_end, fa_name=name))
     return result.values.tolist()
 
 
@@ -85,7 +85,7 @@ def get_first_ascensionist_areas(
     ORDER BY fa_count DESC
     LIMIT 10
     """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id, year_start, year_end, fa_name=name))
     return result.values.tolist()
 
 
@@ -110,7 +110,7 @@ def get_first_ascensionist_grades(
     GROUP BY r.yds_rating
     ORDER BY count(*) desc
     """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id, year_start, year_end, fa_name=name))
     return result.values.tolist()
 
 
@@ -168,7 +168,7 @@ def get_collaborative_ascensionists(
         ORDER BY partnership_count DESC
         LIMIT 10;
         """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id, year_start, year_end, fa_name=name))
     return result.values.tolist()
 
 
@@ -196,7 +196,7 @@ def get_fa_routes(conn, fa_name, user_id, year_start=None, year_end=None):
     {add_user_filter(user_id, table_alias='t')}
     ORDER BY r.avg_stars DESC
     """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id, year_start, year_end, fa_name=fa_name))
     return result.values.tolist()
 
 
@@ -234,10 +234,10 @@ def get_partnership_routes(conn, fa_name, partner_name,
     JOIN analysis.fa fa1 ON r.id = fa1.route_id
     JOIN analysis.fa fa2 ON r.id = fa2.route_id
     JOIN deduped_ticks t on t.route_id = r.id
-    WHERE fa1.fa_name = '{fa_name.replace("'", "''")}'
-    AND fa2.fa_name = '{partner_name.replace("'", "''")}'
+    WHERE fa1.fa_name = :fa_name
+    AND fa2.fa_name = :partner_name
     AND fa1.fa_type = fa2.fa_type
-    AND t.user_id = '{user_id}'
+    AND t.user_id = :user_id
     ORDER BY r.avg_stars DESC
     """
-    return conn.query(query).values.tolist()
+    return conn.query(query, params=metric_params(user_id, year_start, year_end, fa_name=fa_name, partner_name=partner_name)).values.tolist()
@@ -1,23 +1,18 @@
 import pandas as pd
+from src.analysis.grades import ROUTE_TYPE_FLAGS
 
-estimated_lengths_cte = f"""
+# Estimates are maintained in routes.route_estimates by database.queries.refresh_route_estimates
+estimated_lengths_cte = """
         WITH estimated_lengths AS (
-        SELECT  id,
-                CASE WHEN route_type ILIKE '%trad%' AND length_ft IS NULL AND pitches IS NULL -- trad single-pitch
-                    THEN (SELECT avg(length_ft) FROM routes.Routes r WHERE route_type ILIKE '%trad%'AND length_ft IS NOT NULL and pitches IS NULL AND length_ft < 230) -- avg single-pitch trad pitch length
-                    WHEN route_type ILIKE '%trad%' AND length_ft IS NULL AND pitches IS NOT NULL -- trad multipitch
-                    THEN (SELECT avg(length_ft/ pitches) FROM routes.Routes r WHERE route_type ILIKE '%trad%' AND length_ft IS NOT NULL and pitches IS NOT NULL) * pitches
-                    WHEN route_type ILIKE '%sport%' AND length_ft IS NULL AND pitches IS NOT NULL -- sport single-pitch
-                    THEN (SELECT avg(length_ft) FROM routes.Routes r WHERE route_type ILIKE '%sport%'AND length_ft IS NOT NULL and pitches IS NULL AND length_ft < 230) -- avg single-pitch sport pitch length
-                    WHEN route_type ILIKE '%sport%' AND length_ft IS NULL AND pitches IS NOT NULL -- sport multipitch
-                    THEN (SELECT avg(length_ft/ pitches) FROM routes.Routes r WHERE route_type ILIKE '%sport%' AND length_ft IS NOT NULL and pitches IS NOT NULL) * pitches
-                    WHEN route_type ILIKE '%boulder%' AND length_ft IS NULL
-                    THEN (SELECT avg(length_ft) FROM routes.Routes r WHERE route_type ILIKE '%boulder%' AND length_ft IS NOT NULL) -- boulder
-                    WHEN route_type ILIKE '%aid%' AND length_ft IS NULL AND pitches IS NOT NULL -- aid multipitch
-                    THEN (SELECT avg(length_ft/ pitches) FROM routes.Routes r WHERE route_type ILIKE '%aid%' AND length_ft IS NOT NULL and pitches IS NOT NULL) * pitches
-                    ELSE (SELECT avg(length_ft) FROM routes.Routes r WHERE route_type ILIKE '%trad%'AND length_ft IS NOT NULL and pitches IS NULL AND length_ft < 230)
-                END AS estimated_length
-        FROM routes.Routes
+        SELECT route_id AS id, estimated_length
+        FROM routes.route_estimates
+        )
+        """
+
+estimated_pitches_cte = """
+        estimated_pitches AS (
+        SELECT route_id AS id, estimated_pitches
+        FROM routes.route_estimates
         )
         """
 
@@ -39,13 +34,37 @@ def get_pitch_preference_lengths(pitch_preference):
             END"""
 
 
-def get_deduped_ticks_cte(user_id=None, year_start=2000, year_end=2100):
+def metric_params(user_id=None, year_start=None, year_end=None, route_types=None,
+                  fa_name=None, **extra):
+    """
+    Bind parameters for the :name placeholders the filter helpers below emit.
+    Filters only change statement text by being present or absent, so every user
+    and year shares the same statement (and its cached plan).
+    """
+    params = {
+        'user_id': user_id,
+        'year_start': year_start,
+        'year_end': year_end,
+        'route_type_patterns': [f'%{route_type}%' for route_type in route_types or []]
+    }
+    if fa_name and " & " in str(fa_name):
+        params['fa_name_1'], params['fa_name_2'] = fa_name.split(" & ")
+    else:
+        params['fa_name'] = fa_name
+    params.update(extra)
+    # numpy scalars (years from DataFrames) can't be adapted by psycopg2
+    return {key: value.item() if hasattr(value, 'item') and not isinstance(value, (list, tuple)) else value
+            for key, value in params.items()}
+
+
+def get_deduped_ticks_cte(user_id=None, year_start=None, year_end=None):
     deduped_ticks_cte = f"""
         WITH deduped_ticks_base AS(
                 SELECT *,
                 ROW_NUMBER() OVER (PARTITION BY route_id ORDER BY date DESC) as rn
                 FROM routes.Ticks t
-                {year_filter(year_range=(year_start, year_end), use_where=True)}
+                WHERE 1=1
+                {year_filter(year_range=(year_start, year_end), use_where=False)}
                 {add_user_filter(user_id)}
             ),
         deduped_ticks AS (
@@ -56,32 +75,33 @@ def get_deduped_ticks_cte(user_id=None, year_start=2000, year_end=2100):
     return deduped_ticks_cte
 
 
-def route_type_filter(route_types):
-    if route_types:
-        type_conditions = []
-        for route_type in route_types:
-            type_conditions.append(f"r.route_type ILIKE '%{route_type}%'")
-        type_filter = f"AND ({' OR '.join(type_conditions)})"
-    else:
-        type_filter = ''
-    return type_filter
+def route_type_filter(route_types, table_alias='r'):
+    """Match any of route_types, using the routes.Routes type flags when every type has one"""
+    if not route_types:
+        return ''
+    flag_columns = [f"is_{route_type.lower()}" for route_type in route_types]
+    if all(column in ROUTE_TYPE_FLAGS or column == 'is_tr' for column in flag_columns):
+        return f"AND ({' OR '.join(f'{table_alias}.{column}' for column in flag_columns)})"
+    return f"AND {table_alias}.route_type ILIKE ANY(:route_type_patterns)"
 
 
 def year_filter(year=None, year_range=None, use_where=True, table_alias='t'):
-    if not year and not year_range:
-        return ''
-
     prefix = 'WHERE' if use_where else 'AND'
 
+    if year_range and all(value is None for value in year_range):
+        year_range = None
+    if not year and not year_range:
+        # Callers chain AND filters after a use_where filter, so it still has to open the WHERE
+        return 'WHERE TRUE' if use_where else ''
+
     if year_range:
-        start_year, end_year = year_range
-        return f"{prefix} EXTRACT(YEAR FROM {table_alias}.date) BETWEEN {start_year} AND {end_year}"
+        return f"{prefix} EXTRACT(YEAR FROM {table_alias}.date) BETWEEN :year_start AND :year_end"
     else:
-        return f"{prefix} EXTRACT(YEAR FROM {table_alias}.date) = {year}"
+        return f"{prefix} EXTRACT(YEAR FROM {table_alias}.date) = :year"
 
 
 def add_user_filter(user_id, table_alias='t'):
-    return f"AND {table_alias}.user_id = '{user_id}'"
+    return f"AND {table_alias}.user_id = :user_id"
 
 
 def add_fa_name_filter(fa_name, use_where=False, table_alias='fa'):
@@ -91,43 +111,58 @@ def add_fa_name_filter(fa_name, use_where=False, table_alias='fa'):
     prefix = 'WHERE' if use_where else 'AND'
 
     if " & " in str(fa_name):
-        climber1, climber2 = fa_name.split(" & ")
-        # Escape single quotes in names
-        climber1 = climber1.replace("'", "''")
-        climber2 = climber2.replace("'", "''")
         return f"""
         {prefix} {table_alias}.route_id IN (
             SELECT a1.route_id
             FROM analysis.fa a1
             JOIN analysis.fa a2 ON a1.route_id = a2.route_id
             WHERE a1.fa_type = a2.fa_type
-            AND a1.fa_name = '{climber1}'
-            AND a2.fa_name = '{climber2}'
+            AND a1.fa_name = :fa_name_1
+            AND a2.fa_name = :fa_name_2
         )
         """
-    fa_name = fa_name.replace("'", "''")
-    return f"{prefix} {table_alias}.fa_name = '{fa_name}'"
+    return f"{prefix} {table_alias}.fa_name = :fa_name"
+
+
+def tag_selection_filter(tag_selections):
+    """
+    Condition requiring every selected tag, plus its bind parameters. Matches against
+    analysis.route_tag_index (GIN indexed), so it belongs in the WHERE clause.
+    """
+    tag_keys = [
+        f"{tag_type}:{tag}"  # same key format as queries.refresh_route_tags
+        for tag_type, selected_tags in (tag_selections or {}).items()
+        for tag in selected_tags or []
+    ]
+    if not tag_keys:
+        return "", {}
+    tag_filter = """
+    AND r.id IN (
+        SELECT route_id FROM analysis.route_tag_index
+        WHERE tag_keys @> CAST(:tag_keys AS text[])
+    )"""
+    return tag_filter, {'tag_keys': tag_keys}
 
 
 def available_years(conn, user_id):
-    years_query = f"""
+    years_query = """
     SELECT DISTINCT EXTRACT(YEAR FROM date)::int as year
     FROM routes.Ticks
-    WHERE user_id = '{user_id}'
+    WHERE user_id = :user_id
     and length(EXTRACT(YEAR FROM date)::text) = 4
     ORDER BY year
     """
-    available_years_df = conn.query(years_query)
+    available_years_df = conn.query(years_query, params=metric_params(user_id))
     years_df = pd.DataFrame({'date': pd.to_datetime(
         available_years_df['year'], format='%Y')})
     return years_df
 
 
 def add_grade_filter(grade_system, grade_range):
+    """Expects min_grade and max_grade in the query params"""
     if not grade_system or not grade_range:
         return ""
 
-    min_grade, max_grade = grade_range
     grade_column = {
         'YDS': 'r.yds_rating',
         'Boulder': 'r.hueco_rating',
@@ -136,25 +171,49 @@ def add_grade_filter(grade_system, grade_range):
 
     return f"""
     AND {grade_column} IS NOT NULL
-    AND {grade_column} BETWEEN '{min_grade}' AND '{max_grade}'
+    AND {grade_column} BETWEEN :min_grade AND :max_grade
     """
 
 
 def fa_year_filter(fa_year_start, fa_year_end):
+    """Expects fa_year_start and fa_year_end in the query params"""
     if fa_year_start is None and fa_year_end is None:
         return ""  # No year filter, return all routes including NULL years
 
     if fa_year_start and fa_year_end:
-        return f"""
-            AND fa.year BETWEEN {fa_year_start} AND {fa_year_end}
+        return """
+            AND fa.year BETWEEN :fa_year_start AND :fa_year_end
         """
     elif fa_year_start:
-        return f"""
-            AND fa.year >= {fa_year_start}
+        return """
+            AND fa.year >= :fa_year_start
         """
     elif fa_year_end:
-        return f"""
-            AND fa.year <= {fa_year_end}
+        return """
+            AND fa.year <= :fa_year_end
         """
 
     return ""
+
+
+def user_stats_filter(conn, user_id, year_start=None, year_end=None):
+    """
+    WHERE clause for the analysis.user_stats row covering year_start..year_end,
+    or None when the user has no rollup yet or the range isn't a single row.
+    Run it with metric_params(user_id, year_start, year_end).
+    """
+    rollup = conn.query("""
+    SELECT EXTRACT(YEAR FROM first_date)::int as first_year,
+           EXTRACT(YEAR FROM last_date)::int as last_year
+    FROM analysis.user_stats
+    WHERE user_id = :user_id AND grain = 'all'
+    """, params=metric_params(user_id))
+    if rollup.empty:
+        return None
+
+    first_year, last_year = rollup.iloc[0]['first_year'], rollup.iloc[0]['last_year']
+    if (year_start is None or year_start <= first_year) and (year_end is None or year_end >= last_year):
+        return "WHERE user_id = :user_id AND grain = 'all'"
+    if year_start is not None and year_start == year_end:
+        return "WHERE user_id = :user_id AND grain = 'year' AND year = :year_start"
+    return None
@@ -0,0 +1,281 @@
+import pandas as pd
+
+# Route types with a boolean flag column on routes.Routes; matched the same way as
+# route_type ILIKE '%trad%'. TR is matched as a whole entry since 'tr' is inside 'trad'.
+ROUTE_TYPE_FLAGS = {
+    'is_trad': 'trad',
+    'is_sport': 'sport',
+    'is_boulder': 'boulder',
+    'is_aid': 'aid',
+    'is_alpine': 'alpine'
+}
+
+# First match wins, in the same order the metric queries have always classified routes
+PRIMARY_ROUTE_TYPES = ['Alpine', 'Aid', 'Trad', 'Sport', 'TR', 'Boulder']
+
+
+def get_grade_group(grade: str, level: str = 'base') -> str:
+    if grade.startswith('V'):
+        return grade
+    if grade.startswith('A') or grade.startswith('C'):
+        return grade
+
+    if grade.startswith('5.'):
+        grade_prefix = '5.'
+        cleaned_grade = grade.replace('5.', '')
+    else:
+        return grade
+
+    if len(cleaned_grade) == 1:  # e.g. 5.9
+        base_grade = cleaned_grade
+        grade_suffix = None
+    elif cleaned_grade[1].isdigit():  # e.g. 5.10 or 5.10a
+        base_grade = cleaned_grade[:2]
+        if len(cleaned_grade) == 3:
+            grade_suffix = cleaned_grade[2]
+        else:
+            grade_suffix = None
+    else:  # e.g. 5.9+
+        base_grade = cleaned_grade[0]
+        grade_suffix = cleaned_grade[1]
+
+    if level == 'base':
+        return f'{grade_prefix}{base_grade}'
+    elif level == 'granular':
+        if grade_suffix in ['a', 'b', '-']:
+            return f'{grade_prefix}{base_grade}-'
+        if grade_suffix in ['c', 'd', '+']:
+            return f'{grade_prefix}{base_grade}+'
+        else:
+            return f'{grade_prefix}{base_grade}'
+    else:
+        return grade
+
+
+def grade_sort_key(grade):
+    # Handle V grades
+    if grade.startswith('V'):
+        if grade == 'V-easy':
+            return (1000, -1, 2)  # Sort below V0
+
+        grade = grade[1:]  # Remove 'V' prefix
+        base_part = ''
+        modifier = ''
+
+        # Handle range grades (V0-1, V2-3, etc) and modifiers
+        if '-' in grade:
+            parts = grade.split('-')
+            try:
+                # Handle ranges like V0-1
+                if len(parts) == 2 and parts[1].isdigit():
+                    base_grade = int(parts[0])
+                    return (1000, base_grade, 2.5)
+                # Handle minus modifier (V1-)
+                elif parts[1] == '':
+                    base_grade = int(parts[0])
+                    return (1000, base_grade, 1)
+            except ValueError:
+                return (1000, 0, 0)
+
+        # Handle plus grades and plain grades
+        if '+' in grade:
+            try:
+                base_grade = int(grade.replace('+', ''))
+                return (1000, base_grade, 3)
+            except ValueError:
+                return (1000, 0, 0)
+
+        # Plain V grade
+        try:
+            base_grade = int(grade)
+            return (1000, base_grade, 2)
+        except ValueError:
+            return (1000, 0, 0)
+
+    if grade.startswith('A') or grade.startswith('C'):
+        base_part = ''
+        modifier = ''
+
+        # Get the prefix (A or C)
+        prefix = grade[0]
+
+        # Skip the A or C prefix
+        grade = grade[1:]
+
+        # Extract base grade and modifier
+        for i, char in enumerate(grade):
+            if char.isdigit():
+                base_part += char
+            else:
+                modifier = grade[i:]
+                break
+
+        try:
+            base_grade = int(base_part)
+
+            # Aid grade modifier values
+            aid_modifier_values = {
+                '-': 1,
+                '': 2,
+                '+': 3
+            }
+
+            modifier_val = aid_modifier_values.get(modifier, 2)
+            # A harder than C
+            prefix_value = 3000 if prefix == 'A' else 2000
+
+            return (prefix_value, base_grade, modifier_val)
+        except ValueError:
+            return (2000, 0, 0)
+
+    # YDS grades
+    if grade.startswith('5.'):
+        cleaned_grade = grade.replace('5.', '')
+
+        if len(cleaned_grade) == 1:  # e.g. 5.9
+            return (100, int(cleaned_grade), 0)
+
+        # Grades with letters or modifiers
+        base_part = ''
+        modifier = ''
+
+        # Get base grade
+        for i, char in enumerate(cleaned_grade):
+            if char.isdigit():
+                base_part += char
+            else:
+                modifier = cleaned_grade[i:]
+                break
+
+        base_grade = int(base_part)
+
+        # Order modifiers: -, a, b, c, d, +
+        modifier_values = {
+            '-': 1,
+            'a': 2,
+            'a/b': 2.5,
+            'b': 3,
+            'b/c': 4,
+            '': 4,
+            'c': 5,
+            'c/d': 5.5,
+            'd': 6,
+            '+': 7
+        }
+
+        modifier_val = modifier_values.get(modifier.lower(), 0)
+        return (100, base_grade, modifier_val)
+
+    return (0, 0, 0)
+
+
+def route_type_flags(route_type):
+    route_type = (route_type or '').lower()
+    entries = [entry.strip() for entry in route_type.split(',')]
+    flags = {column: key in route_type for column, key in ROUTE_TYPE_FLAGS.items()}
+    flags['is_tr'] = 'tr' in entries
+    return flags
+
+
+def primary_route_type(route_type):
+    flags = route_type_flags(route_type)
+    for primary_type in PRIMARY_ROUTE_TYPES:
+        if flags[f'is_{primary_type.lower()}']:
+            return primary_type
+    return 'Other'
+
+
+def route_grade(route_type, yds_rating, hueco_rating, aid_rating):
+    """The grade the metrics chart a route by: V grade for boulders, aid grade for aid, else YDS"""
+    flags = route_type_flags(route_type)
+    if flags['is_boulder']:
+        return hueco_rating
+    if flags['is_aid']:
+        return aid_rating
+    return yds_rating
+
+
+def grade_sort_value(grade):
+    """grade_sort_key flattened to one integer with the same ordering; None if it can't be parsed"""
+    if not grade:
+        return None
+    try:
+        system, base_grade, modifier = grade_sort_key(grade)
+    except (ValueError, IndexError):
+        return None
+    if system == 0:
+        return None
+    # base_grade is -1 for V-easy, and every base grade and modifier*10 is below 100
+    return system * 10000 + (base_grade + 1) * 100 + round(modifier * 10)
+
+
+def safe_grade_group(grade, level):
+    if not grade:
+        return None
+    try:
+        return get_grade_group(grade, level)
+    except (ValueError, IndexError):
+        return None
+
+
+def route_grade_columns(route):
+    """Derived type and grade columns for a routes.Routes row, computed at insert and by the backfill"""
+    grade = route_grade(route.get('route_type'), route.get('yds_rating'),
+                        route.get('hueco_rating'), route.get('aid_rating'))
+    return {
+        'primary_type': primary_route_type(route.get('route_type')),
+        **route_type_flags(route.get('route_type')),
+        'route_grade': grade,
+        'grade_sort_value': grade_sort_value(grade),
+        'grade_group_base': safe_grade_group(grade, 'base'),
+        'grade_group_granular': safe_grade_group(grade, 'granular')
+    }
+
+
+def known_grades():
+    """Every YDS, V and aid grade string Mountain Project uses"""
+    grades = [f'5.{base}{suffix}' for base in range(0, 10) for suffix in ['-', '', '+']]
+    grades += [f'5.{base}{suffix}' for base in range(10, 16)
+               for suffix in ['-', 'a', 'a/b', 'b', 'b/c', '', 'c', 'c/d', 'd', '+']]
+    grades += ['V-easy'] + [f'V{base}{suffix}' for base in range(0, 18) for suffix in ['-', '', '+']]
+    grades += [f'V{base}-{base + 1}' for base in range(0, 17)]
+    grades += [f'{prefix}{base}{suffix}' for prefix in ['C', 'A']
+               for base in range(0, 6) for suffix in ['-', '', '+']]
+    return grades
+
+
+def build_grade_lookup(grades):
+    """One row per grade string: its sort value and base/granular groups"""
+    grades = list(dict.fromkeys(grades))
+    return pd.DataFrame({
+        'sort_value': [grade_sort_value(grade) for grade in grades],
+        'base': [safe_grade_group(grade, 'base') for grade in grades],
+        'granular': [safe_grade_group(grade, 'granular') for grade in grades]
+    }, index=pd.Index(grades, name='grade')).astype({'sort_value': 'Int64'})
+
+
+GRADE_LOOKUP = build_grade_lookup(known_grades())
+
+
+def lookup_grades(grades):
+    """
+    GRADE_LOOKUP rows aligned with a Series of grade strings.
+    Grades outside the table are parsed once per distinct value.
+    """
+    unknown = [grade for grade in pd.unique(grades.dropna()) if grade not in GRADE_LOOKUP.index]
+    lookup = pd.concat([GRADE_LOOKUP, build_grade_lookup(unknown)]) if unknown else GRADE_LOOKUP
+    return lookup.reindex(grades.to_numpy()).set_axis(grades.index)
+
+
+def group_grades(grades, level='base'):
+    """Vectorized get_grade_group; any other level returns the grades unchanged"""
+    if level not in ('base', 'granular'):
+        return grades
+    return lookup_grades(grades)[level].fillna(grades)
+
+
+def sort_grades(grades):
+    """Sorted like sorted(grades, key=grade_sort_key); unparseable grades first"""
+    grades = pd.Series(list(grades), dtype=object)
+    order = lookup_grades(grades)['sort_value'].sort_values(na_position='first', kind='stable').index
+    return grades.loc[order].tolist()
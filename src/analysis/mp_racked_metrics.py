@@ -1,52 +1,17 @@
 import streamlit as st
 import pandas as pd
-from operator import itemgetter
 import os
 import sys
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 sys.path.append(project_root)
 
-from src.streamlit.filters import generate_route_type_where_clause
-from src.analysis.filters_ctes import add_user_filter, route_type_filter, year_filter, estimated_lengths_cte, get_deduped_ticks_cte, get_pitch_preference_lengths, fa_year_filter
-
-def get_grade_group(grade: str, level: str = 'base') -> str:
-    if grade.startswith('V'):
-        return grade
-    if grade.startswith('A') or grade.startswith('C'):
-        return grade
-
-    if grade.startswith('5.'):
-        grade_prefix = '5.'
-        cleaned_grade = grade.replace('5.', '')
-    else:
-        return grade
-
-    if len(cleaned_grade) == 1:  # e.g. 5.9
-        base_grade = cleaned_grade
-        grade_suffix = None
-    elif cleaned_grade[1].isdigit():  # e.g. 5.10 or 5.10a
-        base_grade = cleaned_grade[:2]
-        if len(cleaned_grade) == 3:
-            grade_suffix = cleaned_grade[2]
-        else:
-            grade_suffix = None
-    else:  # e.g. 5.9+
-        base_grade = cleaned_grade[0]
-        grade_suffix = cleaned_grade[1]
-
-    if level == 'base':
-        return f'{grade_prefix}{base_grade}'
-    elif level == 'granular':
-        if grade_suffix in ['a', 'b', '-']:
-            return f'{grade_prefix}{base_grade}-'
-        if grade_suffix in ['c', 'd', '+']:
-            return f'{grade_prefix}{base_grade}+'
-        else:
-            return f'{grade_prefix}{base_grade}'
-    else:
-        return grade
+from src.analysis.filters_ctes import add_user_filter, route_type_filter, year_filter, estimated_lengths_cte, estimated_pitches_cte, get_deduped_ticks_cte, get_pitch_preference_lengths, fa_year_filter, user_stats_filter, metric_params, tag_selection_filter
+from src.analysis.grades import group_grades, lookup_grades
 
+# Chart type for a route: its primary type, or the raw route_type (Ice, Mixed, Snow...) when
+# it has none of the primary types, as the old ILIKE CASE chains fell back to
+CHART_ROUTE_TYPE = "COALESCE(NULLIF(r.primary_type, 'Other'), r.route_type)"
 
 def get_grade_distribution(conn, route_types=None, level='base', year_start=None,
                            year_end=None, user_id=None, tick_type='send', tick_types=None, tag_type=None):
@@ -61,12 +26,11 @@ def get_grade_distribution(conn, route_types=None, level='base', year_start=None
                 'Lead / Flash',
                 'Solo'
             ]
-        send_conditions = [f"t.type = '{t}'" for t in tick_types]
-        tick_filter = f"({' OR '.join(send_conditions)})"
+        tick_filter = "t.type = ANY(:tick_types)"
     else:
         tick_filter = """
         (
-            r.route_type NOT ILIKE '%Aid%'  -- Exclude aid climbs from falls
+            NOT r.is_aid  -- Exclude aid climbs from falls
             AND t.type = 'Lead / Fell/Hung'
             AND t.type != 'Solo'
         )
@@ -76,28 +40,15 @@ def get_grade_distribution(conn, route_types=None, level='base', year_start=None
         placeholders = ', '.join(['%s'] * len(tag_type))
         tag_type_filter = f"WHERE ur.tag_type IN ({placeholders})"
 
-    grade_column = """
-    CASE
-        WHEN r.route_type ILIKE '%Boulder%' THEN r.hueco_rating
-        WHEN r.route_type ILIKE '%Aid%' THEN r.aid_rating
-    ELSE r.yds_rating END"""
-
     query = f"""
     WITH base_data AS (
         SELECT
-            {grade_column} AS grade,
-            CASE
-                WHEN r.route_type ILIKE '%Alpine%' THEN 'Alpine'
-                WHEN r.route_type ILIKE '%Aid%' THEN 'Aid'
-                WHEN r.route_type ILIKE '%Trad%' THEN 'Trad'
-                WHEN r.route_type ILIKE '%Sport%' THEN 'Sport'
-                WHEN r.route_type ILIKE '%TR%' THEN 'TR'
-                ELSE r.route_type
-            END AS route_type,
+            r.route_grade AS grade,
+            {CHART_ROUTE_TYPE} AS route_type,
             1 as count  -- Count each climb once
         FROM routes.Routes r
         JOIN routes.Ticks t ON r.id = t.route_id
-        WHERE {grade_column} IS NOT NULL
+        WHERE r.route_grade IS NOT NULL
         AND {tick_filter}
         {route_type_filter(route_types)}
         {year_filter(year_range=(year_start, year_end), use_where=False)}
@@ -113,7 +64,8 @@ def get_grade_distribution(conn, route_types=None, level='base', year_start=None
     ORDER BY grade DESC;
     """
 
-    results = conn.query(query)
+    results = conn.query(query, params=metric_params(
+        user_id, year_start, year_end, route_types, tick_types=tick_types))
 
     if results.empty:
         if tick_type == 'send':
@@ -122,161 +74,13 @@ def get_grade_distribution(conn, route_types=None, level='base', year_start=None
             st.write(f"No sends found for {tick_types}")
         return []
 
-    grouped_grades = {}
-
-    for _, row in results.iterrows():
-        grade = row['grade']
-        count = row['count']
-        route_type = row['route_type']
-        grouped_grade = get_grade_group(grade, level)
-
-        if grouped_grade not in grouped_grades:
-            grouped_grades[grouped_grade] = {}
-
-        if route_type not in grouped_grades[grouped_grade]:
-            grouped_grades[grouped_grade][route_type] = 0
-
-        grouped_grades[grouped_grade][route_type] += count
-
-    total_count = sum(
-        sum(type_counts.values())
-        for type_counts in grouped_grades.values()
-    )
+    results['grade'] = group_grades(results['grade'], level)
+    grouped = results.groupby(['grade', 'route_type'], as_index=False)['count'].sum()
+    grouped['percentage'] = (grouped['count'] * 100.0 / grouped['count'].sum()).round(2)
+    grouped['sort_value'] = lookup_grades(grouped['grade'])['sort_value']
+    grouped = grouped.sort_values(['sort_value', 'route_type'], na_position='first')
 
-    filtered_results = []
-    for grade, type_counts in grouped_grades.items():
-        for route_type, count in type_counts.items():
-            filtered_results.append({
-                'grade': grade,
-                'count': count,
-                'route_type': route_type,
-                'percentage': round(count * 100.0 / total_count, 2)
-            })
-
-    filtered_results.sort(
-        key=lambda x: (
-            grade_sort_key(
-                x['grade']),
-            x['route_type']))
-
-    return filtered_results
-
-
-def grade_sort_key(grade):
-    # Handle V grades
-    if grade.startswith('V'):
-        if grade == 'V-easy':
-            return (1000, -1, 2)  # Sort below V0
-
-        grade = grade[1:]  # Remove 'V' prefix
-        base_part = ''
-        modifier = ''
-
-        # Handle range grades (V0-1, V2-3, etc) and modifiers
-        if '-' in grade:
-            parts = grade.split('-')
-            try:
-                # Handle ranges like V0-1
-                if len(parts) == 2 and parts[1].isdigit():
-                    base_grade = int(parts[0])
-                    return (1000, base_grade, 2.5)
-                # Handle minus modifier (V1-)
-                elif parts[1] == '':
-                    base_grade = int(parts[0])
-                    return (1000, base_grade, 1)
-            except ValueError:
-                return (1000, 0, 0)
-
-        # Handle plus grades and plain grades
-        if '+' in grade:
-            try:
-                base_grade = int(grade.replace('+', ''))
-                return (1000, base_grade, 3)
-            except ValueError:
-                return (1000, 0, 0)
-
-        # Plain V grade
-        try:
-            base_grade = int(grade)
-            return (1000, base_grade, 2)
-        except ValueError:
-            return (1000, 0, 0)
-
-    if grade.startswith('A') or grade.startswith('C'):
-        base_part = ''
-        modifier = ''
-
-        # Get the prefix (A or C)
-        prefix = grade[0]
-
-        # Skip the A or C prefix
-        grade = grade[1:]
-
-        # Extract base grade and modifier
-        for i, char in enumerate(grade):
-            if char.isdigit():
-                base_part += char
-            else:
-                modifier = grade[i:]
-                break
-
-        try:
-            base_grade = int(base_part)
-
-            # Aid grade modifier values
-            aid_modifier_values = {
-                '-': 1,
-                '': 2,
-                '+': 3
-            }
-
-            modifier_val = aid_modifier_values.get(modifier, 2)
-            # A harder than C
-            prefix_value = 3000 if prefix == 'A' else 2000
-
-            return (prefix_value, base_grade, modifier_val)
-        except ValueError:
-            return (2000, 0, 0)
-
-    # YDS grades
-    if grade.startswith('5.'):
-        cleaned_grade = grade.replace('5.', '')
-
-        if len(cleaned_grade) == 1:  # e.g. 5.9
-            return (100, int(cleaned_grade), 0)
-
-        # Grades with letters or modifiers
-        base_part = ''
-        modifier = ''
-
-        # Get base grade
-        for i, char in enumerate(cleaned_grade):
-            if char.isdigit():
-                base_part += char
-            else:
-                modifier = cleaned_grade[i:]
-                break
-
-        base_grade = int(base_part)
-
-        # Order modifiers: -, a, b, c, d, +
-        modifier_values = {
-            '-': 1,
-            'a': 2,
-            'a/b': 2.5,
-            'b': 3,
-            'b/c': 4,
-            '': 4,
-            'c': 5,
-            'c/d': 5.5,
-            'd': 6,
-            '+': 7
-        }
-
-        modifier_val = modifier_values.get(modifier.lower(), 0)
-        return (100, base_grade, modifier_val)
-
-    return (0, 0, 0)
+    return grouped[['grade', 'count', 'route_type', 'percentage']].to_dict('records')
 
 
 def get_route_details(conn, grade, clicked_type=None, filtered_types=None, tick_type='send',
@@ -292,85 +96,53 @@ def get_route_details(conn, grade, clicked_type=None, filtered_types=None, tick_
                 'Lead / Flash',
                 'Solo'
             ]
-        send_conditions = [f"t.type = '{t}'" for t in tick_types]
-        tick_filter = f"({' OR '.join(send_conditions)})"
+        tick_filter = "t.type = ANY(:tick_types)"
     else:
         tick_filter = """
         (
-            r.route_type NOT ILIKE '%Aid%'
+            NOT r.is_aid
             AND t.type = 'Lead / Fell/Hung'
             AND t.type != 'Solo'
         )
         """
 
-    grade_column = """
-    CASE
-        WHEN r.route_type ILIKE '%Boulder%' THEN r.hueco_rating
-        WHEN r.route_type ILIKE '%Aid%' THEN r.aid_rating
-    ELSE r.yds_rating END"""
+    grouped_grade_column = {
+        'base': 'r.grade_group_base',
+        'granular': 'r.grade_group_granular'
+    }.get(grade_grain, 'r.route_grade')
 
     query = f"""
-
-    WITH route_data AS (
-        SELECT
-            r.route_name,
-            r.main_area,
-            r.route_type,
-            CASE
-                WHEN r.route_type ILIKE '%Alpine%' THEN 'Alpine'
-                WHEN r.route_type ILIKE '%Aid%' THEN 'Aid'
-                WHEN r.route_type ILIKE '%Trad%' THEN 'Trad'
-                WHEN r.route_type ILIKE '%Sport%' THEN 'Sport'
-                WHEN r.route_type ILIKE '%TR%' THEN 'TR'
-                ELSE r.route_type
-            END AS route_type_calc,
-            t.date,
-            t.type as tick_type,
-            r.pitches,
-            {grade_column} as original_grade,
-            r.route_url
-        FROM routes.Routes r
-        JOIN routes.Ticks t ON r.id = t.route_id
-        WHERE {tick_filter}
-        AND {grade_column} IS NOT NULL
-        {route_type_filter(filtered_types)}
-        {add_user_filter(user_id)}
-        {year_filter(year_range=(year_start, year_end), use_where=False)}
-    )
-    SELECT * from route_data
-    WHERE route_type_calc = :clicked_type
+    SELECT
+        r.route_name,
+        r.main_area,
+        r.route_type,
+        {CHART_ROUTE_TYPE} AS route_type_calc,
+        t.date,
+        t.type as tick_type,
+        r.pitches,
+        r.route_grade as original_grade,
+        r.route_url
+    FROM routes.Routes r
+    JOIN routes.Ticks t ON r.id = t.route_id
+    WHERE {tick_filter}
+    AND {CHART_ROUTE_TYPE} = :clicked_type
+    AND {grouped_grade_column} = :grade
+    {route_type_filter(filtered_types)}
+    {add_user_filter(user_id)}
+    {year_filter(year_range=(year_start, year_end), use_where=False)}
     """
 
-    params = {
-        'clicked_type': clicked_type
-    }
+    params = metric_params(user_id, year_start, year_end, filtered_types,
+                           clicked_type=clicked_type, tick_types=tick_types, grade=grade)
 
     results = conn.query(query, params=params)
-    df = pd.DataFrame(results)
-
-    if not df.empty:
-        df['grouped_grade'] = df['original_grade'].fillna('').apply(
-            lambda x: get_grade_group(str(x), grade_grain) if x else None
-        )
-        df = df[df['grouped_grade'] == grade]
-        df = df.drop(['grouped_grade'], axis=1)
-    return df
+    return pd.DataFrame(results)
 
 
 def get_classic_climbs(conn, tag_selections=None, route_types=None,
                        year_start=None, year_end=None, tag_type=None, user_id=None):
-    tag_conditions = []
-    if tag_selections:
-        for tag_type, selected_tags in tag_selections.items():
-            if selected_tags:
-                conditions = [
-                    f"(',' || STRING_AGG(CASE WHEN tav.mapped_type = '{tag_type}' THEN tav.mapped_tag END, ',') || ',') ILIKE '%,{tag},%'"
-                    for tag in selected_tags
-                ]
-                tag_conditions.append(f"({' AND '.join(conditions)})")
-
-    tag_filter = f"HAVING {
-        ' AND '.join(tag_conditions)}" if tag_conditions else ""
+    tag_filter, tag_params = tag_selection_filter(tag_selections)
+
 
     query = f"""
     {get_deduped_ticks_cte(user_id=user_id, year_start=year_start, year_end=year_end)}
@@ -386,7 +158,7 @@ def get_classic_climbs(conn, tag_selections=None, route_types=None,
             r.commitment_grade), '')) as grade,
         r.avg_stars,
         r.num_votes,
-        STRING_AGG(tav.mapped_tag, ', ') as styles,
+        STRING_AGG(tav.mapped_tag, ', ' ORDER BY tav.mapped_type, tav.rank) as styles,
         r.primary_photo_url,
         r.route_url
     FROM routes.Routes r
@@ -397,14 +169,15 @@ def get_classic_climbs(conn, tag_selections=None, route_types=None,
     {route_type_filter(route_types)}
     {year_filter(year_range=(year_start, year_end), use_where=False)}
     {add_user_filter(user_id)}
+    {tag_filter}
     GROUP BY r.route_name, r.main_area, r.specific_location, r.yds_rating, r.hueco_rating,
              r.aid_rating, r.danger_rating, r.commitment_grade, r.avg_stars, r.num_votes,
              r.primary_photo_url, r.route_url
-    {tag_filter}
     ORDER BY r.avg_stars DESC, num_votes DESC
     LIMIT 20
     """
-    return conn.query(query)
+    return conn.query(query, params=metric_params(
+        user_id, year_start, year_end, route_types, **tag_params))
 
 
 def get_bigwall_routes(conn, user_id=None, route_types=None,
@@ -472,7 +245,8 @@ def get_bigwall_routes(conn, user_id=None, route_types=None,
     r.pitches
     ORDER BY commitment_grade DESC, length DESC;
     '''
-    return conn.query(query)
+    return conn.query(query, params=metric_params(
+        user_id, 1999, 2025, route_types))
 
 
 def get_length_climbed(conn, area_type="main_area", user_id=None,
@@ -493,11 +267,20 @@ def get_length_climbed(conn, area_type="main_area", user_id=None,
     GROUP BY year, r.{area_type}
     ORDER BY year DESC, length_climbed DESC;
     """
-    return conn.query(query).itertuples(index=False)
+    return conn.query(query, params=metric_params(user_id, year_start, year_end)).itertuples(index=False)
 
 
 def total_routes(conn, user_id=None, year_start=None,
                  year_end=None, route_types=None):
+    params = metric_params(user_id, year_start, year_end, route_types)
+    if not route_types and user_stats_filter(conn, user_id) is not None:
+        return conn.query(f"""
+        SELECT period_start as date, total_unique_routes as count
+        FROM analysis.user_stats
+        WHERE user_id = :user_id AND grain = 'day'
+        {"AND year BETWEEN :year_start AND :year_end" if year_start and year_end else ""}
+        """, params=params)
+
     query = f"""
     SELECT
         date,
@@ -509,7 +292,7 @@ def total_routes(conn, user_id=None, year_start=None,
     {route_type_filter(route_types)}
     GROUP BY date
     """
-    return conn.query(query)
+    return conn.query(query, params=params)
 
 
 def most_climbed_route(conn, user_id=None, year_start=None, year_end=None, pitch_preference=None):
@@ -570,21 +353,43 @@ def most_climbed_route(conn, user_id=None, year_start=None, year_end=None, pitch
     WHERE times_climbed = (SELECT max_times FROM max_count)
     ORDER BY times_climbed DESC, route_name;
     """
-    return conn.query(query)
+    return conn.query(query, params=metric_params(user_id, year_start, year_end))
 
 
 def days_climbed(conn, user_id=None):
+    params = metric_params(user_id, 2024, 2024)
+    rollup_filter = user_stats_filter(conn, user_id, 2024, 2024)
+    if rollup_filter is not None:
+        result = conn.query(f"SELECT days_logged FROM analysis.user_stats {rollup_filter}", params=params)
+        return result.iloc[0, 0] if not result.empty else 0
+
     query = f"""
         SELECT COUNT(DISTINCT date)
         FROM routes.Ticks
         WHERE date::text ILIKE '%2024%'
         {add_user_filter(user_id)}
     """
-    return conn.query(query).iloc[0, 0]
+    return conn.query(query, params=params).iloc[0, 0]
 
 
 def biggest_climbing_day(conn, user_id=None, year_start=None,
                          year_end=None, pitch_preference=None):
+    # The rollup ranks days by length, so only the top days need route details
+    params = metric_params(user_id, year_start, year_end)
+    top_days_filter = ''
+    if user_stats_filter(conn, user_id) is not None:
+        length_column = 'total_distance' if pitch_preference == 'partial' else 'total_length'
+        top_days = conn.query(f"""
+        SELECT period_start FROM analysis.user_stats
+        WHERE user_id = :user_id AND grain = 'day'
+        {"AND year BETWEEN :year_start AND :year_end" if year_start and year_end else ""}
+        ORDER BY {length_column} DESC NULLS LAST
+        LIMIT 10
+        """, params=params)
+        if top_days.empty:
+            return None
+        params['top_days'] = [str(day)[:10] for day in top_days['period_start']]
+        top_days_filter = "AND t.date::date = ANY(CAST(:top_days AS date[]))"
 
     query = f"""
         {estimated_lengths_cte}
@@ -608,12 +413,13 @@ def biggest_climbing_day(conn, user_id=None, year_start=None,
         LEFT JOIN estimated_lengths el on el.id = t.route_id
         {year_filter(year_range=(year_start, year_end), use_where=True)}
         {add_user_filter(user_id)}
+        {top_days_filter}
         GROUP BY t.date
         ORDER BY total_length desc
     LIMIT 10;
     """
 
-    result = conn.query(query)
+    result = conn.query(query, params=params)
 
     if result.empty:
         return None
@@ -636,11 +442,8 @@ def top_grade(conn, level, user_id=None):
     query = f"""
     WITH grade_counts AS (
         SELECT
-        	CASE
-	        	WHEN r.route_type ILIKE '%Boulder%' THEN r.hueco_rating
-	        	WHEN r.route_type ILIKE '%Aid%' THEN r.aid_rating
-	        	ELSE r.yds_rating END AS grade,
-	        	count(*)
+            r.route_grade AS grade,
+            count(*)
         FROM routes.Routes r
         join routes.Ticks t on t.route_id = r.id
         WHERE date::text ILIKE '%2024%'
@@ -653,20 +456,10 @@ def top_grade(conn, level, user_id=None):
     WHERE grade IS NOT NULL
     """
 
-    results = conn.query(query)
+    results = conn.query(query, params=metric_params(user_id))
 
-    grouped_grades = {}
-
-    for _, row in results.iterrows():
-        grade = row['grade']
-        count = row['count']
-        grouped_grade = get_grade_group(grade, level)
-        if grouped_grade in grouped_grades:
-            grouped_grades[grouped_grade] += count
-        else:
-            grouped_grades[grouped_grade] = count
-
-    return max(grouped_grades.items(), key=itemgetter(1))[0]
+    grade_counts = results.groupby(group_grades(results['grade'], level), sort=False)['count'].sum()
+    return grade_counts.idxmax()
 
 
 def states_climbed(conn, user_id=None, year_start=None, year_end=None):
@@ -679,7 +472,7 @@ def states_climbed(conn, user_id=None, year_start=None, year_end=None):
         GROUP BY region
         ORDER BY days_out desc;
     """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id, year_start, year_end))
 
     return result.values.tolist()
 
@@ -695,12 +488,18 @@ def sub_areas_climbed(conn, user_id=None, year_start=None, year_end=None):
         ORDER BY days_out desc
         Limit 10;
     """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id, year_start, year_end))
 
     return result.values.tolist()
 
 
 def regions_climbed(conn, user_id=None, year_start=None, year_end=None):
+    params = metric_params(user_id, year_start, year_end)
+    rollup_filter = user_stats_filter(conn, user_id, year_start, year_end)
+    if rollup_filter is not None:
+        result = conn.query(f"SELECT regions_climbed FROM analysis.user_stats {rollup_filter}", params=params)
+        return result.iloc[0, 0] if not result.empty else 0
+
     query = f"""
         SELECT count(distinct region)
         FROM routes.Routes r
@@ -709,10 +508,16 @@ def regions_climbed(conn, user_id=None, year_start=None, year_end=None):
         {add_user_filter(user_id)}
         Limit 10
     """
-    return conn.query(query).iloc[0, 0]
+    return conn.query(query, params=params).iloc[0, 0]
 
 
 def regions_sub_areas(conn, user_id=None, year_start=None, year_end=None):
+    params = metric_params(user_id, year_start, year_end)
+    rollup_filter = user_stats_filter(conn, user_id, year_start, year_end)
+    if rollup_filter is not None:
+        result = conn.query(f"SELECT sub_areas_climbed FROM analysis.user_stats {rollup_filter}", params=params)
+        return result.iloc[0, 0] if not result.empty else 0
+
     query = f"""
         SELECT count(distinct sub_area)
         FROM routes.Routes r
@@ -720,7 +525,7 @@ def regions_sub_areas(conn, user_id=None, year_start=None, year_end=None):
         {year_filter(year_range=(year_start, year_end), use_where=True)}
         {add_user_filter(user_id)}
     """
-    return conn.query(query).iloc[0, 0]
+    return conn.query(query, params=params).iloc[0, 0]
 
 
 def top_tags(conn, tag_type, user_id=None, year_start=None,
@@ -737,7 +542,8 @@ def top_tags(conn, tag_type, user_id=None, year_start=None,
         GROUP BY tav.mapped_type, tav.mapped_tag
         ORDER BY count DESC;
     """
-    all_results = conn.query(query)
+    all_results = conn.query(query, params=metric_params(
+        user_id, year_start, year_end, route_types))
     filtered = all_results[all_results['mapped_type'].str.lower()
                            == tag_type.lower()]
 
@@ -752,116 +558,103 @@ def top_tags(conn, tag_type, user_id=None, year_start=None,
 
 def get_user_year_range(conn, user_id):
     """Get min and max years from user's tick data"""
-    query = f"""
+    query = """
     SELECT
         EXTRACT(YEAR FROM MIN(date))::integer as min_year,
         EXTRACT(YEAR FROM MAX(date))::integer as max_year
     FROM routes.Ticks
-    WHERE user_id = '{user_id}'
+    WHERE user_id = :user_id
     """
-    result = conn.query(query)
+    result = conn.query(query, params=metric_params(user_id))
     return result.iloc[0]['min_year'], result.iloc[0]['max_year']
 
 
 def get_classics_count(conn, user_id=None, year_start=None, year_end=None,
                        route_types=None, tag_type=None, tag_selections=None):
-    tag_conditions = []
-    if tag_selections:
-        for tag_type, selected_tags in tag_selections.items():
-            if selected_tags:
-                conditions = [
-                    f"(',' || STRING_AGG(CASE WHEN tav.mapped_type = '{tag_type}' THEN tav.mapped_tag END, ',') || ',') ILIKE '%,{tag},%'"
-                    for tag in selected_tags
-                ]
-                tag_conditions.append(f"({' AND '.join(conditions)})")
-
-    tag_filter = f"HAVING {
-        ' AND '.join(tag_conditions)}" if tag_conditions else ""
+    tag_filter, tag_params = tag_selection_filter(tag_selections)
     query = f"""
         SELECT DISTINCT r.id
         FROM routes.Ticks t
         JOIN routes.Routes r ON t.route_id = r.id
-        LEFT JOIN analysis.TagAnalysisView tav on r.id = tav.route_id
         {year_filter(year_range=(year_start, year_end), use_where=True)}
         {add_user_filter(user_id)}
         {route_type_filter(route_types)}
         AND r.avg_stars >= 3.5
         AND r.num_votes >= 15
-        GROUP BY r.id
         {tag_filter};
     """
-    return len(conn.query(query))
+    return len(conn.query(query, params=metric_params(
+        user_id, year_start, year_end, route_types, **tag_params)))
 
 
 def get_available_grades(conn, route_types=None):
 
-    grade_column = """
-    CASE
-        WHEN route_type ILIKE '%Boulder%' THEN hueco_rating
-        WHEN route_type ILIKE '%Aid%' THEN aid_rating
-    ELSE yds_rating END"""
-
-    route_type_filter = ""
-    if route_types:
-        conditions = [f"route_type ILIKE '%{rt}%'" for rt in route_types]
-        route_type_filter = f"AND ({' OR '.join(conditions)})"
-
     query = f"""
     SELECT DISTINCT
-        {grade_column} AS grade
-    FROM routes.Routes
-    WHERE {grade_column} IS NOT NULL
-    {route_type_filter}
+        r.route_grade AS grade
+    FROM routes.Routes r
+    WHERE r.route_grade IS NOT NULL
+    {route_type_filter(route_types)}
     ORDER BY grade;
     """
 
-    results = conn.query(query)
+    results = conn.query(query, params=metric_params(route_types=route_types))
     return results.to_dict('records')
 
 
-def get_routes_for_route_finder(conn, offset=0, routes_per_page=None, route_types=None, tag_selections=None, user_id=None,
+def route_finder_cursor(route):
+    """Keyset cursor for the route finder page that starts after route (a result row)"""
+    return (route['sort_benchmark'], route['sort_votes'], route['id'])
+
+
+def get_routes_for_route_finder(conn, after=None, routes_per_page=None, route_types=None, tag_selections=None, user_id=None,
                                 climbed_filter='All Routes', fa_selection='All FAs', grade_system=None, grade_range=None, fa_year_start=None, fa_year_end=None):
     try:
-        tag_conditions = []
-        if tag_selections:
-            for tag_type, selected_tags in tag_selections.items():
-                if selected_tags:
-                    conditions = [
-                        f"(',' || STRING_AGG(CASE WHEN tav.mapped_type = '{tag_type}' THEN tav.mapped_tag END, ',') || ',') ILIKE '%,{tag},%'"
-                        for tag in selected_tags
-                    ]
-                    tag_conditions.append(f"({' AND '.join(conditions)})")
+        tag_filter, tag_params = tag_selection_filter(tag_selections)
+
+        # Seek past the last route already shown instead of re-ranking and skipping it
+        keyset_where = ""
+        keyset_params = {}
+        if after is not None:
+            keyset_params = dict(zip(['after_benchmark', 'after_votes', 'after_id'], after))
+            keyset_where = """
+            AND (COALESCE(r.choss_adjusted_benchmark, -1), COALESCE(r.num_votes, -1), r.id)
+                < (CAST(:after_benchmark AS numeric), :after_votes, :after_id)
+            """
 
-        tag_filter = f"HAVING {
-            ' AND '.join(tag_conditions)}" if tag_conditions else ""
+        params = metric_params(
+            user_id, route_types=route_types, fa_selection=fa_selection,
+            fa_year_start=fa_year_start, fa_year_end=fa_year_end,
+            routes_per_page=routes_per_page, **tag_params, **keyset_params)
 
-        route_type_where_clause = generate_route_type_where_clause(route_types)
+        route_type_where_clause = route_type_filter(
+            route_types) if route_types and 'All' not in route_types else ""
 
         climbed_condition = ""
         if climbed_filter == 'Unclimbed':
-            climbed_condition = f"""
+            climbed_condition = """
             AND NOT EXISTS (
                 SELECT 1 FROM routes.Ticks t
                 WHERE t.route_id = r.id
-                AND t.user_id = '{user_id}'
+                AND t.user_id = :user_id
             )
             """
         elif climbed_filter == 'Climbed':
-            climbed_condition = f"""
+            climbed_condition = """
             AND EXISTS (
                 SELECT 1 FROM routes.Ticks t
                 WHERE t.route_id = r.id
-                AND t.user_id = '{user_id}'
+                AND t.user_id = :user_id
             )
             """
 
         fa_condition = ""
         if fa_selection != 'All FAs':
-            fa_condition = f"""
+            fa_condition = """
             AND EXISTS (
                 SELECT 1 FROM analysis.fa
                 WHERE fa.route_id = r.id
-                AND fa.fa_name = '{fa_selection}'
+                AND fa.fa_name = :fa_selection
             )
             """
 
@@ -877,92 +670,55 @@ def get_routes_for_route_finder(conn, offset=0, routes_per_page=None, route_type
 
             grade_join = f"""
             LEFT JOIN routes.grade_sort gs ON
-                gs.grade_system = '{grade_system}' AND
+                gs.grade_system = :grade_system AND
                 gs.grade = {rating_col}
             """
 
-            min_sort = conn.query(f"""
-                SELECT sort_order FROM routes.grade_sort
-                WHERE grade_system = '{grade_system}' AND grade = '{min_grade}'
-            """).iloc[0]['sort_order']
-
-            max_sort = conn.query(f"""
+            sort_order_query = """
                 SELECT sort_order FROM routes.grade_sort
-                WHERE grade_system = '{grade_system}' AND grade = '{max_grade}'
-            """).iloc[0]['sort_order']
+                WHERE grade_system = :grade_system AND grade = :grade
+            """
+            params['grade_system'] = grade_system
+            params['min_sort'] = int(conn.query(sort_order_query, params={
+                'grade_system': grade_system, 'grade': min_grade}).iloc[0]['sort_order'])
+            params['max_sort'] = int(conn.query(sort_order_query, params={
+                'grade_system': grade_system, 'grade': max_grade}).iloc[0]['sort_order'])
 
-            grade_where = f"""
+            grade_where = """
             AND gs.sort_order IS NOT NULL
-            AND gs.sort_order BETWEEN {min_sort} AND {max_sort}
+            AND gs.sort_order BETWEEN :min_sort AND :max_sort
             """
 
+        fa_year_sql = fa_year_filter(fa_year_start, fa_year_end)
+        fa_year_condition = f"""
+            AND EXISTS (
+                SELECT 1 FROM analysis.fa
+                WHERE fa.route_id = r.id
+                {fa_year_sql}
+            )
+            """ if fa_year_sql else ""
+
+        # The page of ids is picked first, so with a persisted score the top N come
+        # straight off routes_benchmark_idx; tags are only aggregated for that page
         query = f"""
-        WITH estimated_lengths AS (
-        SELECT  id,
-                CASE WHEN route_type ILIKE '%trad%' AND length_ft IS NULL AND pitches IS NULL -- trad single-pitch
-                    THEN (SELECT avg(length_ft) FROM routes.Routes r WHERE route_type ILIKE '%trad%'AND length_ft IS NOT NULL and pitches IS NULL AND length_ft < 230) -- avg single-pitch trad pitch length
-                    WHEN route_type ILIKE '%trad%' AND length_ft IS NULL AND pitches IS NOT NULL -- trad multipitch
-                    THEN (SELECT avg(length_ft/ pitches) FROM routes.Routes r WHERE route_type ILIKE '%trad%' AND length_ft IS NOT NULL and pitches IS NOT NULL) * pitches
-                    WHEN route_type ILIKE '%sport%' AND length_ft IS NULL AND pitches IS NOT NULL -- sport single-pitch
-                    THEN (SELECT avg(length_ft) FROM routes.Routes r WHERE route_type ILIKE '%sport%'AND length_ft IS NOT NULL and pitches IS NULL AND length_ft < 230) -- avg single-pitch sport pitch length
-                    WHEN route_type ILIKE '%sport%' AND length_ft IS NULL AND pitches IS NOT NULL -- sport multipitch
-                    THEN (SELECT avg(length_ft/ pitches) FROM routes.Routes r WHERE route_type ILIKE '%sport%' AND length_ft IS NOT NULL and pitches IS NOT NULL) * pitches
-                    WHEN route_type ILIKE '%boulder%' AND length_ft IS NULL
-                    THEN (SELECT avg(length_ft) FROM routes.Routes r WHERE route_type ILIKE '%boulder%' AND length_ft IS NOT NULL) -- boulder
-                    WHEN route_type ILIKE '%aid%' AND length_ft IS NULL AND pitches IS NOT NULL -- aid multipitch
-                    THEN (SELECT avg(length_ft/ pitches) FROM routes.Routes r WHERE route_type ILIKE '%aid%' AND length_ft IS NOT NULL and pitches IS NOT NULL) * pitches
-                    ELSE (SELECT avg(length_ft) FROM routes.Routes r WHERE route_type ILIKE '%trad%'AND length_ft IS NOT NULL and pitches IS NULL AND length_ft < 230)
-                    END AS estimated_length
-            FROM routes.Routes
-            ),
-        estimated_pitches AS (
-            SELECT id,
-                CASE
-                    WHEN pitches IS NOT NULL THEN pitches
-                    WHEN route_type NOT ILIKE '%trad%'
-                        AND route_type NOT ILIKE '%sport%'
-                        AND route_type NOT ILIKE '%aid%'
-                        AND route_type NOT ILIKE '%alpine%' THEN NULL
-                    WHEN length_ft <= 230 THEN 1
-                    WHEN length_ft IS NOT NULL and length_ft < 1000 THEN
-                        CASE
-                            WHEN route_type ILIKE '%trad%' THEN
-                                CEIL(length_ft / (
-                                    SELECT avg(length_ft / pitches)
-                                    FROM routes.Routes
-                                    WHERE route_type ILIKE '%trad%'
-                                    AND length_ft IS NOT NULL
-                                    AND pitches > 2
-                                ))
-                            WHEN route_type ILIKE '%sport%' THEN
-                                CEIL(length_ft / (
-                                    SELECT avg(length_ft / pitches)
-                                    FROM routes.Routes
-                                    WHERE route_type ILIKE '%sport%'
-                                    AND length_ft IS NOT NULL
-                                    AND pitches > 2
-                                ))
-                            WHEN route_type ILIKE '%aid%' THEN
-                                CEIL(length_ft / (
-                                    SELECT avg(length_ft / pitches)
-                                    FROM routes.Routes
-                                    WHERE route_type ILIKE '%aid%'
-                                    AND length_ft IS NOT NULL
-                                    AND pitches > 2
-                                ))
-                            WHEN route_type ILIKE '%alpine%' THEN
-                                CEIL(length_ft / (
-                                    SELECT avg(length_ft / pitches)
-                                    FROM routes.Routes
-                                    WHERE route_type ILIKE '%alpine%'
-                                    AND length_ft IS NOT NULL
-                                    AND pitches > 2
-                                ))
-                            ELSE NULL
-                        END
-                    ELSE NULL
-                END AS estimated_pitches
+        {estimated_lengths_cte},
+        {estimated_pitches_cte},
+        page AS (
+            SELECT r.id,
+                COALESCE(r.choss_adjusted_benchmark, -1) as sort_benchmark,
+                COALESCE(r.num_votes, -1) as sort_votes
             FROM routes.Routes r
+            {grade_join}
+            WHERE 1=1
+            {route_type_where_clause}
+            {tag_filter}
+            {climbed_condition}
+            {fa_condition}
+            {fa_year_condition}
+            {grade_where}
+            {keyset_where}
+            ORDER BY sort_benchmark DESC, sort_votes DESC, r.id DESC
+            LIMIT :routes_per_page
         )
         select
         r.id,
@@ -972,106 +728,7 @@ def get_routes_for_route_finder(conn, offset=0, routes_per_page=None, route_type
         r.aid_rating,
         TRIM(NULLIF(CONCAT_WS(' ', r.yds_rating, r.hueco_rating, r.aid_rating, r.danger_rating, r.commitment_grade), '')) grade,
         r.avg_stars,
-        least(4.0,round((
-            (r.avg_stars * r.num_votes +
-            CASE  -- Prior mean (m) - same within grade tiers
-                -- Grade VI tiers
-            WHEN r.commitment_grade = 'VI' AND r.num_votes >= 600 THEN 4.5
-            WHEN r.commitment_grade = 'VI' AND r.num_votes >= 500 THEN 4.49
-            WHEN r.commitment_grade = 'VI' AND r.num_votes >= 400 THEN 4.48
-            WHEN r.commitment_grade = 'VI' AND r.num_votes >= 300 THEN 4.47
-            WHEN r.commitment_grade = 'VI' AND r.num_votes >= 200 THEN 4.46
-            WHEN r.commitment_grade = 'VI' AND r.num_votes >= 100 THEN 4.45
-            WHEN r.commitment_grade = 'VI' AND r.num_votes >= 50 THEN 3.85
-            WHEN r.commitment_grade = 'VI' THEN 3.65
-            -- Grade V tiers
-            WHEN r.commitment_grade = 'V' AND r.num_votes >= 600 THEN 4
-            WHEN r.commitment_grade = 'V' AND r.num_votes >= 500 THEN 3.99
-            WHEN r.commitment_grade = 'V' AND r.num_votes >= 400 THEN 3.98
-            WHEN r.commitment_grade = 'V' AND r.num_votes >= 300 THEN 3.97
-            WHEN r.commitment_grade = 'V' AND r.num_votes >= 200 THEN 3.96
-            WHEN r.commitment_grade = 'V' AND r.num_votes >= 100 THEN 3.95
-            WHEN r.commitment_grade = 'VI' THEN 3.5
-            -- Grade IV tiers
-            WHEN r.commitment_grade = 'IV' AND r.num_votes >= 600 THEN 3.9
-            WHEN r.commitment_grade = 'IV' AND r.num_votes >= 500 THEN 3.89
-            WHEN r.commitment_grade = 'IV' AND r.num_votes >= 400 THEN 3.88
-            WHEN r.commitment_grade = 'IV' AND r.num_votes >= 300 THEN 3.86
-            WHEN r.commitment_grade = 'OV' AND r.num_votes >= 200 THEN 3.81
-            WHEN r.commitment_grade = 'IV' AND r.num_votes >= 100 THEN 3.75
-                -- Grade IV tiers
-            -- ALL routes vote count tiers
-            WHEN r.num_votes >= 1000 THEN 4
-            WHEN r.num_votes >= 750 THEN 3.9
-            WHEN r.num_votes >= 500 THEN 3.8
-            WHEN r.num_votes >= 250 THEN 3.8
-            WHEN r.num_votes >= 100 THEN 3.5
-            WHEN r.num_votes >= 50 THEN 3
-            ELSE 2
-        END *
-            CASE  -- Confidence number (C)
-                -- Grade VI tiers
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 600 THEN GREATEST(15, ROUND(r.num_votes * 0.2))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 500 THEN GREATEST(15, ROUND(r.num_votes * 0.19))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 400 THEN GREATEST(15, ROUND(r.num_votes * 0.18))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 300 THEN GREATEST(15, ROUND(r.num_votes * 0.15))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 200 THEN GREATEST(15, ROUND(r.num_votes * 0.13))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 100 THEN GREATEST(15, ROUND(r.num_votes * 0.1))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 50 THEN GREATEST(15, ROUND(r.num_votes * 0.05))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 600 THEN GREATEST(20, ROUND(r.num_votes * 0.15))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 500 THEN GREATEST(20, ROUND(r.num_votes * 0.14))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 400 THEN GREATEST(20, ROUND(r.num_votes * 0.13))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 300 THEN GREATEST(20, ROUND(r.num_votes * 0.12))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 200 THEN GREATEST(20, ROUND(r.num_votes * 0.11))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 100 THEN GREATEST(20, ROUND(r.num_votes * 0.1))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 50 THEN GREATEST(20, ROUND(r.num_votes * 0.07))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 600 THEN GREATEST(25, ROUND(r.num_votes * 0.1))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 500 THEN GREATEST(25, ROUND(r.num_votes * 0.09))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 400 THEN GREATEST(25, ROUND(r.num_votes * 0.08))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 300 THEN GREATEST(25, ROUND(r.num_votes * 0.07))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 200 THEN GREATEST(25, ROUND(r.num_votes * 0.06))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 100 THEN GREATEST(25, ROUND(r.num_votes * 0.05))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 50 THEN GREATEST(25, ROUND(r.num_votes * 0.03))
-                WHEN r.num_votes >= 600 THEN GREATEST(30, ROUND(r.num_votes * 0.03))
-                WHEN r.num_votes >= 500 THEN GREATEST(30, ROUND(r.num_votes * 0.025))
-                WHEN r.num_votes >= 400 THEN GREATEST(30, ROUND(r.num_votes * 0.02))
-                WHEN r.num_votes >= 300 THEN GREATEST(30, ROUND(r.num_votes * 0.015))
-                WHEN r.num_votes >= 200 THEN GREATEST(30, ROUND(r.num_votes * 0.01))
-                WHEN r.num_votes >= 100 THEN GREATEST(30, ROUND(r.num_votes * 0.005))
-                ELSE GREATEST(30, ROUND(r.num_votes * 0.0001))
-            END)::NUMERIC / (
-            r.num_votes +
-            CASE  -- Same confidence numbers as above
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 600 THEN GREATEST(15, ROUND(r.num_votes * 0.2))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 500 THEN GREATEST(15, ROUND(r.num_votes * 0.19))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 400 THEN GREATEST(15, ROUND(r.num_votes * 0.18))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 300 THEN GREATEST(15, ROUND(r.num_votes * 0.15))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 200 THEN GREATEST(15, ROUND(r.num_votes * 0.13))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 100 THEN GREATEST(15, ROUND(r.num_votes * 0.1))
-                WHEN r.commitment_grade = 'VI' AND r.num_votes >= 50 THEN GREATEST(15, ROUND(r.num_votes * 0.05))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 600 THEN GREATEST(20, ROUND(r.num_votes * 0.15))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 500 THEN GREATEST(20, ROUND(r.num_votes * 0.14))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 400 THEN GREATEST(20, ROUND(r.num_votes * 0.13))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 300 THEN GREATEST(20, ROUND(r.num_votes * 0.12))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 200 THEN GREATEST(20, ROUND(r.num_votes * 0.11))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 100 THEN GREATEST(20, ROUND(r.num_votes * 0.1))
-                WHEN r.commitment_grade = 'V' AND r.num_votes >= 50 THEN GREATEST(20, ROUND(r.num_votes * 0.07))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 600 THEN GREATEST(25, ROUND(r.num_votes * 0.1))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 500 THEN GREATEST(25, ROUND(r.num_votes * 0.09))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 400 THEN GREATEST(25, ROUND(r.num_votes * 0.08))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 300 THEN GREATEST(25, ROUND(r.num_votes * 0.07))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 200 THEN GREATEST(25, ROUND(r.num_votes * 0.06))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 100 THEN GREATEST(25, ROUND(r.num_votes * 0.05))
-                WHEN r.commitment_grade = 'IV' AND r.num_votes >= 50 THEN GREATEST(25, ROUND(r.num_votes * 0.03))
-                WHEN r.num_votes >= 600 THEN GREATEST(30, ROUND(r.num_votes * 0.03))
-                WHEN r.num_votes >= 500 THEN GREATEST(30, ROUND(r.num_votes * 0.025))
-                WHEN r.num_votes >= 400 THEN GREATEST(30, ROUND(r.num_votes * 0.02))
-                WHEN r.num_votes >= 300 THEN GREATEST(30, ROUND(r.num_votes * 0.015))
-                WHEN r.num_votes >= 200 THEN GREATEST(30, ROUND(r.num_votes * 0.01))
-                WHEN r.num_votes >= 100 THEN GREATEST(30, ROUND(r.num_votes * 0.005))
-                ELSE GREATEST(30, ROUND(r.num_votes * 0.0001))
-            END)
-        ), 3)) as choss_adjusted_benchmark,
+        r.choss_adjusted_benchmark,
         r.num_votes,
         r.region,
         r.main_area,
@@ -1100,45 +757,25 @@ def get_routes_for_route_finder(conn, offset=0, routes_per_page=None, route_type
         EXISTS (
             SELECT 1 FROM routes.Ticks t
             WHERE t.route_id = r.id
-            AND t.user_id = '{user_id}'
-        ) as climbed
-        from routes.routes r
+            AND t.user_id = :user_id
+        ) as climbed,
+        p.sort_benchmark,
+        p.sort_votes
+        from page p
+        JOIN routes.routes r on r.id = p.id
         LEFT JOIN estimated_lengths el on el.id = r.id
         left join estimated_pitches ep on ep.id = r.id
         LEFT JOIN analysis.taganalysisview tav on tav.route_id = r.id
-        LEFT JOIN analysis.fa fa ON fa.route_id = r.id
-        {grade_join}
-        {route_type_where_clause}
-        {climbed_condition}
-        {fa_condition}
-        {fa_year_filter(fa_year_start, fa_year_end)}
-        {grade_where}
         group by r.id,
-        r.route_name,
-        yds_rating,
-        hueco_rating,
-        aid_rating,
-        grade,
-        r.avg_stars,
-        r.num_votes,
-        r.region,
-        r.main_area,
-        r.sub_area,
-        r.specific_location,
-        r.route_type,
-        length_ft,
-        pitches,
-        r.fa,
+        p.sort_benchmark,
+        p.sort_votes,
         el.estimated_length,
         ep.estimated_pitches
-        {tag_filter}
-        order by choss_adjusted_benchmark desc, num_votes desc
-        LIMIT {routes_per_page}
-        OFFSET {offset};
+        ORDER BY p.sort_benchmark DESC, p.sort_votes DESC, r.id DESC;
         """
 
         print("Executing main query...")
-        results = conn.query(query)
+        results = conn.query(query, params=params)
         print(f"Query returned {len(results)} routes")
 
         return results if not results.empty else pd.DataFrame()
@@ -1254,7 +891,7 @@ classic_ticks AS (
         t.date
     ORDER BY climbed desc,t.date desc, avg_stars desc;
     """
-    return conn.query(query)
+    return conn.query(query, params=metric_params(user_id))
 
 
 def tag_relationships(conn, primary_type, secondary_type,
@@ -1275,7 +912,7 @@ def tag_relationships(conn, primary_type, secondary_type,
                 COUNT(DISTINCT tav.route_id) as count
             FROM analysis.TagAnalysisView tav
             JOIN filtered_routes fr ON fr.route_id = tav.route_id
-            WHERE mapped_type = '{primary_type}'
+            WHERE mapped_type = :primary_type
             GROUP BY mapped_tag
             HAVING COUNT(DISTINCT tav.route_id) >= 3
         ),
@@ -1293,8 +930,8 @@ def tag_relationships(conn, primary_type, secondary_type,
             FROM analysis.TagAnalysisView p
             JOIN analysis.TagAnalysisView r ON r.route_id = p.route_id
             JOIN filtered_routes fr ON fr.route_id = p.route_id
-            WHERE p.mapped_type = '{primary_type}'
-            AND r.mapped_type = '{secondary_type}'
+            WHERE p.mapped_type = :primary_type
+            AND r.mapped_type = :secondary_type
             AND p.mapped_tag IN (SELECT primary_tag FROM primary_counts)
             GROUP BY p.mapped_tag, r.mapped_tag
             HAVING COUNT(DISTINCT r.route_id) >= 3
@@ -1315,66 +952,65 @@ def tag_relationships(conn, primary_type, secondary_type,
         UNION ALL
         SELECT
             'Root' as id,
-            '{primary_type.title()}s' as label,
+            CAST(:root_label AS text) as label,
             '' as parent,
             (SELECT SUM(count) FROM primary_counts)
     """
-    return conn.query(query)
+    return conn.query(query, params=metric_params(
+        user_id, year_start, year_end, route_types,
+        primary_type=primary_type, secondary_type=secondary_type,
+        root_label=f"{primary_type.title()}s"))
+
+
+def get_period_stats_from_rollup(conn, user_id, period_type, year_start, year_end, pitch_preference):
+    """get_period_stats read from analysis.user_stats; None when the rollup can't answer it"""
+    if period_type == 'all':
+        rollup_filter = user_stats_filter(conn, user_id, year_start, year_end)
+        order_by = 'period_start'
+    elif period_type in ('season', 'month') and user_stats_filter(conn, user_id) is not None:
+        rollup_filter = f"""WHERE user_id = :user_id AND grain = :period_type
+        {"AND year BETWEEN :year_start AND :year_end" if year_start and year_end else ""}"""
+        # Seasons sort by season, then year, as they always have
+        order_by = 'EXTRACT(QUARTER FROM period_start), year' if period_type == 'season' else 'period_start'
+    else:
+        return None
+    if rollup_filter is None:
+        return None
+
+    non_boulder_distance = 'non_boulder_distance_partial' if pitch_preference == 'partial' else 'non_boulder_distance'
+    return conn.query(f"""
+    SELECT
+        {"'Full Year'::text" if period_type == 'all' else 'period'} as period,
+        days_logged,
+        highest_trad_grade,
+        highest_sport_grade,
+        highest_boulder,
+        highest_aid,
+        ROUND(total_distance, 2) as total_distance,
+        ROUND(total_pitches, 2) as total_pitches,
+        total_routes_climbed,
+        total_unique_routes,
+        {non_boulder_distance} as non_boulder_distance,
+        non_boulder_routes,
+        boulder_routes,
+        boulder_distance,
+        roped_days
+    FROM analysis.user_stats
+    {rollup_filter}
+    ORDER BY {order_by}
+    """, params=metric_params(user_id, year_start, year_end, period_type=period_type))
 
 
 def get_period_stats(conn, user_id, period_type='all', period_value=None, year_start=None, year_end=None, pitch_preference=None):
-    period_type_sql = f"'{period_type}'"
+    rollup_stats = get_period_stats_from_rollup(
+        conn, user_id, period_type, year_start, year_end, pitch_preference)
+    if rollup_stats is not None:
+        return rollup_stats
+
+    period_type_sql = "CAST(:period_type AS text)"
     query = f"""
     {estimated_lengths_cte},
-    estimated_pitches AS (
-            SELECT id,
-                CASE
-                    WHEN pitches IS NOT NULL THEN pitches
-                    WHEN route_type NOT ILIKE '%trad%'
-                        AND route_type NOT ILIKE '%sport%'
-                        AND route_type NOT ILIKE '%aid%'
-                        AND route_type NOT ILIKE '%alpine%' THEN NULL
-                    WHEN length_ft <= 230 THEN 1
-                    WHEN length_ft IS NOT NULL and length_ft < 1000 THEN
-                        CASE
-                            WHEN route_type ILIKE '%trad%' THEN
-                                CEIL(length_ft / (
-                                    SELECT avg(length_ft / pitches)
-                                    FROM routes.Routes
-                                    WHERE route_type ILIKE '%trad%'
-                                    AND length_ft IS NOT NULL
-                                    AND pitches > 2
-                                ))
-                            WHEN route_type ILIKE '%sport%' THEN
-                                CEIL(length_ft / (
-                                    SELECT avg(length_ft / pitches)
-                                    FROM routes.Routes
-                                    WHERE route_type ILIKE '%sport%'
-                                    AND length_ft IS NOT NULL
-                                    AND pitches > 2
-                                ))
-                            WHEN route_type ILIKE '%aid%' THEN
-                                CEIL(length_ft / (
-                                    SELECT avg(length_ft / pitches)
-                                    FROM routes.Routes
-                                    WHERE route_type ILIKE '%aid%'
-                                    AND length_ft IS NOT NULL
-                                    AND pitches > 2
-                                ))
-                            WHEN route_type ILIKE '%alpine%' THEN
-                                CEIL(length_ft / (
-                                    SELECT avg(length_ft / pitches)
-                                    FROM routes.Routes
-                                    WHERE route_type ILIKE '%alpine%'
-                                    AND length_ft IS NOT NULL
-                                    AND pitches > 2
-                                ))
-                            ELSE NULL
-                        END
-                    ELSE NULL
-                END AS estimated_pitches
-            FROM routes.Routes r
-        ),
+    {estimated_pitches_cte},
     daily_stats AS (
         SELECT
             t.date,
@@ -1618,7 +1254,7 @@ route_counts AS (
                 END
         END;
         """
-    return conn.query(query)
+    return conn.query(query, params=metric_params(user_id, year_start, year_end, period_type=period_type))
 
 
 def get_leaderboard_routes_info(conn, user_id, year_start, year_end, period_stats_df, period_type='all', period_value=None):
@@ -1641,7 +1277,7 @@ def get_leaderboard_routes_info(conn, user_id, year_start, year_end, period_stat
         elif period_value == 'Fall':
             period_filter = "AND EXTRACT(MONTH FROM t.date) IN (10, 11, 12)"
     elif period_type == 'month':
-        period_filter = f"AND EXTRACT(MONTH FROM t.date) = {period_value}"
+        period_filter = "AND EXTRACT(MONTH FROM t.date) = :period_month"
 
     query = f"""
     WITH filtered_routes AS (
@@ -1657,7 +1293,7 @@ def get_leaderboard_routes_info(conn, user_id, year_start, year_end, period_stat
         FROM routes.ticks t
         JOIN routes.routes r ON t.route_id = r.id
         WHERE r.route_type ILIKE '%trad%'
-        AND r.yds_rating = '{highest_grades['trad']}'
+        AND r.yds_rating = :trad_grade
         AND t.type IN ('Lead / Pinkpoint', 'Lead / Onsight', 'Lead / Redpoint', 'Lead / Flash')
         AND t.note NOT ILIKE '%aid%'
         AND r.aid_rating IS NULL 
@@ -1674,7 +1310,7 @@ def get_leaderboard_routes_info(conn, user_id, year_start, year_end, period_stat
         FROM routes.ticks t
         JOIN routes.routes r ON t.route_id = r.id
         WHERE r.route_type ILIKE '%sport%'
-        AND r.yds_rating = '{highest_grades['sport']}'
+        AND r.yds_rating = :sport_grade
         AND t.type IN ('Lead / Pinkpoint', 'Lead / Onsight', 'Lead / Redpoint', 'Lead / Flash')
         UNION ALL
         SELECT 
@@ -1689,7 +1325,7 @@ def get_leaderboard_routes_info(conn, user_id, year_start, year_end, period_stat
         FROM routes.ticks t
         JOIN routes.routes r ON t.route_id = r.id
         WHERE r.route_type ILIKE '%boulder%'
-        AND r.hueco_rating = '{highest_grades['boulder']}'
+        AND r.hueco_rating = :boulder_grade
         AND t.type != 'Attempt'
         UNION ALL
         SELECT 
@@ -1704,7 +1340,7 @@ def get_leaderboard_routes_info(conn, user_id, year_start, year_end, period_stat
         FROM routes.ticks t
         JOIN routes.routes r ON t.route_id = r.id
         WHERE r.aid_rating IS NOT NULL
-        AND r.aid_rating = '{highest_grades['aid']}'
+        AND r.aid_rating = :aid_grade
     )
     SELECT 
         route_type,
@@ -1720,5 +1356,8 @@ def get_leaderboard_routes_info(conn, user_id, year_start, year_end, period_stat
     {period_filter}
     ORDER BY date DESC;
     """
-    print(query)
-    return conn.query(query)
\ No newline at end of file
+    params = metric_params(
+        user_id, year_start, year_end,
+        period_month=int(period_value) if period_type == 'month' else None,
+        **{f'{route_type}_grade': grade for route_type, grade in highest_grades.items()})
+    return conn.query(query, params=params)
\ No newline at end of file
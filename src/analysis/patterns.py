@@ -0,0 +1,112 @@
+"""
+Precompiled regexes and lookup tables shared by the FA parser and the
+tick / route scraping parsers. Compiling once at import keeps the per-call
+cost down when parsing thousands of FA strings or ticks in a batch.
+"""
+import re
+
+# --- FA parsing (src/analysis/fa_parsing.py) ---
+
+FULL_YEAR = re.compile(r'\b(?:18|19|20)\d{2}\b')
+TRAILING_YEAR = re.compile(r'(?:18|19|20)?\d{2,4}$')
+
+FA_DATE_PATTERNS = [
+    # Full dates: MM/DD/YY or MM-DD-YY
+    re.compile(r'\d{1,2}[-/]\d{1,2}[-/](?:18|19|20)?\d{2}'),
+    # Month/Year: MM/YY or MM/YYYY
+    re.compile(r'\d{1,2}[-/](?:18|19|20)?\d{2}'),
+    re.compile(r'\d{1,2}[-/]\d{4}'),                           # Month/Year: MM/YYYY
+]
+# Simplified year pattern that includes decade suffix and 1800s
+FA_YEAR = re.compile(r'(?:18|19|20)?\d{2,4}(?:\'s|s)?')
+
+# Checked in this order; FFA/FCA have to win over the plain FA prefix
+ASCENT_TYPE_SPLITS = [
+    (re.compile(r'ffa\W*', re.IGNORECASE), 'FFA'),  # First Free Ascent
+    (re.compile(r'fca\W*', re.IGNORECASE), 'FCA'),  # First Clean Ascent
+    (re.compile(r'fa\W*', re.IGNORECASE), 'FA'),    # First Ascent
+]
+
+DECADE_BASE_YEAR = re.compile(r'(?:18|19|20)?\d{2}|\d{4}')
+FOUR_DIGIT_YEAR = re.compile(r'^\d{4}$')
+CENTURY_YEAR = re.compile(r'(?:18|19|20)\d{2}')
+TWO_DIGITS = re.compile(r'\d{2}')
+
+EDGE_PUNCTUATION = re.compile(r'^[\W_]+|[\W_]+$')
+WHITESPACE_RUN = re.compile(r'\s+')
+NO_LETTERS = re.compile(r'^[\d\s\W]+$')
+GENERIC_NAMES = frozenset(['company', 'partner', 'partners', 'lead', 'original'])
+
+NAME_SPLIT = re.compile(r'[,/]|-(?!\w)')
+NAME_CONNECTOR_SPLIT = re.compile(r'\s+(?:and|&)\s+', re.IGNORECASE)
+
+
+def _combine(*patterns):
+    return re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE)
+
+
+# Noise removed from names, applied in order. Consecutive patterns are only
+# merged into one alternation where a single left-to-right pass removes
+# exactly what applying them one after another did: whole-word patterns
+# never create new matches for each other, while the pitch/date patterns
+# overlap and stay separate.
+NAME_NOISE_PATTERNS = [
+    _combine(
+        r'\b(?:and|with)\b',
+        r'\b(?:trad|sport|mixed|aid|free|solo|1st|first|then|bolted)\b',
+        r'\b(?:gear|now|retrobolted)\b',
+        r'\b(?:or earlier|or later)\b',
+        r'\b(?:did|the|ascent|first|free|ascent)\b',
+        r'\b(?:company|partner|partners)\b',
+        r'\b(?:lead|leads|leader|leading|led)\b',
+        r'\b(?:original|originally)\b',
+        r'\b(?:1st|first)\b',
+    ),
+    _combine(r'(?:P|p)\d+(?:[-:]|\s+[-:]|\s*[.:])\s*'),
+    _combine(r'(?:P|p)\d+[-\s]*[-–]\s*(?:P|p)?\d+[-:]?\s*[.:]?\s*'),
+    _combine(r'(?:^|\s*\.?\s*)(?:P|p)?\d+[-:]?\s*[.:]'),
+    _combine(r'(?:^|\s*\.?\s*)(?:P|p)?\d+[-\s]*[-–]\s*\d+[-:]?\s*[.:]?'),
+    _combine(r'(?:^|\s*\.?\s*)(?:P|p)?\d+(?:[-:]|\s+[-:]|\s*[.:])\s*'),
+    _combine(r'\.\s*\d+[-:]?\s*[.:]'),
+    _combine(r'\d{1,2}[-/]\d{1,2}[-/](?:20)?\d{2}'),
+    _combine(r'\d{1,2}/\d{1,2}(?:/\d{2,4})?'),
+    _combine(r'\b(?:january|february|march|april|may|june|july|august|september|october|november|december)\b(?:\s+(?:\d{1,4}|early|late|mid|spring|summer|fall|winter)|\s*$)'),
+    _combine(r'\b(?:jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec)\b(?:\s+(?:\d{1,4}|early|late|mid|spring|summer|fall|winter)|\s*$)'),
+    _combine(
+        r'\b(?:spring|summer|fall|winter)\b',
+        r'\b(?:early|late|mid)\b',
+    ),
+    _combine(
+        r'\b(?:circa|c\.|ca\.|approximately|approx\.)\b',
+        r'\b(?:unknown|various)\b',
+    ),
+    _combine(
+        r'\b(?:et\.? al\.?)\b',
+        r'\b(?:did the first free ascent)\b',
+        r'\b(?:ffa|fa)\b',
+        r'\b(?:on|in|at|by|the)\b',
+        r'\b\d{4}\b',
+        r'\?',
+    ),
+]
+
+# --- Tick and route page parsing (src/scraping/helper_functions.py) ---
+
+TICK_DATE = re.compile(r'[A-Z][a-z]{2}\s+\d{1,2},\s+\d{4}')
+TICK_PITCHES = re.compile(r'(\d+)\s*pitches?')
+VALID_TICK_TYPES = frozenset([
+    'Solo', 'TR', 'Follow', 'Lead',
+    'Lead / Onsight', 'Lead / Flash',
+    'Lead / Redpoint', 'Lead / Pinkpoint',
+    'Lead / Fell/Hung'
+])
+
+# Every style a ticks page can show; boulder styles aren't kept as tick types, matching the tick export
+TICK_STYLES = VALID_TICK_TYPES | frozenset(['Send', 'Flash', 'Attempt'])
+
+ROUTE_LENGTH_FT = re.compile(r'(\d+)\s*ft')
+ROUTE_PITCHES = re.compile(r'(\d+)\s*pitch')
+COMMITMENT_GRADE = re.compile(r'Grade\s+(VI|IV|V|I{1,3})')
+
+COMMENT_FULL_ID = re.compile(r'.*-full')
+STARS_AVG_ID = re.compile('^starsWithAvgText-')
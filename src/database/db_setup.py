@@ -5,9 +5,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 sys.path.append(project_root)
 
 from src.database.utils import create_connection
-
-connection = create_connection()
-cursor = connection.cursor()
+from src.database.queries import refresh_route_estimates, backfill_route_grade_columns, refresh_route_tags, refresh_route_benchmarks
 
 create_routes_schema_query = 'CREATE SCHEMA IF NOT EXISTS routes;'
 create_analysis_schema_query = 'CREATE SCHEMA IF NOT EXISTS analysis;'
@@ -36,9 +34,88 @@ CREATE TABLE IF NOT EXISTS routes.Routes (
     protection TEXT,
     primary_photo_url TEXT,
     insert_date TIMESTAMP WITH TIME ZONE,
+    primary_type TEXT,
+    is_trad BOOLEAN,
+    is_sport BOOLEAN,
+    is_boulder BOOLEAN,
+    is_aid BOOLEAN,
+    is_alpine BOOLEAN,
+    is_tr BOOLEAN,
+    route_grade TEXT,
+    grade_sort_value INTEGER,
+    grade_group_base TEXT,
+    grade_group_granular TEXT,
+    choss_adjusted_benchmark NUMERIC,
+    is_stub BOOLEAN DEFAULT false NOT NULL,
     UNIQUE(id)
 );
 
+-- Derived type and grade columns for tables created before they existed
+ALTER TABLE routes.Routes
+    ADD COLUMN IF NOT EXISTS primary_type TEXT,
+    ADD COLUMN IF NOT EXISTS is_trad BOOLEAN,
+    ADD COLUMN IF NOT EXISTS is_sport BOOLEAN,
+    ADD COLUMN IF NOT EXISTS is_boulder BOOLEAN,
+    ADD COLUMN IF NOT EXISTS is_aid BOOLEAN,
+    ADD COLUMN IF NOT EXISTS is_alpine BOOLEAN,
+    ADD COLUMN IF NOT EXISTS is_tr BOOLEAN,
+    ADD COLUMN IF NOT EXISTS route_grade TEXT,
+    ADD COLUMN IF NOT EXISTS grade_sort_value INTEGER,
+    ADD COLUMN IF NOT EXISTS grade_group_base TEXT,
+    ADD COLUMN IF NOT EXISTS grade_group_granular TEXT,
+    ADD COLUMN IF NOT EXISTS choss_adjusted_benchmark NUMERIC,
+    ADD COLUMN IF NOT EXISTS is_stub BOOLEAN DEFAULT false NOT NULL;
+
+CREATE INDEX IF NOT EXISTS routes_primary_type_grade_sort_idx ON routes.Routes (primary_type, grade_sort_value);
+CREATE INDEX IF NOT EXISTS routes_grade_sort_idx ON routes.Routes (grade_sort_value);
+
+-- Matches the route finder's ORDER BY so its top N is an index scan
+CREATE INDEX IF NOT EXISTS routes_benchmark_idx ON routes.Routes (
+    (COALESCE(choss_adjusted_benchmark, -1)) DESC,
+    (COALESCE(num_votes, -1)) DESC,
+    id DESC
+);
+
+-- Bayesian prior tiers for choss_adjusted_benchmark; the first matching tier_order wins.
+-- NULL commitment_grade matches every route.
+CREATE TABLE IF NOT EXISTS routes.benchmark_prior_tiers (
+    tier_order INTEGER PRIMARY KEY,
+    commitment_grade TEXT,
+    min_votes INTEGER NOT NULL,
+    prior_mean NUMERIC NOT NULL
+);
+
+INSERT INTO routes.benchmark_prior_tiers (tier_order, commitment_grade, min_votes, prior_mean) VALUES
+    (10, 'VI', 600, 4.5), (11, 'VI', 500, 4.49), (12, 'VI', 400, 4.48), (13, 'VI', 300, 4.47),
+    (14, 'VI', 200, 4.46), (15, 'VI', 100, 4.45), (16, 'VI', 50, 3.85), (17, 'VI', 0, 3.65),
+    (20, 'V', 600, 4), (21, 'V', 500, 3.99), (22, 'V', 400, 3.98), (23, 'V', 300, 3.97),
+    (24, 'V', 200, 3.96), (25, 'V', 100, 3.95),
+    (30, 'IV', 600, 3.9), (31, 'IV', 500, 3.89), (32, 'IV', 400, 3.88), (33, 'IV', 300, 3.86),
+    (34, 'OV', 200, 3.81), (35, 'IV', 100, 3.75),
+    (40, NULL, 1000, 4), (41, NULL, 750, 3.9), (42, NULL, 500, 3.8), (43, NULL, 250, 3.8),
+    (44, NULL, 100, 3.5), (45, NULL, 50, 3), (46, NULL, 0, 2)
+ON CONFLICT (tier_order) DO NOTHING;
+
+-- Confidence (how many prior votes are mixed in) is GREATEST(min_confidence, ROUND(num_votes * vote_share))
+CREATE TABLE IF NOT EXISTS routes.benchmark_confidence_tiers (
+    tier_order INTEGER PRIMARY KEY,
+    commitment_grade TEXT,
+    min_votes INTEGER NOT NULL,
+    min_confidence NUMERIC NOT NULL,
+    vote_share NUMERIC NOT NULL
+);
+
+INSERT INTO routes.benchmark_confidence_tiers (tier_order, commitment_grade, min_votes, min_confidence, vote_share) VALUES
+    (10, 'VI', 600, 15, 0.2), (11, 'VI', 500, 15, 0.19), (12, 'VI', 400, 15, 0.18), (13, 'VI', 300, 15, 0.15),
+    (14, 'VI', 200, 15, 0.13), (15, 'VI', 100, 15, 0.1), (16, 'VI', 50, 15, 0.05),
+    (20, 'V', 600, 20, 0.15), (21, 'V', 500, 20, 0.14), (22, 'V', 400, 20, 0.13), (23, 'V', 300, 20, 0.12),
+    (24, 'V', 200, 20, 0.11), (25, 'V', 100, 20, 0.1), (26, 'V', 50, 20, 0.07),
+    (30, 'IV', 600, 25, 0.1), (31, 'IV', 500, 25, 0.09), (32, 'IV', 400, 25, 0.08), (33, 'IV', 300, 25, 0.07),
+    (34, 'IV', 200, 25, 0.06), (35, 'IV', 100, 25, 0.05), (36, 'IV', 50, 25, 0.03),
+    (40, NULL, 600, 30, 0.03), (41, NULL, 500, 30, 0.025), (42, NULL, 400, 30, 0.02), (43, NULL, 300, 30, 0.015),
+    (44, NULL, 200, 30, 0.01), (45, NULL, 100, 30, 0.005), (46, NULL, 0, 30, 0.0001)
+ON CONFLICT (tier_order) DO NOTHING;
+
 CREATE TABLE IF NOT EXISTS routes.Ticks (
     id SERIAL PRIMARY KEY,
     user_id TEXT,
@@ -99,58 +176,259 @@ CREATE TABLE IF NOT EXISTS analysis.TagMapping (
     UNIQUE(raw_tag, original_tag_type) 
 );
 
+-- Active tag mappings per analyzed route, kept current by analysis.refresh_route_tags
+CREATE TABLE IF NOT EXISTS analysis.route_tags (
+    route_id INTEGER NOT NULL,
+    mapped_type TEXT,
+    mapped_tag TEXT,
+    rank INTEGER,
+    FOREIGN KEY (route_id) REFERENCES routes.Routes(id)
+);
+
+-- Overlapping refreshes of the same route could each insert a copy before the unique index existed
+DELETE FROM analysis.route_tags a
+USING analysis.route_tags b
+WHERE a.ctid > b.ctid
+AND a.route_id = b.route_id
+AND a.mapped_type IS NOT DISTINCT FROM b.mapped_type
+AND a.mapped_tag IS NOT DISTINCT FROM b.mapped_tag;
+
+DROP INDEX IF EXISTS analysis.route_tags_route_type_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS route_tags_route_type_tag_key ON analysis.route_tags (route_id, mapped_type, mapped_tag);
+CREATE INDEX IF NOT EXISTS route_tags_type_tag_idx ON analysis.route_tags (mapped_type, mapped_tag);
+
 CREATE or replace VIEW analysis.TagAnalysisView as
-with ranked_tags AS(
-	SELECT DISTINCT 
-	    r.id route_id,
-	    r.route_name,
-	    COALESCE(tm.mapped_tag_type, tm.original_tag_type) as mapped_type, 
-	    COALESCE(tm.clean_tag, tm.raw_tag) as mapped_tag,
-	            ROW_NUMBER() OVER (
-	            PARTITION BY r.id, COALESCE(tm.mapped_tag_type, tm.original_tag_type)
-	            ORDER BY rat.rank
-	        )::integer as new_rank
-	FROM analysis.routeanalysistags_v2 rat
-	LEFT JOIN analysis.TagMapping tm on tm.raw_tag = rat.tag_value and tm.original_tag_type = rat.tag_type
-	JOIN analysis.RouteAnalysis_v2 ra on rat.analysis_id = ra.id
-	JOIN routes.Routes r on r.id = ra.route_id
-	where tm.is_active = true
-	)
-SELECT 
-    route_id,
-    route_name,
-    mapped_type,
-    mapped_tag,
-    new_rank as rank
-FROM ranked_tags
-ORDER BY route_id, mapped_type, new_rank;
-
-CREATE TABLE IF NOT EXISTS analysis.tagMapping (
-    id SERIAL PRIMARY KEY,
-    raw_tag TEXT NOT NULL,          
-    clean_tag TEXT NOT NULL,         
-    original_tag_type TEXT NOT NULL,
-    mapped_tag_type TEXT NOT NULL,
-    is_active BOOLEAN DEFAULT true,
-    insert_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(raw_tag, original_tag_type))
-
-CREATE VIEW analysis.TagAnalysisView AS
-SELECT DISTINCT 
-    r.id route_id,
+SELECT
+    rt.route_id,
     r.route_name,
-    COALESCE(tm.mapped_tag_type, tm.original_tag_type) as mapped_type, 
-    COALESCE(tm.clean_tag, tm.raw_tag) as mapped_tag
-FROM analysis.RouteAnalysisTags rat 
-LEFT JOIN analysis.TagMapping tm on tm.raw_tag = rat.tag_value 
-JOIN analysis.RouteAnalysis ra on rat.analysis_id = ra.id
-JOIN routes.Routes r on r.id = ra.route_id 
-WHERE tm.is_active = true;
+    rt.mapped_type,
+    rt.mapped_tag,
+    rt.rank
+FROM analysis.route_tags rt
+JOIN routes.Routes r on r.id = rt.route_id;
+
+CREATE TABLE IF NOT EXISTS analysis.fa (
+    id SERIAL PRIMARY KEY,
+    route_id INTEGER,
+    fa_name TEXT,
+    fa_type TEXT,
+    year INTEGER,
+    insert_date TIMESTAMP,
+    FOREIGN KEY (route_id) REFERENCES routes.Routes(id)
+);
+
+CREATE INDEX IF NOT EXISTS fa_route_id_idx ON analysis.fa (route_id);
+
+CREATE TABLE IF NOT EXISTS analysis.route_tag_index (
+    route_id INTEGER PRIMARY KEY,
+    tag_keys TEXT[] NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    FOREIGN KEY (route_id) REFERENCES routes.Routes(id)
+);
+
+CREATE INDEX IF NOT EXISTS route_tag_index_tag_keys_idx ON analysis.route_tag_index USING GIN (tag_keys);
+
+CREATE TABLE IF NOT EXISTS analysis.job_watermarks (
+    job_name TEXT PRIMARY KEY,
+    last_insert_date TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS routes.route_type_averages (
+    route_type_key TEXT PRIMARY KEY,
+    single_pitch_length NUMERIC,
+    route_length NUMERIC,
+    pitch_length NUMERIC,
+    long_route_pitch_length NUMERIC,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS routes.route_estimates (
+    route_id INTEGER PRIMARY KEY,
+    estimated_length NUMERIC,
+    estimated_pitches INTEGER,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    FOREIGN KEY (route_id) REFERENCES routes.Routes(id)
+);
+
+CREATE TABLE IF NOT EXISTS routes.scrape_pages (
+    user_id TEXT,
+    page_number INTEGER,
+    status TEXT DEFAULT 'queued',
+    queued_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    completed_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (user_id, page_number)
+);
+
+-- Set with status 'ticks_stored': routes the page still needs fetched, so retries resume there
+ALTER TABLE routes.scrape_pages
+    ADD COLUMN IF NOT EXISTS route_ids INTEGER[];
+
+-- Routes queued for a route worker; user_id is the scrape that queued them
+CREATE TABLE IF NOT EXISTS routes.route_claims (
+    route_id INTEGER PRIMARY KEY,
+    user_id TEXT,
+    claimed_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+-- Fetch lease held by the worker fetching the route right now, renewed per route
+ALTER TABLE routes.route_claims
+    ADD COLUMN IF NOT EXISTS lease_owner TEXT,
+    ADD COLUMN IF NOT EXISTS leased_at TIMESTAMP WITH TIME ZONE;
+
+CREATE INDEX IF NOT EXISTS route_claims_user_id_idx ON routes.route_claims (user_id);
+
+CREATE TABLE IF NOT EXISTS analysis.user_stats (
+    user_id TEXT,
+    grain TEXT,
+    period TEXT,
+    period_start DATE,
+    year INTEGER,
+    days_logged INTEGER,
+    total_distance NUMERIC,
+    total_length NUMERIC,
+    total_pitches NUMERIC,
+    non_boulder_distance NUMERIC,
+    non_boulder_distance_partial NUMERIC,
+    boulder_distance NUMERIC,
+    non_boulder_routes INTEGER,
+    boulder_routes INTEGER,
+    roped_days INTEGER,
+    total_routes_climbed INTEGER,
+    total_unique_routes INTEGER,
+    highest_trad_grade TEXT,
+    highest_sport_grade TEXT,
+    highest_boulder TEXT,
+    highest_aid TEXT,
+    regions_climbed INTEGER,
+    sub_areas_climbed INTEGER,
+    first_date DATE,
+    last_date DATE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (user_id, grain, period_start)
 );
 '''
 
-for query in create_table_query.split(';'):
-    if query.strip():
+# Run as one statement each; the function bodies contain semicolons
+create_functions_queries = ['''
+CREATE OR REPLACE FUNCTION analysis.refresh_route_tags(route_ids INTEGER[] DEFAULT NULL)
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+-- Rebuild route_tags and route_tag_index for route_ids, or every route when NULL
+DECLARE
+    refreshed INTEGER;
+BEGIN
+    DELETE FROM analysis.route_tags WHERE route_ids IS NULL OR route_id = ANY(route_ids);
+    -- Raw tags mapped to the same clean tag collapse to one row at their best rank.
+    -- ON CONFLICT lets an overlapping refresh of the same routes (a per-route refresh
+    -- racing the TagMapping trigger) wait for the other and skip its rows instead of duplicating them.
+    INSERT INTO analysis.route_tags (route_id, mapped_type, mapped_tag, rank)
+    SELECT
+        route_id,
+        mapped_type,
+        mapped_tag,
+        ROW_NUMBER() OVER (PARTITION BY route_id, mapped_type ORDER BY best_rank)::integer
+    FROM (
+        SELECT
+            r.id AS route_id,
+            COALESCE(tm.mapped_tag_type, tm.original_tag_type) AS mapped_type,
+            COALESCE(tm.clean_tag, tm.raw_tag) AS mapped_tag,
+            min(rat.rank) AS best_rank
+        FROM analysis.routeanalysistags_v2 rat
+        JOIN analysis.TagMapping tm on tm.raw_tag = rat.tag_value and tm.original_tag_type = rat.tag_type
+        JOIN analysis.RouteAnalysis_v2 ra on rat.analysis_id = ra.id
+        JOIN routes.Routes r on r.id = ra.route_id
+        WHERE tm.is_active = true
+        AND (route_ids IS NULL OR ra.route_id = ANY(route_ids))
+        GROUP BY 1, 2, 3
+    ) tags
+    ON CONFLICT (route_id, mapped_type, mapped_tag) DO NOTHING;
+
+    DELETE FROM analysis.route_tag_index WHERE route_ids IS NULL OR route_id = ANY(route_ids);
+    INSERT INTO analysis.route_tag_index (route_id, tag_keys, updated_at)
+    SELECT rt.route_id,
+        array_agg(DISTINCT rt.mapped_type || ':' || rt.mapped_tag ORDER BY rt.mapped_type || ':' || rt.mapped_tag),
+        now()
+    FROM analysis.route_tags rt
+    WHERE (route_ids IS NULL OR rt.route_id = ANY(route_ids))
+    AND rt.mapped_type IS NOT NULL
+    AND rt.mapped_tag IS NOT NULL
+    GROUP BY rt.route_id
+    ON CONFLICT (route_id) DO UPDATE
+    SET tag_keys = EXCLUDED.tag_keys,
+        updated_at = EXCLUDED.updated_at;
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END
+$$
+''', '''
+CREATE OR REPLACE FUNCTION analysis.refresh_all_route_tags()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM analysis.refresh_route_tags(NULL);
+    RETURN NULL;
+END
+$$
+''', '''
+DROP TRIGGER IF EXISTS tag_mapping_refresh_route_tags ON analysis.TagMapping
+''', '''
+-- Admin edits to TagMapping can re-map any route; new mappings from add_new_tags_to_mapping
+-- only cover freshly analyzed routes, which the caller refreshes by id
+CREATE TRIGGER tag_mapping_refresh_route_tags
+AFTER UPDATE OR DELETE OR TRUNCATE ON analysis.TagMapping
+FOR EACH STATEMENT EXECUTE FUNCTION analysis.refresh_all_route_tags()
+''', '''
+CREATE OR REPLACE FUNCTION routes.choss_adjusted_benchmark(REAL, INTEGER, TEXT)
+RETURNS NUMERIC LANGUAGE sql STABLE AS $$
+    -- $1 avg_stars, $2 num_votes, $3 commitment_grade
+    SELECT least(4.0, round((
+        ($1 * $2 + prior.prior_mean * confidence.confidence)::NUMERIC /
+        ($2 + confidence.confidence)
+    ), 3))
+    FROM (
+        SELECT p.prior_mean
+        FROM routes.benchmark_prior_tiers p
+        WHERE (p.commitment_grade IS NULL OR p.commitment_grade = $3)
+        AND $2 >= p.min_votes
+        ORDER BY p.tier_order
+        LIMIT 1
+    ) prior,
+    (
+        SELECT GREATEST(c.min_confidence, ROUND($2 * c.vote_share)) as confidence
+        FROM routes.benchmark_confidence_tiers c
+        WHERE (c.commitment_grade IS NULL OR c.commitment_grade = $3)
+        AND $2 >= c.min_votes
+        ORDER BY c.tier_order
+        LIMIT 1
+    ) confidence
+$$
+''', '''
+CREATE OR REPLACE FUNCTION routes.set_choss_adjusted_benchmark()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.choss_adjusted_benchmark := routes.choss_adjusted_benchmark(
+        NEW.avg_stars, NEW.num_votes, NEW.commitment_grade);
+    RETURN NEW;
+END
+$$
+''', '''
+DROP TRIGGER IF EXISTS routes_choss_adjusted_benchmark ON routes.Routes
+''', '''
+CREATE TRIGGER routes_choss_adjusted_benchmark
+BEFORE INSERT OR UPDATE OF avg_stars, num_votes, commitment_grade ON routes.Routes
+FOR EACH ROW EXECUTE FUNCTION routes.set_choss_adjusted_benchmark()
+''']
+
+with create_connection() as connection:
+    cursor = connection.cursor()
+    cursor.execute(create_routes_schema_query)
+    cursor.execute(create_analysis_schema_query)
+    for query in create_table_query.split(';'):
+        if query.strip():
+            cursor.execute(query)
+    for query in create_functions_queries:
         cursor.execute(query)
-connection.commit()
+    backfill_route_grade_columns(cursor)
+    refresh_route_benchmarks(cursor)
+    refresh_route_estimates(cursor)
+    refresh_route_tags(cursor)
+    connection.commit()
@@ -1,6 +1,12 @@
+import hashlib
+import io
+from array import array
+from bisect import bisect_left
 import time
 import psycopg2
+from datetime import date, datetime
 from functools import wraps
+from src.analysis.grades import route_grade_columns
 
 def with_retry(max_retries=3, delay=1):
     def decorator(func):
@@ -45,234 +51,919 @@ def with_retry(max_retries=3, delay=1):
 
 @with_retry()
 def check_routes_exists(cursor, route_ids):
-    """Check if routes exist in database"""
+    """Check if routes exist in database; stubs from a tick export still need their details fetched"""
     route_id_list = [int(id) for id in route_ids]
-    placeholders = ','.join(['%s' for _ in route_id_list])
-    query = f"SELECT id FROM routes.Routes WHERE id IN ({placeholders})"
-    cursor.execute(query, tuple(route_id_list))
+    cursor.execute(
+        "SELECT id FROM routes.Routes WHERE id = ANY(%s) AND NOT is_stub", (route_id_list,))
     results = {row[0] for row in cursor.fetchall()} # return set of route ids that exist
-    print(f"Found existing routes: {results}")
+    print(f"Found {len(results)} of {len(route_id_list)} routes already in database")
     return results
 
-@with_retry()
-def insert_comments_batch(cursor, comments, **kwargs):  
-    failed_comments = []
+def load_route_ids(cursor):
+    """All route ids in the database as a sorted array('I'), for local membership checks"""
+    cursor.execute("SELECT id FROM routes.Routes WHERE NOT is_stub ORDER BY id")
+    route_ids = array('I', (row[0] for row in cursor))
+    print(f"Loaded {len(route_ids)} known route ids")
+    return route_ids
+
+def route_id_known(route_ids, route_id):
+    """Binary search a sorted array from load_route_ids"""
+    route_id = int(route_id)
+    index = bisect_left(route_ids, route_id)
+    return index < len(route_ids) and route_ids[index] == route_id
+
+def add_route_id(route_ids, route_id):
+    """Insert a newly stored route id, keeping the array sorted"""
+    route_id = int(route_id)
+    index = bisect_left(route_ids, route_id)
+    if index == len(route_ids) or route_ids[index] != route_id:
+        route_ids.insert(index, route_id)
+
+
+def format_copy_value(value):
+    """Escape a value for COPY ... FROM STDIN text format"""
+    if value is None:
+        return '\\N'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+def copy_rows(cursor, table, columns, rows):
+    """Stream rows (sequences in column order) into a table with COPY"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(format_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+    return cursor.rowcount
+
+def stage_rows(cursor, staging_table, column_defs, rows):
+    """
+    COPY rows into a temp staging table that only lives for the current transaction.
+    ON COMMIT DROP keeps this safe behind a transaction-mode pooler like Neon's.
+    """
+    columns_sql = ', '.join(f"{name} {sql_type}" for name, sql_type in column_defs)
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging_table} ({columns_sql}) ON COMMIT DROP")
+    cursor.execute(f"TRUNCATE {staging_table}")
+    return copy_rows(cursor, staging_table, [name for name, _ in column_defs], rows)
+
+def to_timestamp(value):
+    """Accept datetimes, ISO strings, and Mountain Project dates like 'Oct 12, 2024'"""
+    if isinstance(value, (datetime, date)):
+        return value
+    value = str(value).strip()
     try:
-        print(f"Received {len(comments)} comments to insert")
-        if not comments:
-            print("No comments to insert")
-            return 0, []
-        
-        args_str = ','.join(
-        cursor.mogrify(
-                "(%(route_id)s, %(comment)s, encode(digest(%(comment)s, 'sha256'), 'hex'), %(insert_date)s)",
-                comment
-            ).decode('utf-8')
-            for comment in comments
-        )
-        comments_sql = f"""
-        INSERT INTO routes.RouteComments (
-            route_id, comment, comment_hash, insert_date
-        ) VALUES {args_str}
-        ON CONFLICT (route_id, comment_hash) DO NOTHING
-        RETURNING id
-        """
-        cursor.execute(comments_sql)
-        inserted_count = cursor.rowcount
-        print(f"Successfully inserted {inserted_count} comments")
-        return inserted_count, [] 
-        
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(' '.join(value.split()), '%b %d, %Y')
+
+COERCERS = {
+    'INTEGER': lambda value: int(str(value).replace(',', '')),
+    'REAL': float,
+    'TEXT': str,
+    'TIMESTAMP': to_timestamp,
+    'TIMESTAMPTZ': to_timestamp,
+    'BOOLEAN': bool
+}
+
+def coerce_rows(rows, column_defs, required, describe_failure):
+    """
+    Convert dict rows into typed tuples (prefixed with their row number) ready for COPY.
+    Rows that can't be converted are reported instead of failing the whole batch.
+    """
+    valid_rows = []
+    failed_rows = []
+    for row_num, row in enumerate(rows):
+        try:
+            values = [row_num]
+            for name, sql_type in column_defs:
+                value = row.get(name)
+                if value is None or (value == '' and sql_type != 'TEXT'):
+                    if name in required:
+                        raise ValueError(f"{name} is required")
+                    values.append(None)
+                else:
+                    values.append(COERCERS[sql_type](value))
+            valid_rows.append(values)
+        except (TypeError, ValueError) as e:
+            failed_rows.append(describe_failure(row, f"Invalid row: {str(e)}"))
+    return valid_rows, failed_rows
+
+def hash_text(text):
+    """Hex sha256 of text, matching encode(digest(text, 'sha256'), 'hex') in Postgres"""
+    if text is None:
+        return None
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def dedupe_rows(valid_rows, column_defs, key_columns):
+    """Drop rows whose key was already seen earlier in the batch. Returns (rows, keys)."""
+    names = [name for name, _ in column_defs]
+    # +1 skips the row_num prefix added by coerce_rows
+    positions = [names.index(name) + 1 for name in key_columns]
+    batch_seen = set()
+    unique_rows = []
+    for row in valid_rows:
+        key = tuple(row[i] for i in positions)
+        if key in batch_seen:
+            continue
+        batch_seen.add(key)
+        unique_rows.append(row)
+    return unique_rows, batch_seen
+
+def bulk_merge(cursor, staging_table, column_defs, valid_rows, merge_sql,
+               orphan_sql=None):
+    """
+    Stage rows with COPY and merge them with one INSERT ... SELECT.
+    Returns (inserted_count, orphaned_row_nums). orphan_sql selects row_num for
+    staged rows whose route is missing; the merge must skip those rows itself.
+    """
+    stage_rows(cursor, staging_table,
+               [('row_num', 'INTEGER')] + list(column_defs), valid_rows)
+
+    orphaned_row_nums = []
+    if orphan_sql:
+        cursor.execute(orphan_sql)
+        orphaned_row_nums = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(merge_sql)
+    return cursor.rowcount, orphaned_row_nums
+
+def merge_isolating_failures(cursor, staging_table, column_defs, valid_rows, merge_sql,
+                             orphan_sql=None):
+    """
+    bulk_merge valid_rows inside a savepoint. If the merge fails, the batch is bisected in
+    fresh savepoints so only the rows that fail on their own are rejected.
+    Returns (inserted_count, orphaned_row_nums, merge_errors) with merge_errors as (row, error).
+    """
+    cursor.execute("SAVEPOINT bulk_load")
+    try:
+        inserted_count, orphaned_row_nums = bulk_merge(
+            cursor, staging_table, column_defs, valid_rows, merge_sql, orphan_sql)
+        cursor.execute("RELEASE SAVEPOINT bulk_load")
+        return inserted_count, orphaned_row_nums, []
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        raise
     except Exception as e:
-        print(f"Batch insert failed: {str(e)}")
-        print("Falling back to individual inserts...")
-        
-        # Second attempt: individual inserts
-        successful_count = 0
-        for comment in comments:
-            try:
-                cursor.execute("""
-                    INSERT INTO routes.RouteComments (
-                        route_id, comment, comment_hash, insert_date
-                    ) VALUES (
-                        %(route_id)s, %(comment)s, 
-                        encode(digest(%(comment)s, 'sha256'), 'hex'),
-                        %(insert_date)s
-                    )
-                    ON CONFLICT (route_id, comment_hash) DO NOTHING
-                    RETURNING id
-                """, comment)
-                cursor.connection.commit()
-                
-                if cursor.rowcount > 0:
-                    successful_count += 1
-                    
-            except Exception as e:
-                failed_comments.append({
-                    'route_id': comment['route_id'],
-                    'comment': comment['comment'][:50] + '...' if len(comment['comment']) > 50 else comment['comment'],
-                    'error': str(e)
-                })
-                print(f"Failed to insert comment for route {comment['route_id']}: {str(e)}")
-                continue
-        
-        print(f"\nIndividual inserts complete:")
-        print(f"Successfully inserted: {successful_count} comments")
-        if failed_comments:
-            print(f"Failed to insert {len(failed_comments)} comments:")
-            for comment in failed_comments:
-                print(f"- Route {comment['route_id']}: {comment['comment']}")
-        
-        return successful_count, failed_comments
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_load")
+        cursor.execute("RELEASE SAVEPOINT bulk_load")
+        if len(valid_rows) == 1:
+            return 0, [], [(valid_rows[0], str(e))]
+        print(f"Merge of {len(valid_rows)} rows failed ({str(e)}), isolating failing rows")
+
+    middle = len(valid_rows) // 2
+    inserted_count, orphaned_row_nums, merge_errors = 0, [], []
+    for half in (valid_rows[:middle], valid_rows[middle:]):
+        half_inserted, half_orphaned, half_errors = merge_isolating_failures(
+            cursor, staging_table, column_defs, half, merge_sql, orphan_sql)
+        inserted_count += half_inserted
+        orphaned_row_nums.extend(half_orphaned)
+        merge_errors.extend(half_errors)
+    return inserted_count, orphaned_row_nums, merge_errors
+
+def run_bulk_load(cursor, label, rows, column_defs, required, describe_failure,
+                  staging_table, merge_sql, orphan_sql=None, key_columns=None):
+    """
+    Shared COPY load flow for the insert_*_batch functions; returns (count, failed).
+    With key_columns, duplicate rows are dropped before they are sent.
+    """
+    print(f"Received {len(rows)} {label} to insert")
+    if not rows:
+        return 0, []
+
+    valid_rows, failed_rows = coerce_rows(
+        rows, column_defs, required, describe_failure)
+
+    if key_columns:
+        received_count = len(valid_rows)
+        valid_rows, _ = dedupe_rows(
+            valid_rows, column_defs, key_columns)
+        if received_count > len(valid_rows):
+            print(f"Skipped {received_count - len(valid_rows)} duplicate {label}")
+        if not valid_rows:
+            return 0, failed_rows
+
+    # Savepoints keep the caller's transaction usable if the merge itself fails
+    inserted_count, orphaned_row_nums, merge_errors = merge_isolating_failures(
+        cursor, staging_table, column_defs, valid_rows, merge_sql, orphan_sql)
+
+    failed_rows.extend(
+        describe_failure(rows[row[0]], error) for row, error in merge_errors)
+    failed_rows.extend(
+        describe_failure(rows[row_num], "Route does not exist")
+        for row_num in orphaned_row_nums)
+
+    print(f"Successfully inserted {inserted_count} {label}")
+    if failed_rows:
+        print(f"Rejected {len(failed_rows)} {label}:")
+        for failed in failed_rows:
+            print(f"- {failed}")
+    return inserted_count, failed_rows
+
+COMMENT_COLUMN_DEFS = [
+    ('route_id', 'INTEGER'),
+    ('comment', 'TEXT'),
+    ('comment_hash', 'TEXT'),
+    ('insert_date', 'TIMESTAMP')
+]
 
 @with_retry()
-def insert_ticks_batch(cursor, tick_data, **kwargs):
-    failed_ticks = []
+def insert_comments_batch(cursor, comments, **kwargs):
+    for comment in comments:
+        comment['comment_hash'] = hash_text(comment.get('comment'))
+
+    def describe_failure(comment, error):
+        text = comment.get('comment') or ''
+        return {
+            'route_id': comment.get('route_id'),
+            'comment': text[:50] + '...' if len(text) > 50 else text,
+            'error': error
+        }
+
+    return run_bulk_load(
+        cursor, 'comments', comments, COMMENT_COLUMN_DEFS,
+        required={'route_id', 'comment'},
+        describe_failure=describe_failure,
+        staging_table='comments_staging',
+        key_columns=['route_id', 'comment_hash'],
+        orphan_sql="""
+            SELECT s.row_num FROM comments_staging s
+            WHERE NOT EXISTS (SELECT 1 FROM routes.Routes r WHERE r.id = s.route_id)
+        """,
+        merge_sql="""
+            INSERT INTO routes.RouteComments (
+                route_id, comment, comment_hash, insert_date
+            )
+            SELECT s.route_id, s.comment, s.comment_hash, s.insert_date
+            FROM comments_staging s
+            WHERE EXISTS (SELECT 1 FROM routes.Routes r WHERE r.id = s.route_id)
+            ORDER BY s.row_num
+            ON CONFLICT (route_id, comment_hash) DO NOTHING
+        """)
 
+TICK_COLUMN_DEFS = [
+    ('user_id', 'TEXT'),
+    ('route_id', 'INTEGER'),
+    ('date', 'TIMESTAMP'),
+    ('type', 'TEXT'),
+    ('note', 'TEXT'),
+    ('note_hash', 'TEXT'),
+    ('pitches_climbed', 'INTEGER'),
+    ('insert_date', 'TIMESTAMP')
+]
+
+@with_retry()
+def insert_ticks_batch(cursor, tick_data, **kwargs):
     for tick in tick_data:
         if tick['type'] is None:
             tick['type'] = ''
-        if tick['pitches_climbed'] is None:
-            tick['pitches_climbed'] = None 
-        
-    try:
-        args_str = ','.join(
-            cursor.mogrify(
-                "(%(user_id)s, %(route_id)s, %(date)s, %(type)s, %(note)s, encode(digest(COALESCE(%(note)s, ''), 'sha256'), 'hex'),%(pitches_climbed)s, %(insert_date)s)",
-                tick
-            ).decode('utf-8')
-            for tick in tick_data
-        )
-        tick_sql = f"""
+        tick['note_hash'] = hash_text(tick.get('note') or '')
+
+    def describe_failure(tick, error):
+        return {
+            'user_id': tick.get('user_id'),
+            'route_id': tick.get('route_id'),
+            'date': tick.get('date'),
+            'error': error
+        }
+
+    return run_bulk_load(
+        cursor, 'ticks', tick_data, TICK_COLUMN_DEFS,
+        required={'user_id', 'route_id'},
+        describe_failure=describe_failure,
+        staging_table='ticks_staging',
+        key_columns=['user_id', 'route_id', 'date', 'type', 'note_hash'],
+        orphan_sql="""
+            SELECT s.row_num FROM ticks_staging s
+            WHERE NOT EXISTS (SELECT 1 FROM routes.Routes r WHERE r.id = s.route_id)
+        """,
+        merge_sql="""
             INSERT INTO routes.Ticks (user_id, route_id, date, type, note, note_hash, pitches_climbed, insert_date)
-            VALUES {args_str}
+            SELECT s.user_id, s.route_id, s.date, s.type, s.note, s.note_hash,
+                   s.pitches_climbed, s.insert_date
+            FROM ticks_staging s
+            WHERE EXISTS (SELECT 1 FROM routes.Routes r WHERE r.id = s.route_id)
+            ORDER BY s.row_num
             ON CONFLICT ON CONSTRAINT ticks_user_id_route_id_date_type_note_hash_key DO NOTHING
-            RETURNING id
-        """
-        cursor.execute(tick_sql)
-        inserted_count = cursor.rowcount
-        print(f"Successfully inserted {inserted_count} ticks")
-        return inserted_count, []
-    except Exception as e:
-        print(f"Batch insert failed: {str(e)}")
-        print("Falling back to individual inserts...")
-        
-        # Second attempt: individual inserts
-        successful_count = 0
-        for tick in tick_data:
-            try:
-                cursor.execute("""
-                    INSERT INTO routes.Ticks (
-                        user_id, route_id, date, type, note, note_hash, 
-                        pitches_climbed, insert_date
-                    ) VALUES (
-                        %(user_id)s, %(route_id)s, %(date)s, %(type)s, %(note)s, 
-                        encode(digest(COALESCE(%(note)s, ''), 'sha256'), 'hex'),
-                        %(pitches_climbed)s, %(insert_date)s
-                    ) 
-                    ON CONFLICT ON CONSTRAINT ticks_user_id_route_id_date_type_note_hash_key DO NOTHING
-                    RETURNING id
-                """, tick)
-                cursor.connection.commit()
-                
-                if cursor.rowcount > 0:
-                    successful_count += 1
-                    
-            except Exception as e:
-                failed_ticks.append({
-                    'user_id': tick['user_id'],
-                    'route_id': tick['route_id'],
-                    'date': tick['date'],
-                    'error': str(e)
-                })
-                print(f"Failed to insert tick for route {tick['route_id']} by user {tick['user_id']}: {str(e)}")
-                continue
-        
-        print(f"\nIndividual inserts complete:")
-        print(f"Successfully inserted: {successful_count} ticks")
-        if failed_ticks:
-            print(f"Failed to insert {len(failed_ticks)} ticks:")
-            for tick in failed_ticks:
-                print(f"- User {tick['user_id']} Route {tick['route_id']} Date {tick['date']}")
-        
-        return successful_count, failed_ticks
+        """)
+
+TICK_KEY_COLUMN_DEFS = [
+    ('route_id', 'INTEGER'),
+    ('date', 'TIMESTAMP'),
+    ('type', 'TEXT'),
+    ('note_hash', 'TEXT')
+]
+
+def delete_user_ticks_missing_from(cursor, user_id, tick_data):
+    """
+    Delete the user's stored ticks whose key isn't in tick_data, after tick_data went
+    through insert_ticks_batch (which sets type and note_hash). Caller commits.
+    """
+    key_rows, failed_keys = coerce_rows(
+        tick_data, TICK_KEY_COLUMN_DEFS, {'route_id'}, lambda tick, error: error)
+    if failed_keys:
+        raise ValueError(f"{len(failed_keys)} ticks have invalid keys: {failed_keys[0]}")
+    stage_rows(cursor, 'tick_keys_staging',
+               [('row_num', 'INTEGER')] + TICK_KEY_COLUMN_DEFS, key_rows)
+    cursor.execute("""
+        DELETE FROM routes.Ticks t
+        WHERE t.user_id = %s
+        AND NOT EXISTS (
+            SELECT 1 FROM tick_keys_staging k
+            WHERE k.route_id = t.route_id
+            AND k.date IS NOT DISTINCT FROM t.date
+            AND k.type = t.type
+            AND k.note_hash = t.note_hash
+        )
+    """, (user_id,))
+    if cursor.rowcount:
+        print(f"Deleted {cursor.rowcount} stored ticks for user {user_id} that are no longer in their ticklist")
+    return cursor.rowcount
+
+def get_latest_tick_key(cursor, user_id):
+    """(route_id, date, type, note_hash) of the user's newest stored tick, or None for a new user"""
+    cursor.execute("""
+        SELECT route_id, date::date, type, note_hash
+        FROM routes.Ticks
+        WHERE user_id = %s
+        ORDER BY date DESC NULLS LAST, id DESC
+        LIMIT 1
+    """, (user_id,))
+    row = cursor.fetchone()
+    return tuple(row) if row else None
+
+def get_known_tick_keys(cursor, user_id, route_ids):
+    """Stored (route_id, date, type, note_hash) keys for the user's ticks on route_ids"""
+    cursor.execute("""
+        SELECT route_id, date::date, type, note_hash
+        FROM routes.Ticks
+        WHERE user_id = %s AND route_id = ANY(%s)
+    """, (user_id, [int(id) for id in route_ids]))
+    return {tuple(row) for row in cursor.fetchall()}
+
+ROUTE_COLUMN_DEFS = [
+    ('route_id', 'INTEGER'),
+    ('route_name', 'TEXT'),
+    ('route_url', 'TEXT'),
+    ('yds_rating', 'TEXT'),
+    ('hueco_rating', 'TEXT'),
+    ('aid_rating', 'TEXT'),
+    ('danger_rating', 'TEXT'),
+    ('avg_stars', 'REAL'),
+    ('num_votes', 'INTEGER'),
+    ('region', 'TEXT'),
+    ('main_area', 'TEXT'),
+    ('sub_area', 'TEXT'),
+    ('specific_location', 'TEXT'),
+    ('route_type', 'TEXT'),
+    ('length_ft', 'INTEGER'),
+    ('pitches', 'INTEGER'),
+    ('commitment_grade', 'TEXT'),
+    ('fa', 'TEXT'),
+    ('description', 'TEXT'),
+    ('protection', 'TEXT'),
+    ('primary_photo_url', 'TEXT'),
+    ('insert_date', 'TIMESTAMPTZ')
+]
+
+# Derived from route_type and the ratings by src.analysis.grades.route_grade_columns
+ROUTE_GRADE_COLUMN_DEFS = [
+    ('primary_type', 'TEXT'),
+    ('is_trad', 'BOOLEAN'),
+    ('is_sport', 'BOOLEAN'),
+    ('is_boulder', 'BOOLEAN'),
+    ('is_aid', 'BOOLEAN'),
+    ('is_alpine', 'BOOLEAN'),
+    ('is_tr', 'BOOLEAN'),
+    ('route_grade', 'TEXT'),
+    ('grade_sort_value', 'INTEGER'),
+    ('grade_group_base', 'TEXT'),
+    ('grade_group_granular', 'TEXT')
+]
 
 @with_retry()
-def insert_routes_batch(cursor, routes_data, **kwargs):
-    failed_routes = []
-    try:
-        args_str = ','.join(
-            cursor.mogrify(
-                """(
-                    %(route_id)s, %(route_name)s, %(route_url)s, %(yds_rating)s, 
-                    %(hueco_rating)s, %(aid_rating)s, %(danger_rating)s, %(avg_stars)s, 
-                    %(num_votes)s, %(region)s, %(main_area)s, %(sub_area)s, 
-                    %(specific_location)s, %(route_type)s, %(length_ft)s, %(pitches)s, 
-                    %(commitment_grade)s, %(fa)s, %(description)s, %(protection)s, 
-                    %(primary_photo_url)s, %(insert_date)s
-                )""",
-                route
-            ).decode('utf-8')
-            for route in routes_data
+def insert_routes_batch(cursor, routes_data, stub=False, **kwargs):
+    """
+    stub=True inserts placeholder routes (e.g. from a tick export) so ticks can reference them;
+    a later full insert of the same route replaces the stub.
+    """
+    def describe_failure(route, error):
+        return {
+            'route_id': route.get('route_id'),
+            'route_name': route.get('route_name'),
+            'error': error
+        }
+
+    column_defs = ROUTE_COLUMN_DEFS + ROUTE_GRADE_COLUMN_DEFS
+    route_columns = ', '.join(name for name, _ in column_defs[1:])
+    # Full details overwrite a stub; anything else already stored is left alone
+    conflict_sql = "NOTHING" if stub else f"""UPDATE
+            SET ({route_columns}, is_stub) = (
+                {', '.join(f"EXCLUDED.{name}" for name, _ in column_defs[1:])}, false)
+            WHERE routes.Routes.is_stub"""
+    inserted_count, failed_routes = run_bulk_load(
+        cursor, 'routes', [{**route, **route_grade_columns(route)} for route in routes_data],
+        column_defs,
+        required={'route_id', 'route_name', 'route_url'},
+        describe_failure=describe_failure,
+        staging_table='routes_staging',
+        merge_sql=f"""
+            INSERT INTO routes.Routes (id, {route_columns}, is_stub)
+            SELECT route_id, {route_columns}, {"true" if stub else "false"}
+            FROM routes_staging
+            ORDER BY row_num
+            ON CONFLICT (id) DO {conflict_sql}
+        """)
+
+    if inserted_count:
+        failed_ids = {str(route['route_id']) for route in failed_routes}
+        refresh_route_estimates(cursor, [
+            route['route_id'] for route in routes_data
+            if str(route['route_id']) not in failed_ids])
+    return inserted_count, failed_routes
+
+def backfill_route_grade_columns(cursor, batch_size=5000):
+    """Fill the derived type and grade columns for routes inserted before they existed. Caller commits."""
+    source_columns = ['route_type', 'yds_rating', 'hueco_rating', 'aid_rating']
+    updated_count = 0
+    while True:
+        cursor.execute(f"""
+            SELECT id, {', '.join(source_columns)}
+            FROM routes.Routes
+            WHERE primary_type IS NULL
+            ORDER BY id
+            LIMIT %s
+        """, (batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        staged_rows = []
+        for row in rows:
+            derived = route_grade_columns(dict(zip(source_columns, row[1:])))
+            staged_rows.append([row[0]] + [derived[name] for name, _ in ROUTE_GRADE_COLUMN_DEFS])
+        stage_rows(cursor, 'route_grades_staging',
+                   [('route_id', 'INTEGER')] + ROUTE_GRADE_COLUMN_DEFS, staged_rows)
+        assignments = ',\n'.join(f"{name} = s.{name}" for name, _ in ROUTE_GRADE_COLUMN_DEFS)
+        cursor.execute(f"""
+            UPDATE routes.Routes r
+            SET {assignments}
+            FROM route_grades_staging s
+            WHERE r.id = s.route_id
+        """)
+        updated_count += cursor.rowcount
+        print(f"Backfilled grade columns for {updated_count} routes")
+    return updated_count
+
+def refresh_route_benchmarks(cursor):
+    """
+    Recompute choss_adjusted_benchmark for every route whose stored score is out of date.
+    The insert/update trigger keeps new rows current; run this after editing the
+    routes.benchmark_*_tiers tables. Caller commits.
+    """
+    cursor.execute("""
+        UPDATE routes.Routes
+        SET choss_adjusted_benchmark = routes.choss_adjusted_benchmark(avg_stars, num_votes, commitment_grade)
+        WHERE choss_adjusted_benchmark IS DISTINCT FROM
+            routes.choss_adjusted_benchmark(avg_stars, num_votes, commitment_grade)
+    """)
+    print(f"Refreshed benchmark scores for {cursor.rowcount} routes")
+    return cursor.rowcount
+
+# Route types with their own length averages in routes.route_type_averages.
+# route_type ~* key is the same match as route_type ILIKE '%key%' without escaping % for psycopg2
+ROUTE_TYPE_AVERAGE_KEYS = ['trad', 'sport', 'boulder', 'aid', 'alpine']
+# How long the per-type averages are trusted before they are recomputed from all routes
+ROUTE_TYPE_AVERAGES_MAX_AGE = '1 day'
+
+def type_average(column, key):
+    return f"(SELECT {column} FROM routes.route_type_averages WHERE route_type_key = '{key}')"
+
+ROUTE_ESTIMATES_SELECT = f"""
+    SELECT r.id,
+        CASE WHEN route_type ~* 'trad' AND length_ft IS NULL AND pitches IS NULL -- trad single-pitch
+            THEN {type_average('single_pitch_length', 'trad')}
+            WHEN route_type ~* 'trad' AND length_ft IS NULL AND pitches IS NOT NULL -- trad multipitch
+            THEN {type_average('pitch_length', 'trad')} * pitches
+            WHEN route_type ~* 'sport' AND length_ft IS NULL AND pitches IS NOT NULL -- sport single-pitch
+            THEN {type_average('single_pitch_length', 'sport')}
+            WHEN route_type ~* 'sport' AND length_ft IS NULL AND pitches IS NOT NULL -- sport multipitch
+            THEN {type_average('pitch_length', 'sport')} * pitches
+            WHEN route_type ~* 'boulder' AND length_ft IS NULL
+            THEN {type_average('route_length', 'boulder')} -- boulder
+            WHEN route_type ~* 'aid' AND length_ft IS NULL AND pitches IS NOT NULL -- aid multipitch
+            THEN {type_average('pitch_length', 'aid')} * pitches
+            ELSE {type_average('single_pitch_length', 'trad')}
+        END AS estimated_length,
+        CASE
+            WHEN pitches IS NOT NULL THEN pitches
+            WHEN route_type !~* 'trad'
+                AND route_type !~* 'sport'
+                AND route_type !~* 'aid'
+                AND route_type !~* 'alpine' THEN NULL
+            WHEN length_ft <= 230 THEN 1
+            WHEN length_ft IS NOT NULL and length_ft < 1000 THEN
+                CASE
+                    WHEN route_type ~* 'trad' THEN CEIL(length_ft / {type_average('long_route_pitch_length', 'trad')})
+                    WHEN route_type ~* 'sport' THEN CEIL(length_ft / {type_average('long_route_pitch_length', 'sport')})
+                    WHEN route_type ~* 'aid' THEN CEIL(length_ft / {type_average('long_route_pitch_length', 'aid')})
+                    WHEN route_type ~* 'alpine' THEN CEIL(length_ft / {type_average('long_route_pitch_length', 'alpine')})
+                    ELSE NULL
+                END
+            ELSE NULL
+        END AS estimated_pitches,
+        now()
+    FROM routes.Routes r
+"""
+
+def refresh_route_type_averages(cursor):
+    """Recompute the per-route-type length averages the estimates are built from"""
+    cursor.execute("""
+        INSERT INTO routes.route_type_averages (
+            route_type_key, single_pitch_length, route_length, pitch_length,
+            long_route_pitch_length, updated_at
         )
+        SELECT k.key,
+            avg(r.length_ft) FILTER (WHERE r.pitches IS NULL AND r.length_ft < 230),
+            avg(r.length_ft),
+            avg(r.length_ft / r.pitches) FILTER (WHERE r.pitches IS NOT NULL),
+            avg(r.length_ft / r.pitches) FILTER (WHERE r.pitches > 2),
+            now()
+        FROM unnest(%s::text[]) AS k(key)
+        LEFT JOIN routes.Routes r
+            ON r.route_type ~* k.key
+            AND r.length_ft IS NOT NULL
+        GROUP BY k.key
+        ON CONFLICT (route_type_key) DO UPDATE
+        SET single_pitch_length = EXCLUDED.single_pitch_length,
+            route_length = EXCLUDED.route_length,
+            pitch_length = EXCLUDED.pitch_length,
+            long_route_pitch_length = EXCLUDED.long_route_pitch_length,
+            updated_at = EXCLUDED.updated_at
+    """, (ROUTE_TYPE_AVERAGE_KEYS,))
 
-        route_sql = f"""
-        INSERT INTO routes.Routes (
-            id, route_name, route_url, yds_rating, hueco_rating, aid_rating, 
-            danger_rating, avg_stars, num_votes, region, main_area, sub_area, 
-            specific_location, route_type, length_ft, pitches, commitment_grade, 
-            fa, description, protection, primary_photo_url, insert_date
-        ) VALUES {args_str}
-        ON CONFLICT (id) DO NOTHING
-        RETURNING id
-        """ 
-        cursor.execute(route_sql)
-        inserted_count = cursor.rowcount
-        print(f"Successfully inserted {inserted_count} routes")
-        return inserted_count, []
-        
-    except Exception as e:
-        print(f"Batch insert failed: {str(e)}")
-        print("Falling back to individual inserts...")
-        
-        # Second try: Insert routes one at a time
-        successful_count = 0
-        for route in routes_data:
-            try:
-                cursor.execute("""
-                    INSERT INTO routes.Routes (
-                        id, route_name, route_url, yds_rating, hueco_rating, aid_rating, 
-                        danger_rating, avg_stars, num_votes, region, main_area, sub_area, 
-                        specific_location, route_type, length_ft, pitches, commitment_grade, 
-                        fa, description, protection, primary_photo_url, insert_date
-                    ) VALUES (
-                        %(route_id)s, %(route_name)s, %(route_url)s, %(yds_rating)s, 
-                        %(hueco_rating)s, %(aid_rating)s, %(danger_rating)s, %(avg_stars)s, 
-                        %(num_votes)s, %(region)s, %(main_area)s, %(sub_area)s, 
-                        %(specific_location)s, %(route_type)s, %(length_ft)s, %(pitches)s, 
-                        %(commitment_grade)s, %(fa)s, %(description)s, %(protection)s, 
-                        %(primary_photo_url)s, %(insert_date)s
-                    ) ON CONFLICT (id) DO NOTHING
-                    RETURNING id
-                """, route)
-                cursor.connection.commit()
-                
-                if cursor.rowcount > 0:
-                    successful_count += 1
-                    
-            except Exception as e:
-                failed_routes.append({
-                    'route_id': route['route_id'],
-                    'route_name': route['route_name'],
-                    'error': str(e)
-                })
-                print(f"Failed to insert route {route['route_id']} - {route['route_name']}: {str(e)}")
-                continue
-        
-        print(f"\nIndividual inserts complete:")
-        print(f"Successfully inserted: {successful_count} routes")
-        if failed_routes:
-            print(f"Failed to insert {len(failed_routes)} routes:")
-            for route in failed_routes:
-                print(f"- Route {route['route_id']} ({route['route_name']})")
-        
-        return successful_count, failed_routes
\ No newline at end of file
+def route_type_averages_stale(cursor):
+    cursor.execute(f"""
+        SELECT COALESCE(min(updated_at) < now() - interval '{ROUTE_TYPE_AVERAGES_MAX_AGE}', true)
+        FROM routes.route_type_averages
+    """)
+    return cursor.fetchone()[0]
+
+@with_retry()
+def refresh_route_estimates(cursor, route_ids=None, **kwargs):
+    """
+    Upsert routes.route_estimates for route_ids from the current per-type averages, or
+    recompute the averages and re-estimate every route when route_ids is None.
+    The insert path only ever passes route_ids; full refreshes belong to db_setup and
+    refresh_stale_route_estimates. Caller commits.
+    """
+    if route_ids is None:
+        refresh_route_type_averages(cursor)
+
+    where_sql = "" if route_ids is None else "WHERE r.id = ANY(%s)"
+    params = None if route_ids is None else ([int(id) for id in route_ids],)
+    cursor.execute(f"""
+        INSERT INTO routes.route_estimates (route_id, estimated_length, estimated_pitches, updated_at)
+        {ROUTE_ESTIMATES_SELECT}
+        {where_sql}
+        ORDER BY r.id
+        ON CONFLICT (route_id) DO UPDATE
+        SET estimated_length = EXCLUDED.estimated_length,
+            estimated_pitches = EXCLUDED.estimated_pitches,
+            updated_at = EXCLUDED.updated_at
+    """, params)
+    print(f"Refreshed estimates for {cursor.rowcount} routes")
+    return cursor.rowcount
+
+def refresh_stale_route_estimates(cursor):
+    """
+    Full refresh once the per-type averages are older than ROUTE_TYPE_AVERAGES_MAX_AGE.
+    Run from the scheduled backfill job, never from the insert path. Caller commits.
+    """
+    if not route_type_averages_stale(cursor):
+        return 0
+    return refresh_route_estimates(cursor)
+
+FA_COLUMN_DEFS = [
+    ('route_id', 'INTEGER'),
+    ('fa_name', 'TEXT'),
+    ('fa_type', 'TEXT'),
+    ('year', 'INTEGER'),
+    ('insert_date', 'TIMESTAMP')
+]
+FA_COLUMNS = [name for name, _ in FA_COLUMN_DEFS]
+
+@with_retry()
+def replace_fa_rows(cursor, route_ids, fa_rows, **kwargs):
+    """
+    Replace the analysis.fa rows for route_ids with fa_rows (dicts with FA_COLUMNS keys).
+    Rows are COPYed into a transaction-scoped staging table, then swapped in per route.
+    Caller commits.
+    """
+    route_id_list = [int(id) for id in route_ids]
+    if not route_id_list:
+        return 0
+
+    stage_rows(cursor, 'fa_staging', FA_COLUMN_DEFS, (
+        (int(row['route_id']), row['fa_name'], row['fa_type'],
+         int(row['year']) if row['year'] and str(row['year']).isdigit() else None,
+         row['insert_date'])
+        for row in fa_rows
+    ))
+
+    cursor.execute(
+        "DELETE FROM analysis.fa WHERE route_id = ANY(%s)", (route_id_list,))
+    cursor.execute(f"""
+        INSERT INTO analysis.fa ({', '.join(FA_COLUMNS)})
+        SELECT {', '.join(FA_COLUMNS)} FROM fa_staging
+    """)
+    inserted_count = cursor.rowcount
+    print(f"Replaced FA rows for {len(route_id_list)} routes ({inserted_count} rows)")
+    return inserted_count
+
+@with_retry()
+def refresh_route_tags(cursor, route_ids=None, **kwargs):
+    """
+    Rebuild analysis.route_tags (behind TagAnalysisView) and analysis.route_tag_index for
+    route_ids, or for every route when route_ids is None. Caller commits.
+    """
+    params = (None if route_ids is None else [int(id) for id in route_ids],)
+    cursor.execute("SELECT analysis.refresh_route_tags(%s::integer[])", params)
+    refreshed = cursor.fetchone()[0]
+    print(f"Refreshed tags for {refreshed} routes")
+    return refreshed
+
+@with_retry()
+def queue_scrape_pages(cursor, user_id, total_pages, **kwargs):
+    """Record the pages the orchestrator is about to queue so workers can tell when a scrape is done"""
+    cursor.execute("""
+        INSERT INTO routes.scrape_pages (user_id, page_number, status, queued_at, completed_at)
+        SELECT %s, page_number, 'queued', now(), NULL
+        FROM generate_series(1, %s) AS page_number
+        ON CONFLICT (user_id, page_number) DO UPDATE
+        SET status = 'queued', queued_at = now(), completed_at = NULL, route_ids = NULL
+    """, (user_id, total_pages))
+    cursor.execute(
+        "DELETE FROM routes.scrape_pages WHERE user_id = %s AND page_number > %s",
+        (user_id, total_pages))
+
+def complete_scrape_page(cursor, user_id, page_number):
+    """
+    Mark a page done; run inside the page's transaction so it commits with the page's data.
+    Returns 0 for pages that weren't queued by the orchestrator.
+    """
+    cursor.execute("""
+        UPDATE routes.scrape_pages
+        SET status = 'done', completed_at = now()
+        WHERE user_id = %s AND page_number = %s
+    """, (user_id, page_number))
+    return cursor.rowcount
+
+def checkpoint_scrape_page(cursor, user_id, page_number, route_ids):
+    """
+    Record that a page's ticks are stored and which routes it still needs fetched, so a retry
+    resumes from queueing those routes instead of re-scraping the page. Caller commits.
+    """
+    cursor.execute("""
+        UPDATE routes.scrape_pages
+        SET status = 'ticks_stored', route_ids = %s
+        WHERE user_id = %s AND page_number = %s
+    """, ([int(id) for id in route_ids], user_id, page_number))
+    return cursor.rowcount
+
+def get_scrape_page(cursor, user_id, page_number):
+    """(status, route_ids) for a tracked page, or None"""
+    cursor.execute("""
+        SELECT status, route_ids FROM routes.scrape_pages
+        WHERE user_id = %s AND page_number = %s
+    """, (user_id, page_number))
+    return cursor.fetchone()
+
+def get_route_stubs(cursor, route_ids):
+    """{route_id: (route_name, route_url)} for route_ids that are still stubs"""
+    cursor.execute("""
+        SELECT id, route_name, route_url FROM routes.Routes
+        WHERE id = ANY(%s) AND is_stub
+    """, ([int(id) for id in route_ids],))
+    return {str(row[0]): (row[1], row[2]) for row in cursor.fetchall()}
+
+def scrape_pages_remaining(cursor, user_id):
+    cursor.execute("""
+        SELECT count(*) FROM routes.scrape_pages
+        WHERE user_id = %s AND status <> 'done'
+    """, (user_id,))
+    return cursor.fetchone()[0]
+
+# A claim older than this is assumed to belong to a dead route worker and can be taken over
+ROUTE_CLAIM_TIMEOUT = '15 minutes'
+
+def claim_routes(cursor, route_ids, user_id):
+    """
+    Claim routes for a route worker message so concurrent ticks pages don't queue them twice.
+    A route only leased by the prescraper is claimed too, so the user's stats wait for it.
+    Returns the ids this caller claimed. Caller commits.
+    """
+    cursor.execute(f"""
+        INSERT INTO routes.route_claims (route_id, user_id, claimed_at)
+        SELECT route_id, %s, now() FROM unnest(%s::integer[]) AS route_id
+        ON CONFLICT (route_id) DO UPDATE
+        SET user_id = EXCLUDED.user_id, claimed_at = EXCLUDED.claimed_at
+        WHERE routes.route_claims.claimed_at < now() - interval '{ROUTE_CLAIM_TIMEOUT}'
+        OR routes.route_claims.user_id IS NULL
+        RETURNING route_id
+    """, (user_id, [int(id) for id in route_ids]))
+    return {row[0] for row in cursor.fetchall()}
+
+# A fetch lease not renewed for this long belongs to a dead worker and can be taken over
+ROUTE_LEASE_TIMEOUT = '10 minutes'
+
+def lease_routes(cursor, route_ids, lease_owner, user_id=None):
+    """
+    Take or renew a fetch lease on each route's route_claims row, so only one worker fetches
+    and analyzes a route at a time. Routes without a claim row get one (user_id None for the
+    prescraper). Renewing also refreshes the claim, so a route being worked on never looks stale.
+    Returns the ids leased to lease_owner. Commit straight away so other workers see the lease.
+    """
+    cursor.execute(f"""
+        INSERT INTO routes.route_claims (route_id, user_id, claimed_at, lease_owner, leased_at)
+        SELECT route_id, %s, now(), %s, now()
+        FROM unnest(%s::integer[]) AS route_id
+        ORDER BY route_id
+        ON CONFLICT (route_id) DO UPDATE
+        SET claimed_at = EXCLUDED.claimed_at,
+            lease_owner = EXCLUDED.lease_owner,
+            leased_at = EXCLUDED.leased_at
+        WHERE routes.route_claims.lease_owner IS NULL
+        OR routes.route_claims.lease_owner = EXCLUDED.lease_owner
+        OR routes.route_claims.leased_at < now() - interval '{ROUTE_LEASE_TIMEOUT}'
+        RETURNING route_id
+    """, (user_id, lease_owner, [int(id) for id in route_ids]))
+    return {row[0] for row in cursor.fetchall()}
+
+def release_route_leases(cursor, lease_owner, route_ids=None):
+    """
+    Give up lease_owner's leases (all of them when route_ids is None) without storing the
+    routes. Scrape claims stay for their retry; lease-only rows are removed. Caller commits.
+    """
+    params = (lease_owner, None if route_ids is None else [int(id) for id in route_ids])
+    cursor.execute("""
+        UPDATE routes.route_claims
+        SET lease_owner = NULL, leased_at = NULL
+        WHERE lease_owner = %s
+        AND (%s::integer[] IS NULL OR route_id = ANY(%s::integer[]))
+        RETURNING route_id
+    """, params + params[1:])
+    released = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        DELETE FROM routes.route_claims
+        WHERE route_id = ANY(%s) AND user_id IS NULL AND lease_owner IS NULL
+    """, (released,))
+
+def release_route_claims(cursor, route_ids):
+    cursor.execute(
+        "DELETE FROM routes.route_claims WHERE route_id = ANY(%s)",
+        ([int(id) for id in route_ids],))
+
+def route_claims_remaining(cursor, user_id):
+    """Route batches a user's scrape queued that haven't finished"""
+    cursor.execute(f"""
+        SELECT count(*) FROM routes.route_claims
+        WHERE user_id = %s AND claimed_at >= now() - interval '{ROUTE_CLAIM_TIMEOUT}'
+    """, (user_id,))
+    return cursor.fetchone()[0]
+
+def get_scraped_users_for_routes(cursor, route_ids):
+    """Users with a tracked scrape whose ticks include route_ids"""
+    cursor.execute("""
+        SELECT DISTINCT t.user_id
+        FROM routes.Ticks t
+        WHERE t.route_id = ANY(%s)
+        AND EXISTS (SELECT 1 FROM routes.scrape_pages sp WHERE sp.user_id = t.user_id)
+    """, ([int(id) for id in route_ids],))
+    return [row[0] for row in cursor.fetchall()]
+
+LEAD_TICK_TYPES_SQL = "'Lead / Pinkpoint', 'Lead / Onsight', 'Lead / Redpoint', 'Lead / Flash'"
+
+USER_STATS_AGGREGATES = """
+    COUNT(DISTINCT date) AS days_logged,
+    SUM(partial_length) AS total_distance,
+    SUM(length) AS total_length,
+    SUM(pitches) AS total_pitches,
+    SUM(length) FILTER (WHERE NOT is_boulder) AS non_boulder_distance,
+    SUM(partial_length) FILTER (WHERE NOT is_boulder) AS non_boulder_distance_partial,
+    COALESCE(SUM(length) FILTER (WHERE is_boulder), 0) AS boulder_distance,
+    COUNT(*) FILTER (WHERE NOT is_boulder) AS non_boulder_routes,
+    COUNT(*) FILTER (WHERE is_boulder) AS boulder_routes,
+    COUNT(DISTINCT date) FILTER (WHERE NOT is_boulder) AS roped_days,
+    COUNT(*) AS total_routes_climbed,
+    COUNT(DISTINCT route_id) AS total_unique_routes,
+    MAX(trad_grade_sort) AS trad_grade_sort,
+    MAX(sport_grade_sort) AS sport_grade_sort,
+    MAX(boulder_grade_sort) AS boulder_grade_sort,
+    MAX(aid_grade_sort) AS aid_grade_sort,
+    COUNT(DISTINCT region) AS regions_climbed,
+    COUNT(DISTINCT sub_area) AS sub_areas_climbed,
+    MIN(date) AS first_date,
+    MAX(date) AS last_date
+"""
+
+# (grain, period label, period_start, year, GROUP BY) for each rollup grain.
+# Labels match the periods get_period_stats has always returned.
+USER_STATS_GRAINS = [
+    ('day', "date::text", "date", "year", "GROUP BY date, year"),
+    ('month', "TO_CHAR(month_start, 'Mon YYYY')", "month_start", "year", "GROUP BY month_start, year"),
+    ('season', """CASE EXTRACT(QUARTER FROM season_start)
+            WHEN 1 THEN 'Winter' WHEN 2 THEN 'Spring' WHEN 3 THEN 'Summer' ELSE 'Fall'
+        END || ' ' || year::text""", "season_start", "year", "GROUP BY season_start, year"),
+    ('year', "year::text", "make_date(year, 1, 1)", "year", "GROUP BY year"),
+    ('all', "'Full Year'", "MIN(date)", "NULL::integer", "HAVING COUNT(*) > 0")
+]
+
+def grade_for_sort(grade_system, sort_column):
+    return f"""(SELECT grade FROM routes.grade_sort
+            WHERE grade_system = '{grade_system}' AND sort_order = g.{sort_column} LIMIT 1)"""
+
+@with_retry()
+def refresh_user_stats(cursor, user_id, **kwargs):
+    """
+    Rebuild analysis.user_stats for one user from their ticks: one row per day, month,
+    season and year climbed, plus an 'all' row. Caller commits.
+    """
+    grain_selects = '\n        UNION ALL\n'.join(f"""
+        SELECT '{grain}' AS grain, {period} AS period, {period_start} AS period_start,
+            {year} AS year, {USER_STATS_AGGREGATES}
+        FROM tick_stats
+        {group_by}""" for grain, period, period_start, year, group_by in USER_STATS_GRAINS)
+
+    # Concurrent refreshes for the same user would collide on the primary key
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('user_stats:' || %s))", (user_id,))
+    cursor.execute("DELETE FROM analysis.user_stats WHERE user_id = %s", (user_id,))
+    cursor.execute(f"""
+        WITH tick_stats AS MATERIALIZED (
+            SELECT
+                t.date::date AS date,
+                date_trunc('month', t.date)::date AS month_start,
+                date_trunc('quarter', t.date)::date AS season_start,
+                EXTRACT(YEAR FROM t.date)::integer AS year,
+                t.route_id,
+                r.region,
+                r.sub_area,
+                r.route_type ~* 'boulder' AS is_boulder,
+                coalesce(t.pitches_climbed, r.pitches, re.estimated_pitches) AS pitches,
+                coalesce(r.length_ft, re.estimated_length) AS length,
+                coalesce(r.length_ft, re.estimated_length) *
+                CASE
+                    WHEN t.pitches_climbed IS NOT NULL
+                        AND r.pitches IS NOT NULL
+                        AND t.pitches_climbed <= r.pitches THEN
+                        (t.pitches_climbed::numeric / r.pitches)
+                    ELSE 1
+                END AS partial_length,
+                CASE WHEN t.type IN ({LEAD_TICK_TYPES_SQL}) AND r.route_type ~* 'trad'
+                    THEN gs_yds.sort_order END AS trad_grade_sort,
+                CASE WHEN t.type IN ({LEAD_TICK_TYPES_SQL}) AND r.route_type ~* 'sport'
+                    THEN gs_yds.sort_order END AS sport_grade_sort,
+                CASE WHEN t.type != 'Attempt' THEN gs_boulder.sort_order END AS boulder_grade_sort,
+                gs_aid.sort_order AS aid_grade_sort
+            FROM routes.Ticks t
+            JOIN routes.Routes r ON t.route_id = r.id
+            LEFT JOIN routes.route_estimates re ON re.route_id = r.id
+            LEFT JOIN routes.grade_sort gs_yds ON
+                gs_yds.grade_system = 'YDS' AND gs_yds.grade = r.yds_rating
+            LEFT JOIN routes.grade_sort gs_boulder ON
+                gs_boulder.grade_system = 'Boulder' AND gs_boulder.grade = r.hueco_rating
+            LEFT JOIN routes.grade_sort gs_aid ON
+                gs_aid.grade_system = 'Aid' AND gs_aid.grade = r.aid_rating
+            WHERE t.user_id = %s
+            AND t.date IS NOT NULL
+        ),
+        grain_stats AS ({grain_selects}
+        )
+        INSERT INTO analysis.user_stats (
+            user_id, grain, period, period_start, year, days_logged,
+            total_distance, total_length, total_pitches,
+            non_boulder_distance, non_boulder_distance_partial, boulder_distance,
+            non_boulder_routes, boulder_routes, roped_days,
+            total_routes_climbed, total_unique_routes,
+            highest_trad_grade, highest_sport_grade, highest_boulder, highest_aid,
+            regions_climbed, sub_areas_climbed, first_date, last_date, updated_at
+        )
+        SELECT
+            %s, g.grain, g.period, g.period_start, g.year, g.days_logged,
+            g.total_distance, g.total_length, g.total_pitches,
+            g.non_boulder_distance, g.non_boulder_distance_partial, g.boulder_distance,
+            g.non_boulder_routes, g.boulder_routes, g.roped_days,
+            g.total_routes_climbed, g.total_unique_routes,
+            {grade_for_sort('YDS', 'trad_grade_sort')},
+            {grade_for_sort('YDS', 'sport_grade_sort')},
+            {grade_for_sort('Boulder', 'boulder_grade_sort')},
+            {grade_for_sort('Aid', 'aid_grade_sort')},
+            g.regions_climbed, g.sub_areas_climbed, g.first_date, g.last_date, now()
+        FROM grain_stats g
+    """, (user_id, user_id))
+    print(f"Rebuilt {cursor.rowcount} user_stats rows for user {user_id}")
+    return cursor.rowcount
@@ -1,33 +1,114 @@
 import os
+import threading
+import time
 from contextlib import contextmanager
 
+# Module-level pool so warm Lambda invocations reuse open connections instead of
+# paying a TLS handshake to Neon every page. Point POSTGRES_HOST at the -pooler
+# endpoint; nothing here relies on session state (temp tables are ON COMMIT DROP).
+POOL_MAX_CONNECTIONS = int(os.getenv('POSTGRES_POOL_MAX', '4'))
+# Connections idle longer than this are pinged before being handed out
+POOL_PING_AFTER_SECONDS = int(os.getenv('POSTGRES_POOL_PING_AFTER', '30'))
+
+_pool = None
+_pool_lock = threading.Lock()
+_last_used = {}
+
+def connection_params():
+    return dict(
+        dbname=os.getenv('POSTGRES_DB', 'mp_scrape'),
+        user=os.getenv('POSTGRES_USER', 'postgres'),
+        password=os.getenv('POSTGRES_PASSWORD'),
+        host=os.getenv('POSTGRES_HOST'),
+        port=os.getenv('POSTGRES_PORT', '5432'),
+        sslmode='require',
+        connect_timeout=20,
+        # Let the OS notice connections Neon dropped while the container was frozen
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3
+    )
+
+def get_pool():
+    """Create the connection pool on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from psycopg2.pool import ThreadedConnectionPool
+                print(f"Creating connection pool to {os.getenv('POSTGRES_HOST')}")
+                _pool = ThreadedConnectionPool(
+                    0, POOL_MAX_CONNECTIONS, **connection_params())
+    return _pool
+
+def is_healthy(connection):
+    """Cheap liveness check, only run on connections that sat idle for a while"""
+    if connection.closed:
+        return False
+    last_used = _last_used.get(id(connection))
+    if last_used and time.monotonic() - last_used < POOL_PING_AFTER_SECONDS:
+        return True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.rollback()
+        return True
+    except Exception as e:
+        print(f"Discarding stale pooled connection: {e}")
+        return False
+
+def get_connection():
+    """Take a healthy connection from the pool; pair with release_connection"""
+    pool = get_pool()
+    for _ in range(POOL_MAX_CONNECTIONS + 1):
+        connection = pool.getconn()
+        if is_healthy(connection):
+            return connection
+        _last_used.pop(id(connection), None)
+        pool.putconn(connection, close=True)
+    raise RuntimeError("Could not get a healthy database connection from the pool")
+
+def release_connection(connection, close=False):
+    """Return a connection to the pool, discarding any uncommitted work"""
+    if _pool is None or connection is None:
+        return
+    if not close and not connection.closed:
+        try:
+            connection.rollback()
+        except Exception:
+            close = True
+    close = close or bool(connection.closed)
+    if close:
+        _last_used.pop(id(connection), None)
+    else:
+        _last_used[id(connection)] = time.monotonic()
+    _pool.putconn(connection, close=close)
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
 @contextmanager
 def create_connection():
-    """Create a PostgreSQL database connection - fail fast, no retries"""
+    """Borrow a pooled PostgreSQL connection - fail fast, no retries. Uncommitted work is rolled back."""
     import psycopg2
-    print("Initialized DB dependencies")
-
+    connection = None
+    broken = False
     try:
-        host = os.getenv('POSTGRES_HOST')
-        print(f"Attempting connection to {host}")
-        connection = psycopg2.connect(
-            dbname=os.getenv('POSTGRES_DB', 'mp_scrape'),
-            user=os.getenv('POSTGRES_USER', 'postgres'),
-            password=os.getenv('POSTGRES_PASSWORD'),
-            host=host,
-            port=os.getenv('POSTGRES_PORT', '5432'),
-            sslmode='require',
-            connect_timeout=20
-        )
-        print("Connected successfully")
+        connection = get_connection()
         yield connection
-    except Exception as e:
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
         print(f"Connection failed: {e}")
+        broken = True
         raise  # Fail fast, let Lambda handle retries
     finally:
-        if 'connection' in locals() and connection and not connection.closed:
-            connection.close()
-            print("Connection closed")
+        if connection is not None:
+            release_connection(connection, close=broken)
 
 def add_new_tags_to_mapping(cursor):
     """Add any new tags from Tags table to TagMapping with default values"""
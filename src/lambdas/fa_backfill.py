@@ -0,0 +1,174 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(project_root)
+
+import argparse
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from src.analysis.fa_parsing import parse_fa_batch
+from src.database import queries
+from src.database.utils import create_connection
+
+JOB_NAME = 'fa_backfill'
+BATCH_SIZE = 2000
+# Lambda has no /dev/shm, so process pools can't start there
+IN_LAMBDA = 'AWS_LAMBDA_FUNCTION_NAME' in os.environ
+
+
+def get_watermark(cursor):
+    cursor.execute(
+        "SELECT last_insert_date FROM analysis.job_watermarks WHERE job_name = %s",
+        (JOB_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(cursor, last_insert_date):
+    cursor.execute("""
+        INSERT INTO analysis.job_watermarks (job_name, last_insert_date, updated_at)
+        VALUES (%s, %s, now())
+        ON CONFLICT (job_name) DO UPDATE
+        SET last_insert_date = EXCLUDED.last_insert_date,
+            updated_at = now()
+    """, (JOB_NAME, last_insert_date))
+
+
+def parse_rows(rows):
+    """Turn (route_id, fa, insert_date) rows into analysis.fa rows. Runs in worker processes."""
+    insert_date = datetime.now(timezone.utc).isoformat()
+    parsed = parse_fa_batch([fa for _, fa, _ in rows])
+    return [
+        {
+            'route_id': route_id,
+            'fa_name': fa['name'],
+            'fa_type': fa['type'],
+            'year': fa['year'],
+            'insert_date': insert_date
+        }
+        for (route_id, _, _), route_fas in zip(rows, parsed)
+        for fa in route_fas
+    ]
+
+
+def parse_batches(batches, workers):
+    """Yield (rows, fa_rows) in order, keeping at most 2 batches per worker in flight"""
+    if workers <= 1:
+        for rows in batches:
+            yield rows, parse_rows(rows)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for rows in batches:
+            pending.append((rows, executor.submit(parse_rows, rows)))
+            if len(pending) >= workers * 2:
+                rows, future = pending.popleft()
+                yield rows, future.result()
+        while pending:
+            rows, future = pending.popleft()
+            yield rows, future.result()
+
+
+def stream_routes(cursor, since, batch_size):
+    """Server-side cursor over routes.Routes, oldest insert_date first"""
+    if since is None:
+        cursor.execute("""
+            SELECT id, fa, insert_date
+            FROM routes.Routes
+            ORDER BY insert_date NULLS FIRST, id
+        """)
+    else:
+        # >= so routes sharing the watermark timestamp are never skipped; reprocessing is idempotent
+        cursor.execute("""
+            SELECT id, fa, insert_date
+            FROM routes.Routes
+            WHERE insert_date >= %s
+            ORDER BY insert_date, id
+        """, (since,))
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def run_backfill(full=False, workers=None, batch_size=BATCH_SIZE):
+    """
+    Materialize analysis.fa for every route newer than the last run (or all routes if full),
+    then refresh the route estimates if their per-type averages have gone stale
+    """
+    workers = 1 if IN_LAMBDA else (workers or os.cpu_count() or 1)
+    routes_processed = 0
+    fa_rows_written = 0
+
+    with create_connection() as read_conn, create_connection() as write_conn:
+        write_cursor = write_conn.cursor()
+        since = None if full else get_watermark(write_cursor)
+        print(f"Starting FA backfill since {since or 'the beginning'} with {workers} workers")
+
+        read_cursor = read_conn.cursor(name='fa_backfill_routes')
+        read_cursor.itersize = batch_size
+
+        batches = stream_routes(read_cursor, since, batch_size)
+        for rows, fa_rows in parse_batches(batches, workers):
+            route_ids = [route_id for route_id, _, _ in rows]
+            fa_rows_written += queries.replace_fa_rows(write_cursor, route_ids, fa_rows)
+
+            batch_watermark = max(
+                (insert_date for _, _, insert_date in rows if insert_date),
+                default=None)
+            if batch_watermark:
+                set_watermark(write_cursor, batch_watermark)
+            write_conn.commit()
+
+            routes_processed += len(rows)
+            print(f"Processed {routes_processed} routes, {fa_rows_written} FA rows written")
+
+        read_cursor.close()
+
+        # The length averages drift as routes come in; keep the recompute off the insert path
+        estimates_refreshed = queries.refresh_stale_route_estimates(write_cursor)
+        write_conn.commit()
+
+    return {
+        'routes_processed': routes_processed,
+        'fa_rows_written': fa_rows_written,
+        'route_estimates_refreshed': estimates_refreshed,
+        'since': since.isoformat() if since else None
+    }
+
+
+def lambda_handler(event, context):
+    try:
+        result = run_backfill(
+            full=bool(event.get('full', False)),
+            batch_size=int(event.get('batch_size', BATCH_SIZE)))
+        return {
+            'statusCode': 200,
+            'body': json.dumps(result)
+        }
+    except Exception as e:
+        print(f"Error in FA backfill: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f'Error: {str(e)}')
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Materialize analysis.fa from routes.Routes.fa')
+    parser.add_argument('--full', action='store_true',
+                        help='Reparse every route instead of only routes newer than the last run')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parser processes (defaults to CPU count)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(run_backfill(full=args.full, workers=args.workers,
+                       batch_size=args.batch_size))
@@ -6,7 +6,10 @@ sys.path.append(project_root)
 
 import json
 import boto3
-from src.scraping import helper_functions
+import psycopg2
+from src.scraping import helper_functions, tick_export
+from src.database import queries
+from src.database.utils import create_connection
 
 sqs = boto3.client('sqs')
 NEW_SCRAPE_QUEUE_URL = os.environ['NEW_SCRAPE_QUEUE_URL']
@@ -19,8 +22,11 @@ def lambda_handler(event, context):
                 try:
                     message = json.loads(record['body'])
                     user_id = message['user_id']
+                    # Refresh Data only needs the pages with ticks logged since the last scrape
+                    # (when the tick export is unavailable and the ticks pages are walked instead)
+                    incremental = message.get('action') == 'refresh_user_scrape'
 
-                    scrape_user(user_id)
+                    scrape_user(user_id, incremental=incremental)
                 except Exception as e:
                     print(f"Error processing message: {str(e)}")
                     raise e
@@ -36,7 +42,68 @@ def lambda_handler(event, context):
             'body': json.dumps(f'Error: {str(e)}')
         }
 
-def scrape_user(user_id):
+def find_refresh_pages(cursor, user_id, ticks_url, total_pages):
+    """
+    How many leading pages hold ticks that aren't stored yet. Ticks are listed newest first,
+    so the walk stops at the first fully known page, or the page holding the latest stored tick.
+    A user with no stored ticks needs every page.
+    """
+    latest_tick = queries.get_latest_tick_key(cursor, user_id)
+    if latest_tick is None:
+        return total_pages
+
+    pages_to_scrape = 0
+    for page_num in range(1, total_pages + 1):
+        page_keys = helper_functions.get_page_tick_keys(ticks_url, page_num, user_id)
+        known_keys = queries.get_known_tick_keys(
+            cursor, user_id, {key[0] for key in page_keys})
+        if all(key in known_keys for key in page_keys):
+            break
+        pages_to_scrape = page_num
+        if latest_tick in page_keys:
+            break
+
+    print(f"{pages_to_scrape} of {total_pages} pages have new ticks")
+    return pages_to_scrape
+
+def scrape_user_from_export(user_id):
+    """One-request ingest from the tick export; returns None to fall back to the ticks pages"""
+    with create_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            routes_to_fetch = tick_export.ingest_tick_export(cursor, user_id)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except Exception as e:
+            print(f"Tick export ingest failed: {str(e)}")
+            routes_to_fetch = None
+        if routes_to_fetch is None:
+            conn.rollback()
+            return None
+
+        # The export counts as the scrape's single page, already done
+        queries.queue_scrape_pages(cursor, user_id, 1)
+        queries.complete_scrape_page(cursor, user_id, 1)
+        claimed_routes = queries.claim_routes(cursor, routes_to_fetch.keys(), user_id)
+        conn.commit()
+
+        routes_to_queue = {
+            route_id: route for route_id, route in routes_to_fetch.items()
+            if int(route_id) in claimed_routes
+        }
+        helper_functions.queue_claimed_routes(conn, cursor, user_id, routes_to_queue)
+        helper_functions.refresh_stats_if_done(conn, cursor, user_id, True)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'user_id': user_id,
+            'source': 'tick_export',
+            'routes_queued': len(routes_to_queue)
+        })
+    }
+
+def scrape_user(user_id, incremental=False):
     base_url = f'https://www.mountainproject.com/user/{user_id}'
     ticks_url = f'{base_url}/ticks?page='
 
@@ -44,8 +111,22 @@ def scrape_user(user_id):
     print(f"Queue URL: {NEW_SCRAPE_QUEUE_URL}")
 
     try:
+        # The export covers new and refreshed users alike: it syncs the user's stored ticks
+        # to their ticklist, so the incremental page walk below only runs when the export fails
+        export_result = scrape_user_from_export(user_id)
+        if export_result is not None:
+            return export_result
+        print("Tick export unavailable, falling back to ticks pages")
+
         total_pages = helper_functions.get_total_pages(ticks_url)
         print(f"Found {total_pages} pages to scrape")
+
+        with create_connection() as conn:
+            cursor = conn.cursor()
+            if incremental:
+                total_pages = find_refresh_pages(cursor, user_id, ticks_url, total_pages)
+            queries.queue_scrape_pages(cursor, user_id, total_pages)
+            conn.commit()
         
         for i in range(1, total_pages + 1, BATCH_SIZE): # page numbers start at 1
             batch = []
@@ -18,6 +18,19 @@ def lambda_handler(event, context):
             try:
                 message = json.loads(record['body'])
                 retry_count = message.get('retry_count', 0) + 1
+                if 'routes' in message:
+                    print(f"Retrying {len(message['routes'])} routes for user {message['user_id']}")
+                    if retry_count <= 3:
+                        helper_functions.process_route_batch(
+                            user_id=message['user_id'],
+                            routes_to_fetch={
+                                route_id: (route_name, route_link)
+                                for route_id, route_name, route_link in message['routes']
+                            },
+                            fetch_mode=message.get('fetch_mode')
+                        )
+                    continue
+
                 page_number = message['page_number']
                 ticks_url = message['ticks_url']
                 user_id = message['user_id']
@@ -33,12 +46,13 @@ def lambda_handler(event, context):
                         page_number=page_number,
                         ticks_url = ticks_url,
                         user_id= user_id,
-                        retry_count=retry_count
+                        retry_count=retry_count,
+                        fetch_mode=message.get('fetch_mode')
                     )
                     print(f"Successfully processed failed page {message['page_number']}")
 
             except Exception as e:
-                print(f"Page {message['page_number']} exceeded max retries")
+                print(f"{'Page ' + str(message['page_number']) if 'page_number' in message else 'Route batch'} exceeded max retries")
                 error_context = {
                     "original_message": message,
                     "error_type": str(type(e).__name__),
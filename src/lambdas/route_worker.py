@@ -0,0 +1,49 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(project_root)
+
+import json
+import traceback
+from datetime import datetime
+
+def lambda_handler(event, context):
+    from src.scraping import helper_functions
+    print("Initialized helper functions")
+
+    """Handle batch of route queue messages, each a few routes whose details need fetching"""
+    try:
+        for record in event['Records']:
+            try:
+                message = json.loads(record['body'])
+                user_id = message['user_id']
+
+                print(f"Processing {len(message['routes'])} routes queued for user {user_id}")
+
+                helper_functions.process_route_batch(
+                    user_id=user_id,
+                    routes_to_fetch={
+                        route_id: (route_name, route_link)
+                        for route_id, route_name, route_link in message['routes']
+                    },
+                    fetch_mode=message.get('fetch_mode')
+                )
+
+            except Exception as e:
+                error_context = {
+                    "original_message": message,
+                    "error_type": str(type(e).__name__),
+                    "error_message": str(e),
+                    "stack_trace": traceback.format_exc(),
+                    "lambda_request_id": context.aws_request_id,
+                    "timestamp": datetime.now().isoformat(),
+                    "function_name": context.function_name,
+                    "remaining_time_ms": context.get_remaining_time_in_millis(),
+                }
+
+                print(f"Error context: {json.dumps(error_context, default=str)}")
+                raise
+    except Exception as e:
+        print(f"Error in handler: {str(e)}")
+        raise
@@ -27,7 +27,8 @@ def lambda_handler(event, context):
                     page_number=page_number,
                     ticks_url=ticks_url,
                     user_id=user_id,
-                    retry_count=message.get('retry_count', 0)
+                    retry_count=message.get('retry_count', 0),
+                    fetch_mode=message.get('fetch_mode')
                 )
                 
             except Exception as e:
@@ -0,0 +1,257 @@
+from playwright.async_api import async_playwright
+from urllib.parse import urlparse
+import asyncio
+import threading
+import time
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(project_root)
+
+from src.scraping import http_fetcher, session_manager
+from src.scraping.helper_functions import (
+    wait_for_dom_quiet_js, get_route_id_from_link, COMMENT_QUIET_MS,
+    COMMENT_MAX_WAIT_MS, DEFAULT_COMMENT_MODE, DEFAULT_FETCH_MODE,
+    DEFAULT_CONCURRENCY)
+
+# Requests per second allowed against a single host, across all workers in the pool
+HOST_RATE_LIMIT = float(os.getenv('ROUTE_FETCH_RATE_PER_SEC', '4'))
+
+# Module-level state survives warm Lambda invocations within the same container. The async
+# browser lives on its own event loop thread because the sync Playwright session owns the main one.
+_async_session = {
+    'loop': None,
+    'playwright': None,
+    'browser': None,
+    'context': None,
+    'storage_mtime': None
+}
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    with _loop_lock:
+        if _async_session['loop'] is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            _async_session['loop'] = loop
+    return _async_session['loop']
+
+
+def run(coroutine):
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop()).result()
+
+
+async def get_async_context():
+    """
+    The warm async browser context, restored from the sync session's storage_state.
+    Relaunches only when the browser died, and swaps the context when the sync side
+    has logged in again since it was created.
+    """
+    # The sync session manager owns login; we just restore its saved state
+    if not session_manager.storage_state_is_valid():
+        raise Exception("No valid saved session for async browser pool")
+    storage_mtime = os.path.getmtime(session_manager.STORAGE_STATE_PATH)
+
+    browser = _async_session['browser']
+    if browser is not None and browser.is_connected():
+        if _async_session['context'] is not None and _async_session['storage_mtime'] == storage_mtime:
+            return _async_session['context']
+    else:
+        if _async_session['playwright'] is None:
+            _async_session['playwright'] = await async_playwright().start()
+        _async_session['browser'] = await _async_session['playwright'].chromium.launch(
+            headless=True, args=session_manager.BROWSER_ARGS)
+        _async_session['context'] = None
+
+    if _async_session['context'] is not None:
+        try:
+            await _async_session['context'].close()
+        except BaseException:
+            pass
+    _async_session['context'] = await _async_session['browser'].new_context(
+        storage_state=session_manager.STORAGE_STATE_PATH)
+    _async_session['storage_mtime'] = storage_mtime
+    return _async_session['context']
+
+
+class HostRateLimiter:
+    """Spaces out request starts per host so N pages don't burst the same server"""
+
+    def __init__(self, rate_per_sec=HOST_RATE_LIMIT):
+        self.min_interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0
+        self.next_allowed = {}
+        self.locks = {}
+
+    async def wait(self, url):
+        if not self.min_interval:
+            return
+        host = urlparse(url).netloc
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start_at = max(now, self.next_allowed.get(host, now))
+            self.next_allowed[host] = start_at + self.min_interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+
+class PagePool:
+    """Opens up to `size` pages in the warm async context, only when a fetch needs the browser"""
+
+    def __init__(self, size):
+        self.size = size
+        self.context = None
+        self.pages = asyncio.Queue()
+        self.opened = []
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            if self.context is None:
+                self.context = await get_async_context()
+            if self.pages.empty() and len(self.opened) < self.size:
+                page = await self.context.new_page()
+                self.opened.append(page)
+                return page
+        return await self.pages.get()
+
+    def release(self, page):
+        self.pages.put_nowait(page)
+
+    async def close(self):
+        # Only the pages are closed; the browser stays warm for the next call
+        for page in self.opened:
+            try:
+                await page.close()
+            except BaseException:
+                pass
+
+
+async def fetch_with_page(page, route_link, comment_mode, max_wait_ms):
+    """Async counterpart of fetch_dynamic_page_content for a single attempt"""
+    if comment_mode == 'api':
+        await page.goto(route_link, timeout=90000, wait_until='domcontentloaded')
+        html_content = await page.content()
+        response = await page.request.get(
+            http_fetcher.comments_api_url.format(
+                route_id=get_route_id_from_link(route_link)),
+            timeout=max_wait_ms)
+        if response.ok:
+            return http_fetcher.inject_comments(html_content, await response.text())
+        print(f"Comments endpoint returned {response.status} for {route_link}")
+    else:
+        await page.goto(route_link, timeout=90000)
+
+    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    if comment_mode == 'scroll':
+        last_height = None
+        waited_ms = 0
+        while waited_ms < max_wait_ms:
+            await page.wait_for_timeout(1000)
+            waited_ms += 1000
+            new_height = await page.evaluate("document.body.scrollHeight")
+            if new_height == last_height:
+                break
+            last_height = new_height
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    else:
+        try:
+            await page.wait_for_load_state('networkidle', timeout=max_wait_ms)
+        except Exception as e:
+            print(f"Network did not go idle within {max_wait_ms}ms: {str(e)}")
+        await page.evaluate(wait_for_dom_quiet_js, [COMMENT_QUIET_MS, max_wait_ms])
+    return await page.content()
+
+
+async def _fetch_routes_http(route_links, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = HostRateLimiter()
+    results = {}
+
+    async def fetch_one(route_id, route_link):
+        async with semaphore:
+            await limiter.wait(route_link)
+            html_content = await asyncio.to_thread(
+                http_fetcher.fetch_route_html, route_link)
+            if html_content:
+                results[route_id] = html_content
+
+    await asyncio.gather(*(
+        fetch_one(route_id, route_link)
+        for route_id, route_link in route_links.items()))
+    return results
+
+
+async def _fetch_routes_browser(route_links, concurrency, comment_mode, max_wait_ms):
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = HostRateLimiter()
+    results = {}
+    pool = PagePool(concurrency)
+
+    async def fetch_one(route_id, route_link):
+        async with semaphore:
+            try:
+                await limiter.wait(route_link)
+                page = await pool.acquire()
+                try:
+                    results[route_id] = await fetch_with_page(
+                        page, route_link, comment_mode, max_wait_ms)
+                finally:
+                    pool.release(page)
+            except Exception as e:
+                # Left out of results; the caller refetches it sequentially
+                print(f"Concurrent fetch failed for {route_link}: {str(e)}")
+
+    try:
+        await asyncio.gather(*(
+            fetch_one(route_id, route_link)
+            for route_id, route_link in route_links.items()))
+    finally:
+        await pool.close()
+    return results
+
+
+def ensure_storage_state():
+    """
+    Make sure the sync session has a logged-in context and a fresh storage_state on disk
+    for the async pool to restore. Must run on the sync Playwright thread.
+    """
+    context = session_manager.get_context()
+    if not session_manager.storage_state_is_valid():
+        session_manager.save_session(context)
+
+
+def fetch_routes(route_links, concurrency=None, fetch_mode=None,
+                 comment_mode=None, max_wait_ms=None):
+    """
+    Fetch {route_id: route_link} concurrently, returning {route_id: html}.
+
+    In 'http' mode every route is tried over HTTP first, and only the ones that fail
+    go to the browser pool. Routes that fail in the browser too are missing from the
+    result; they have already been tried over HTTP.
+    """
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    fetch_mode = fetch_mode or DEFAULT_FETCH_MODE
+    comment_mode = comment_mode or DEFAULT_COMMENT_MODE
+    max_wait_ms = max_wait_ms or COMMENT_MAX_WAIT_MS
+
+    if not route_links:
+        return {}
+
+    print(f"Fetching {len(route_links)} routes with concurrency {concurrency}")
+    results = {}
+    if fetch_mode == 'http':
+        results = run(_fetch_routes_http(route_links, concurrency))
+
+    browser_links = {
+        route_id: route_link for route_id, route_link in route_links.items()
+        if route_id not in results
+    }
+    if browser_links:
+        print(f"Fetching {len(browser_links)} routes with the browser pool")
+        ensure_storage_state()
+        results.update(run(_fetch_routes_browser(
+            browser_links, concurrency, comment_mode, max_wait_ms)))
+    return results
@@ -1,19 +1,19 @@
 from src.analysis.fa_parsing import parse_fa_data
-from playwright.sync_api import sync_playwright
+from src.analysis import patterns
 from datetime import datetime, timezone
-from bs4 import BeautifulSoup
 from src.database import queries
-import re
-import requests
-import json
+from src.scraping import session_manager, http_fetcher, route_queue
+from src.scraping.http_fetcher import comments_api_url, inject_comments
+from src.scraping.html_parsing import make_route_soup, make_tick_soup
 import os
 import sys
 import unicodedata
+import uuid
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 sys.path.append(project_root)
 
-from src.database.utils import create_connection, add_new_tags_to_mapping
+from src.database.utils import create_connection, get_connection, release_connection, add_new_tags_to_mapping
 from src.analysis.ai_analysis_helper_functions import process_route, process_route_response, save_analysis_results
 
 mp_home_url = "https://www.mountainproject.com"
@@ -30,54 +30,13 @@ def get_proxy_url():
 
 
 def login_and_save_session(playwright):
+    """Launch a fresh browser, log in and save the session. Caller owns the browser."""
     browser = None
-    context = None
-    page = None
-
-    mp_username = os.getenv('MP_USERNAME')
-    mp_password = os.getenv('MP_PASSWORD')
-
-    print("Starting browser launch sequence...")
     try:
-        browser = playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-dev-shm-usage',
-                '--single-process',
-                '--no-zygote'
-            ]
-        )
-        print("Browser launched successfully")
-
+        browser = session_manager.launch_browser(playwright)
         context = browser.new_context()
-        page = context.new_page()
         print("Context created successfully")
-
-        page.set_default_navigation_timeout(90000)
-        page.set_default_timeout(90000)
-        page.goto(mp_home_url)
-        print("Navigation complete")
-        page.wait_for_selector("a.sign-in", timeout=10000)
-        print("Sign in button found")
-        page.click("a.sign-in")
-        page.wait_for_selector("#login-modal", timeout=5000)
-        page.fill("input[type='email'][name='email']", mp_username)
-        page.fill("input[type='password'][name='pass']", mp_password)
-        page.click("#login-modal button[type='submit']")
-        print("Login submitted")
-
-        # Save cookies and storage_state to /tmp
-        cookies = context.cookies()
-        with open("/tmp/cookies.json", "w") as cookie_file:
-            json.dump(cookies, cookie_file)
-
-        storage_state = context.storage_state()
-        with open("/tmp/storage.json", "w") as storage_file:
-            json.dump(storage_state, storage_file)
-
-        print("Login successful, session saved!")
+        session_manager.login(context)
         return browser, context
 
     except Exception as e:
@@ -87,21 +46,110 @@ def login_and_save_session(playwright):
         raise
 
 
-def fetch_dynamic_page_content(page, route_link, max_retries=3):
+COMMENT_LOAD_MODES = ('idle', 'scroll', 'api')
+DEFAULT_COMMENT_MODE = os.getenv('COMMENT_LOAD_MODE', 'idle')
+COMMENT_MAX_WAIT_MS = int(os.getenv('COMMENT_MAX_WAIT_MS', '8000'))
+COMMENT_QUIET_MS = 500
+
+# Resolves once the DOM has gone quiet_ms without a mutation, or after max_ms
+wait_for_dom_quiet_js = """
+([quietMs, maxMs]) => new Promise(resolve => {
+    let quietTimer = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(done, quietMs);
+    });
+    const maxTimer = setTimeout(done, maxMs);
+    function done() {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(maxTimer);
+        resolve(true);
+    }
+    observer.observe(document.body, {childList: true, subtree: true});
+    quietTimer = setTimeout(done, quietMs);
+})
+"""
+
+
+def get_route_id_from_link(route_link):
+    return route_link.split('/route/')[1].split('/')[0]
+
+
+def fetch_comments_fragment(page, route_id, max_wait_ms=COMMENT_MAX_WAIT_MS):
+    """Pull the comments HTML straight from the endpoint the page's own XHR calls"""
+    response = page.request.get(
+        comments_api_url.format(route_id=route_id), timeout=max_wait_ms)
+    if not response.ok:
+        raise Exception(
+            f"Comments request failed for route {route_id}: {response.status}")
+    return response.text()
+
+
+def wait_for_comments(page, max_wait_ms=COMMENT_MAX_WAIT_MS):
+    """Trigger lazy comment loading once, then wait on network idle and a quiet DOM"""
+    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    try:
+        page.wait_for_load_state('networkidle', timeout=max_wait_ms)
+    except Exception as e:
+        print(f"Network did not go idle within {max_wait_ms}ms: {str(e)}")
+    page.evaluate(wait_for_dom_quiet_js, [COMMENT_QUIET_MS, max_wait_ms])
+
+
+def scroll_for_comments(page, max_wait_ms=COMMENT_MAX_WAIT_MS):
+    """Original behaviour: scroll until the page height stops changing"""
+    last_height = None
+    waited_ms = 0
+    while waited_ms < max_wait_ms:
+        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        page.wait_for_timeout(1000)
+        waited_ms += 1000
+        new_height = page.evaluate("document.body.scrollHeight")
+        if new_height == last_height:
+            break
+        last_height = new_height
+
+
+def fetch_dynamic_page_content(page, route_link, max_retries=3,
+                               comment_mode=None, max_wait_ms=None):
+    """
+    Load a route page with its comments.
+
+    comment_mode:
+    - 'idle': scroll once and wait for network idle / DOM mutations to settle
+    - 'api': skip scrolling and fetch comments from the comments endpoint
+    - 'scroll': legacy scroll-and-poll loop
+    max_wait_ms bounds how long we wait for comments in every mode.
+    """
+    comment_mode = comment_mode or DEFAULT_COMMENT_MODE
+    max_wait_ms = max_wait_ms or COMMENT_MAX_WAIT_MS
+    if comment_mode not in COMMENT_LOAD_MODES:
+        raise ValueError(
+            f"Invalid comment_mode: {comment_mode}. Must be one of {COMMENT_LOAD_MODES}")
+
     for attempt in range(max_retries):
         try:
+            if comment_mode == 'api':
+                page.goto(route_link, timeout=90000,
+                          wait_until='domcontentloaded')
+                html_content = page.content()
+                try:
+                    comments_html = fetch_comments_fragment(
+                        page, get_route_id_from_link(route_link), max_wait_ms)
+                    return inject_comments(html_content, comments_html)
+                except Exception as e:
+                    if "context or browser has been closed" in str(e):
+                        raise
+                    print(
+                        f"Comments endpoint failed for {route_link}, waiting on page instead: {str(e)}")
+                    wait_for_comments(page, max_wait_ms)
+                    return page.content()
+
             page.goto(route_link, timeout=90000)
-            last_height = None
-
-            # loads comments
-            while True:
-                # Scroll down
-                page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                page.wait_for_timeout(1000)
-                new_height = page.evaluate("document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
+            if comment_mode == 'scroll':
+                scroll_for_comments(page, max_wait_ms)
+            else:
+                wait_for_comments(page, max_wait_ms)
 
             html_content = page.content()
             return html_content
@@ -119,14 +167,43 @@ def fetch_dynamic_page_content(page, route_link, max_retries=3):
                 raise
 
 
+FETCH_MODES = ('http', 'browser')
+DEFAULT_FETCH_MODE = os.getenv('ROUTE_FETCH_MODE', 'http')
+DEFAULT_CONCURRENCY = int(os.getenv('ROUTE_FETCH_CONCURRENCY', '4'))
+
+
+def fetch_route_content(route_link, get_page, fetch_mode=None, comment_mode=None):
+    """
+    Fetch a route page with comments.
+
+    In 'http' mode the page and comments are pulled with the pooled requests
+    session and the browser is only used when that fails or the page needs auth.
+    get_page is called lazily so a page is only opened when needed.
+    """
+    fetch_mode = fetch_mode or DEFAULT_FETCH_MODE
+    if fetch_mode not in FETCH_MODES:
+        raise ValueError(
+            f"Invalid fetch_mode: {fetch_mode}. Must be one of {FETCH_MODES}")
+
+    if fetch_mode == 'http':
+        route_html_content = http_fetcher.fetch_route_html(route_link)
+        if route_html_content:
+            return route_html_content
+        print(f"Falling back to browser for {route_link}")
+
+    return fetch_dynamic_page_content(
+        get_page(), route_link, comment_mode=comment_mode)
+
+
 def get_total_pages(ticks_url):
-    pagination_response = requests.get(ticks_url)
+    pagination_response = http_fetcher.get_session().get(
+        ticks_url, timeout=http_fetcher.HTTP_TIMEOUT)
     if pagination_response.status_code != 200:
         print(f"Failed to retrieve data: {pagination_response.status_code}")
         raise Exception(
             f"Failed to get total pages: {pagination_response.status_code}")
 
-    pagination_soup = BeautifulSoup(pagination_response.text, 'html.parser')
+    pagination_soup = make_tick_soup(pagination_response.text)
     pagination_div = pagination_soup.find('div', class_='pagination')
     if not pagination_div:
         return 1  # Return 1 if no pagination found
@@ -150,7 +227,7 @@ def get_comments(route_soup):
         # Extract the full comment text from the <span> with id containing
         # '-full'
         comment_text = comment.find(
-            'span', id=re.compile(r'.*-full')).get_text(strip=True)
+            'span', id=patterns.COMMENT_FULL_ID).get_text(strip=True)
         comments.append(comment_text)
     return comments
 
@@ -238,7 +315,7 @@ def get_route_attributes(route_soup):
     route_attributes['aid_rating'] = grade_types['aid_rating']
     route_attributes['danger_rating'] = grade_types['danger_rating']
     stars_avg_text_element = route_soup.find(
-        'span', id=re.compile('^starsWithAvgText-'))
+        'span', id=patterns.STARS_AVG_ID)
     avg_rating_text = stars_avg_text_element.text.strip().replace('\n', ' ')
     avg_rating_parts = avg_rating_text.split('from')
     route_attributes['avg_stars'] = avg_rating_parts[0].replace(
@@ -309,20 +386,20 @@ def parse_route_type(route_details_string):
             continue
 
         # Match route length (e.g., "500 ft (152 m)")
-        length_match = re.search(r'(\d+)\s*ft', part)
+        length_match = patterns.ROUTE_LENGTH_FT.search(part)
         if length_match:
             parsed_details['length_ft'] = int(
                 length_match.group(1))  # Store in feet
             continue
 
         # Match pitches (e.g., "6 pitches" or "6 pitch")
-        pitch_match = re.search(r'(\d+)\s*pitch', part)
+        pitch_match = patterns.ROUTE_PITCHES.search(part)
         if pitch_match:
             parsed_details['pitches'] = int(pitch_match.group(1))
             continue
 
         # Match commitment grade (e.g., "Grade III")
-        grade_match = re.search(r'Grade\s+(VI|IV|V|I{1,3})', part)
+        grade_match = patterns.COMMITMENT_GRADE.search(part)
         if grade_match:
             parsed_details['commitment_grade'] = grade_match.group(1)
             continue
@@ -437,49 +514,34 @@ def parse_tick_details(tick_details, current_route_data, user_id):
 
     tick_details_text = tick_details.text.strip()
 
-    date_pattern = r'[A-Z][a-z]{2}\s+\d{1,2},\s+\d{4}'
-    date_match = re.search(date_pattern, tick_details_text)
+    date_match = patterns.TICK_DATE.search(tick_details_text)
     tick_date = date_match.group() if date_match else None
 
     tick_type = None
     tick_note = None
     pitch_count = None
 
-    valid_tick_types = [
-        'Solo', 'TR', 'Follow', 'Lead',
-        'Lead / Onsight', 'Lead / Flash',
-        'Lead / Redpoint', 'Lead / Pinkpoint',
-        'Lead / Fell/Hung'
-    ]
-
     if ' · ' in tick_details_text:
         # Get everything after the bullet, following date
         post_date_text = tick_details_text.split(' · ')[1]
-        pitch_pattern = r'(\d+)\s*pitches?'
-        pitch_match = re.search(pitch_pattern, post_date_text)
+        pitch_match = patterns.TICK_PITCHES.search(post_date_text)
         if pitch_match:
             pitch_count = int(pitch_match.group(1))
 
-        if '.' in post_date_text:
-            parts = post_date_text.split('.', 1)
-            if "pitches" in parts[0].lower():
-                next_parts = parts[1].split('.', 1)
-                potential_type = next_parts[0].strip()
-                if potential_type in valid_tick_types:
-                    tick_type = potential_type
-                    tick_note = next_parts[1].strip() if len(
-                        next_parts) > 1 else None
-                else:
-                    tick_note = parts[1].strip()
-            else:
-                potential_type = parts[0].strip()
-                if potential_type in valid_tick_types:
-                    tick_type = potential_type
-                    tick_note = parts[1].strip() if len(parts) > 1 else None
-                else:
-                    tick_note = parts[1].strip()
+        # "N pitches." then an optional style sentence; the rest is the note, as in the tick export
+        remaining = post_date_text.strip()
+        first_sentence, _, rest = remaining.partition('.')
+        if patterns.TICK_PITCHES.fullmatch(first_sentence.strip()):
+            remaining = rest.strip()
+        style, _, rest = remaining.partition('.')
+        style = style.strip()
+        if style in patterns.TICK_STYLES:
+            if style in patterns.VALID_TICK_TYPES:
+                tick_type = style
+            tick_note = rest.strip()
         else:
-            tick_note = post_date_text.strip()
+            tick_note = remaining
+        tick_note = tick_note or None
 
     tick_data = {
         'user_id': user_id,
@@ -493,207 +555,488 @@ def parse_tick_details(tick_details, current_route_data, user_id):
     return tick_data
 
 
-def process_page(page_number, ticks_url, user_id, retry_count=0):
-    """Process a single page"""
-
-    tick_data = []
-    route_data = []
-    route_comments_data = []
+def parse_tick_rows(tick_soup):
+    """
+    Pair each route row on a ticks page with its tick detail cells.
+    Returns (route_ids_to_check, tick_details_map) keyed by route id, in page order.
+    """
     route_ids_to_check = {}
     tick_details_map = {}
-    current_route_data = None
-    ai_route_analysis_data = []
+    tick_table = tick_soup.find(
+        'table', class_='table route-table hidden-xs-down')
+    tick_rows = tick_table.find_all('tr', class_='route-row')
+    print(f"Found {len(tick_rows) / 2} routes to process")
 
-    browser = None
-    context = None
-    page = None
+    for i in range(0, len(tick_rows),
+                   2):  # Step by 2 since routes and ticks alternate
+        try:
+            route_row = tick_rows[i]
+            tick_row = tick_rows[i + 1] if i + \
+                1 < len(tick_rows) else None
+            cells = route_row.find_all('td')
+            route_name = ' '.join(
+                cells[0].text.strip().replace(
+                    '●', '').split())
+            route_link = route_row.find('a', href=True)['href']
+            route_id = route_link.split('/route/')[1].split('/')[0]
+
+            tick_details = tick_row.find(
+                'td', class_='text-warm small pt-0') if tick_row else None
+
+            if route_id not in tick_details_map:
+                tick_details_map[route_id] = []
+
+            if tick_details:
+                tick_details_map[route_id].append(tick_details)
+
+            route_ids_to_check[route_id] = (route_name, route_link)
+
+        except IndexError as e:
+            print(f"Error processing row {i}: {str(e)}")
+            continue  # Skip this row and continue with next
+        except Exception as e:
+            print(f"Unexpected error processing row {i}: {str(e)}")
+            continue
+
+    return route_ids_to_check, tick_details_map
+
+
+def tick_key(tick):
+    """(route_id, date, type, note_hash) identifying a parsed tick, as stored in routes.Ticks"""
+    tick_date = datetime.strptime(tick['date'], '%b %d, %Y').date() if tick['date'] else None
+    return (int(tick['route_id']), tick_date, tick['type'] or '',
+            queries.hash_text(tick['note'] or ''))
+
+
+def get_page_tick_keys(ticks_url, page_number, user_id):
+    """Fetch a ticks page over HTTP and return the tick_key of every tick on it"""
+    tick_html = http_fetcher.fetch_html(f"{ticks_url}{page_number}")
+    if tick_html is None:
+        raise Exception(f"Failed to fetch ticks page {page_number}")
 
+    route_ids_to_check, tick_details_map = parse_tick_rows(make_tick_soup(tick_html))
+    return [
+        tick_key(parse_tick_details(tick_details, {'route_id': route_id}, user_id))
+        for route_id, tick_details_list in tick_details_map.items()
+        for tick_details in tick_details_list
+    ]
+
+
+def scrape_routes(routes_to_fetch, get_page, reset_page, comment_mode=None,
+                  fetch_mode=None, concurrency=None, lease_routes=None):
+    """
+    Fetch, parse and AI-analyze routes_to_fetch ({route_id: (route_name, route_link)}).
+    Yields (route_id, rows for save_scraped_routes) as each route is ready so callers can
+    commit route by route. Routes that fail to fetch are skipped.
+    lease_routes(route_ids) takes or renews the caller's fetch lease and returns the int ids
+    it holds; routes leased by another worker are skipped before any fetch or AI call.
+    """
+    if lease_routes:
+        leased = lease_routes(routes_to_fetch.keys())
+        skipped = len(routes_to_fetch) - len(leased)
+        if skipped:
+            print(f"Skipping {skipped} routes leased by another worker")
+        routes_to_fetch = {
+            route_id: route for route_id, route in routes_to_fetch.items()
+            if int(route_id) in leased
+        }
+
+    def lease_held(route_id, route_name):
+        # Renewed per route so a long batch never lets its leases go stale mid-fetch
+        if lease_routes is None or int(route_id) in lease_routes([route_id]):
+            return True
+        print(f"Lease on {route_name} was taken over by another worker, skipping")
+        return False
+
+    # Fetch all new routes up front in parallel; parsing stays sequential below
+    prefetched_html = {}
+    prefetched = False
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    if concurrency > 1 and len(routes_to_fetch) > 1:
+        from src.scraping import async_fetcher
+        prefetched_html = async_fetcher.fetch_routes(
+            {route_id: route_link for route_id, (route_name, route_link) in routes_to_fetch.items()},
+            concurrency=concurrency, fetch_mode=fetch_mode, comment_mode=comment_mode)
+        prefetched = True
+
+    for route_id, (route_name, route_link) in routes_to_fetch.items():
+        if not lease_held(route_id, route_name):
+            continue
+        print(f'Retrieving data for {route_name}')
+
+        # The concurrent fetch already tried HTTP, so a miss goes straight to the browser
+        route_html_content = prefetched_html.get(route_id) or fetch_route_content(
+            route_link, get_page, fetch_mode='browser' if prefetched else fetch_mode,
+            comment_mode=comment_mode)
+
+        if route_html_content == "BROWSER_CLOSED":
+            session_manager.reset_session()
+            reset_page()
+            print(
+                "Session recreated, continuing with next route")
+            continue
+        if route_html_content is None:
+            print(
+                f"Skipping route {route_name} due to fetch errors")
+            continue
+
+        route_soup = make_route_soup(route_html_content)
+        current_route_data = parse_route_data(
+            route_soup, route_id, route_name, route_link)
+        current_route_comments_data = parse_route_comments_data(
+            route_soup, route_id)
+
+        scraped = {
+            'route_data': [current_route_data],
+            'route_comments_data': current_route_comments_data,
+            'fa_data': [{
+                'route_id': route_id,
+                'fa_name': fa['name'],
+                'fa_type': fa['type'],
+                'year': fa['year'],
+                'insert_date': current_route_data['insert_date']
+            } for fa in parse_fa_data(current_route_data['fa'])],
+            'ai_route_analysis_data': []
+        }
+
+        combined_grade = ' '.join(filter(None, [
+            current_route_data.get('yds_rating') or '',
+            current_route_data.get('hueco_rating') or '',
+            current_route_data.get('aid_rating') or '',
+            current_route_data.get('danger_rating') or '',
+            current_route_data.get(
+                'commitment_grade') or ''
+        ])).strip() or None
+
+        combined_location = ' > '.join(filter(None, [
+            current_route_data.get('region') or '',
+            current_route_data.get('main_area') or '',
+            current_route_data.get('sub_area') or '',
+            current_route_data.get(
+                'specific_location') or ''
+        ])).strip() or None
+
+        route_for_analysis = {
+            'route_id': current_route_data['route_id'],
+            'route_name': current_route_data['route_name'],
+            'combined_grade': combined_grade,
+            'avg_stars': current_route_data['avg_stars'],
+            'num_votes': current_route_data['num_votes'],
+            'location': combined_location,
+            'route_type': current_route_data['route_type'],
+            'fa': current_route_data['fa'],
+            'description': current_route_data['description'],
+            'protection': current_route_data['protection'],
+            'comments': ' | '.join(c['comment'] for c in current_route_comments_data)
+        }
+        if not lease_held(route_id, route_name):
+            continue
+        print(f"Running AI analysis")
+        ai_route_response = process_route(
+            route_for_analysis)
+        if ai_route_response:
+            scraped['ai_route_analysis_data'].append(
+                process_route_response(ai_route_response))
+
+        yield route_id, scraped
+
+
+def save_scraped_routes(cursor, scraped, get_new_connection=None):
+    """Insert rows yielded by scrape_routes. Caller commits."""
+    route_data = scraped['route_data']
+    if route_data:
+        print(f"Attempting to insert {len(route_data)} routes")
+        queries.insert_routes_batch(cursor, route_data, create_connection=get_new_connection)
+        queries.replace_fa_rows(
+            cursor, [route['route_id'] for route in route_data], scraped['fa_data'])
+    if scraped['route_comments_data']:
+        print(f"Attempting to insert {len(scraped['route_comments_data'])} comments")
+        queries.insert_comments_batch(cursor, scraped['route_comments_data'], create_connection=get_new_connection)
+    if scraped['ai_route_analysis_data']:
+        print(f"Attempting to insert AI results")
+        for result in scraped['ai_route_analysis_data']:
+            save_analysis_results(cursor, result)
+        add_new_tags_to_mapping(cursor)
+        queries.refresh_route_tags(
+            cursor, [result['route_id'] for result in scraped['ai_route_analysis_data']])
+
+
+def refresh_stats_if_done(conn, cursor, user_id, page_tracked):
+    """
+    Build the user's stats rollup once the last of their ticks pages and route batches commits.
+    Runs after the caller's commit so the last worker to finish always sees nothing remaining.
+    """
     try:
-        with sync_playwright() as playwright:
-            try:
-                browser, context = login_and_save_session(playwright)
-                page = context.new_page()
+        if (page_tracked and queries.scrape_pages_remaining(cursor, user_id) == 0
+                and queries.route_claims_remaining(cursor, user_id) == 0):
+            print(f"All pages and routes done for user {user_id}, refreshing user stats")
+            queries.refresh_user_stats(cursor, user_id)
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Failed to refresh user stats for {user_id}: {str(e)}")
 
-                print(
-                    f'Processing page: {page_number} for user {user_id}. (Retry #{retry_count})')
 
-                current_page_url = f"{ticks_url}{page_number}"
-                page.goto(current_page_url, timeout=90000)
-                tick_html = page.content()
-                tick_soup = BeautifulSoup(tick_html, 'html.parser')
-                tick_table = tick_soup.find(
-                    'table', class_='table route-table hidden-xs-down')
-                tick_rows = tick_table.find_all('tr', class_='route-row')
-                print(f"Found {len(tick_rows) / 2} routes to process")
-
-                for i in range(0, len(tick_rows),
-                               2):  # Step by 2 since routes and ticks alternate
-                    try:
-                        route_row = tick_rows[i]
-                        tick_row = tick_rows[i + 1] if i + \
-                            1 < len(tick_rows) else None
-                        cells = route_row.find_all('td')
-                        route_name = ' '.join(
-                            cells[0].text.strip().replace(
-                                '●', '').split())
-                        route_link = route_row.find('a', href=True)['href']
-                        route_id = route_link.split('/route/')[1].split('/')[0]
-
-                        tick_details = tick_row.find(
-                            'td', class_='text-warm small pt-0') if tick_row else None
-
-                        if route_id not in tick_details_map:
-                            tick_details_map[route_id] = []
-
-                        if tick_details:
-                            tick_details_map[route_id].append(tick_details)
-
-                        route_ids_to_check[route_id] = (route_name, route_link)
-
-                    except IndexError as e:
-                        print(f"Error processing row {i}: {str(e)}")
-                        continue  # Skip this row and continue with next
-                    except Exception as e:
-                        print(f"Unexpected error processing row {i}: {str(e)}")
-                        continue
-
-                with create_connection() as conn:
-                    cursor = conn.cursor()
-
-                    def get_new_connection():
-                        new_conn = create_connection()
-                        return new_conn.__enter__() 
-                    
-                    existing_routes = queries.check_routes_exists(
-                        cursor, route_ids_to_check.keys())
-
-                    for route_id, (route_name,
-                                   route_link) in route_ids_to_check.items():
-                        print(f'Retrieving data for {route_name}')
-
-                        current_route_data = {
-                            'route_id': route_id,
-                            'route_name': route_name
-                        }
-                        if int(route_id) in existing_routes:
-                            print(
-                                f"Route {route_name} with id {route_id} already exists in the database.")
-
-                        if int(route_id) not in existing_routes:
-                            route_html_content = fetch_dynamic_page_content(
-                                page, route_link)
-
-                            if route_html_content == "BROWSER_CLOSED":
-                                print("Browser closed, recreating session...")
-                                if context:
-                                    try:
-                                        context.close()
-                                    except BaseException:
-                                        pass
-                                if browser:
-                                    try:
-                                        browser.close()
-                                    except BaseException:
-                                        pass
-                                browser, context = login_and_save_session(
-                                    playwright)
-                                page = context.new_page()
-                                print(
-                                    "Session recreated, continuing with next route")
-                                continue
-                            if route_html_content is None:
-                                print(
-                                    f"Skipping route {route_name} due to fetch errors")
-                                continue
-
-                            route_soup = BeautifulSoup(
-                                route_html_content, 'html.parser')
-                            current_route_data = parse_route_data(
-                                route_soup, route_id, route_name, route_link)
-                            current_route_comments_data = parse_route_comments_data(
-                                route_soup, route_id)
-
-                            route_data.append(current_route_data)
-                            route_comments_data.extend(
-                                current_route_comments_data)
-                            parse_fa_data(current_route_data['fa'])
-
-                            combined_grade = ' '.join(filter(None, [
-                                current_route_data.get('yds_rating') or '',
-                                current_route_data.get('hueco_rating') or '',
-                                current_route_data.get('aid_rating') or '',
-                                current_route_data.get('danger_rating') or '',
-                                current_route_data.get(
-                                    'commitment_grade') or ''
-                            ])).strip() or None
-
-                            combined_location = ' > '.join(filter(None, [
-                                current_route_data.get('region') or '',
-                                current_route_data.get('main_area') or '',
-                                current_route_data.get('sub_area') or '',
-                                current_route_data.get(
-                                    'specific_location') or ''
-                            ])).strip() or None
-
-                            route_for_analysis = {
-                                'route_id': current_route_data['route_id'],
-                                'route_name': current_route_data['route_name'],
-                                'combined_grade': combined_grade,
-                                'avg_stars': current_route_data['avg_stars'],
-                                'num_votes': current_route_data['num_votes'],
-                                'location': combined_location,
-                                'route_type': current_route_data['route_type'],
-                                'fa': current_route_data['fa'],
-                                'description': current_route_data['description'],
-                                'protection': current_route_data['protection'],
-                                'comments': ' | '.join(c['comment'] for c in current_route_comments_data)
-                            }
-                            print(f"Running AI analysis")
-                            ai_route_response = process_route(
-                                route_for_analysis)
-                            if ai_route_response:
-                                ai_route_analysis_data.append(
-                                    process_route_response(ai_route_response))
-
-                        if route_id in tick_details_map:
-                            print(
-                                f"\nProcessing ticks for {route_name} ({route_id})")
-                            print(
-                                f"Number of ticks: {len(tick_details_map[route_id])}")
-                            for tick_detail in tick_details_map[route_id]:
-                                tick_data.append(
-                                    parse_tick_details(
-                                        tick_detail,
-                                        current_route_data,
-                                        user_id))
-
-                    if route_data:
-                        print(f"Attempting to insert {len(route_data)} routes")
-                        queries.insert_routes_batch(cursor, route_data, create_connection=get_new_connection)
-                    if route_comments_data:
-                        print(f"Attempting to insert {len(route_comments_data)} comments")
-                        queries.insert_comments_batch(cursor, route_comments_data, create_connection=get_new_connection)
-                    if tick_data:
-                        print(f"Attempting to insert {len(tick_data)} ticks")
-                        queries.insert_ticks_batch(cursor, tick_data, create_connection=get_new_connection)
-                    if ai_route_analysis_data:
-                        print(f"Attempting to insert AI results")
-                        for result in ai_route_analysis_data:
-                            save_analysis_results(cursor, result)
-
-                    add_new_tags_to_mapping(cursor)
-
-                    conn.commit()  # commit all transactions together
-                    print(f'Successfully processed page {page_number}')
-            finally:
-                if context:
-                    context.close()
-                if browser:
-                    browser.close()
+def route_stubs(routes_to_stub):
+    """Placeholder routes.Routes rows so ticks can be stored before route details are fetched"""
+    insert_date = datetime.now(timezone.utc).isoformat()
+    return [
+        {'route_id': route_id, 'route_name': sanitize_text(route_name),
+         'route_url': route_link, 'insert_date': insert_date}
+        for route_id, (route_name, route_link) in routes_to_stub.items()
+    ]
+
+
+def queue_claimed_routes(conn, cursor, user_id, routes_to_fetch):
+    """
+    Send the routes claimed in the caller's (committed) transaction to the route queue.
+    If sending fails the claims are dropped so a retry of the caller can claim them again.
+    """
+    try:
+        route_queue.queue_route_batches(user_id, routes_to_fetch)
+    except Exception:
+        queries.release_route_claims(cursor, routes_to_fetch.keys())
+        conn.commit()
+        raise
+
+
+def process_page(page_number, ticks_url, user_id, retry_count=0, fetch_mode=None):
+    """
+    Store a ticks page: ticks go in straight away, on stub routes where needed, and routes
+    without details are sent to the route queue for process_route_batch.
+    Progress is checkpointed in routes.scrape_pages, so a retry after the ticks are stored
+    only queues the routes that are still stubs and a retry of a finished page does nothing.
+    """
+
+    tick_data = []
 
+    fetch_mode = fetch_mode or DEFAULT_FETCH_MODE
+    browser_page = {'page': None}
+    # Connections opened by with_retry after a dropped connection, returned to the pool at the end
+    retry_connections = []
+
+    def get_page():
+        # Only open a browser page once something actually needs it
+        if browser_page['page'] is None:
+            context = session_manager.get_context()
+            browser_page['page'] = context.new_page()
+        return browser_page['page']
+
+    try:
+        print(
+            f'Processing page: {page_number} for user {user_id}. (Retry #{retry_count})')
+
+        with create_connection() as conn:
+            cursor = conn.cursor()
+
+            def get_new_connection():
+                new_conn = get_connection()
+                retry_connections.append(new_conn)
+                return new_conn
+
+            checkpoint = queries.get_scrape_page(cursor, user_id, page_number)
+            page_tracked = checkpoint is not None
+            status, checkpoint_route_ids = checkpoint or (None, None)
+
+            if status == 'done':
+                print(f'Page {page_number} already processed')
+                refresh_stats_if_done(conn, cursor, user_id, page_tracked)
+                return
+
+            if status == 'ticks_stored':
+                # Ticks and stubs are in; only routes not yet fetched need queueing
+                missing_routes = queries.get_route_stubs(cursor, checkpoint_route_ids or [])
+                print(f'Resuming page {page_number} with {len(missing_routes)} routes still to fetch')
+            else:
+                current_page_url = f"{ticks_url}{page_number}"
+                tick_html = http_fetcher.fetch_html(
+                    current_page_url) if fetch_mode == 'http' else None
+                if tick_html is None:
+                    page = get_page()
+                    page.goto(current_page_url, timeout=90000)
+                    session_manager.ensure_logged_in(page)
+                    tick_html = page.content()
+                tick_soup = make_tick_soup(tick_html)
+                route_ids_to_check, tick_details_map = parse_tick_rows(tick_soup)
+
+                existing_routes = queries.check_routes_exists(
+                    cursor, route_ids_to_check.keys())
+                missing_routes = {
+                    route_id: route for route_id, route in route_ids_to_check.items()
+                    if int(route_id) not in existing_routes
+                }
+                if missing_routes:
+                    stubs_inserted, failed_stubs = queries.insert_routes_batch(
+                        cursor, route_stubs(missing_routes), stub=True,
+                        create_connection=get_new_connection)
+                    # Raising before the checkpoint rolls the page back, so the retry
+                    # resumes at the tick stage instead of skipping the rejected rows
+                    if failed_stubs:
+                        raise Exception(
+                            f"Page {page_number} rejected {len(failed_stubs)} route stubs")
+
+                for route_id, tick_details_list in tick_details_map.items():
+                    print(
+                        f"\nProcessing ticks for {route_ids_to_check[route_id][0]} ({route_id})")
+                    print(
+                        f"Number of ticks: {len(tick_details_list)}")
+                    for tick_detail in tick_details_list:
+                        tick_data.append(
+                            parse_tick_details(
+                                tick_detail,
+                                {'route_id': route_id},
+                                user_id))
+
+                if tick_data:
+                    print(f"Attempting to insert {len(tick_data)} ticks")
+                    ticks_inserted, failed_ticks = queries.insert_ticks_batch(
+                        cursor, tick_data, create_connection=get_new_connection)
+                    if failed_ticks:
+                        raise Exception(
+                            f"Page {page_number} rejected {len(failed_ticks)} ticks")
+
+                queries.checkpoint_scrape_page(cursor, user_id, page_number, missing_routes.keys())
+                conn.commit()
+                print(f'Stored ticks for page {page_number}')
+
+            # Routes already claimed by another page are on their way
+            claimed_routes = queries.claim_routes(cursor, missing_routes.keys(), user_id)
+            conn.commit()
+            queue_claimed_routes(conn, cursor, user_id, {
+                route_id: route for route_id, route in missing_routes.items()
+                if int(route_id) in claimed_routes
+            })
+
+            # Only marked done once its routes are queued, so a failed send is retried from the checkpoint
+            queries.complete_scrape_page(cursor, user_id, page_number)
+            conn.commit()
+            print(f'Successfully processed page {page_number}')
+
+            refresh_stats_if_done(conn, cursor, user_id, page_tracked)
     except Exception as e:
         print(f"Error processing page {page_number}: {str(e)}")
         raise
+    finally:
+        for retry_conn in retry_connections:
+            release_connection(retry_conn)
+        # Only the page is closed; the browser stays warm for the next invocation
+        if browser_page['page']:
+            try:
+                browser_page['page'].close()
+            except BaseException:
+                pass
+
+
+def process_route_batch(user_id, routes_to_fetch, comment_mode=None,
+                        fetch_mode=None, concurrency=None):
+    """
+    Fetch, parse and store the details for a route queue message ({route_id: (route_name, route_link)}).
+    Each route is committed and its claim released as soon as it is stored, so a retry of the
+    message only fetches the routes that are still stubs. Routes that fail to fetch keep their
+    claims and the batch raises, so SQS redelivers the message (and the DLQ retries it).
+    """
+    fetch_mode = fetch_mode or DEFAULT_FETCH_MODE
+    browser_page = {'page': None}
+    retry_connections = []
+    lease_owner = uuid.uuid4().hex
+
+    def get_page():
+        if browser_page['page'] is None:
+            context = session_manager.get_context()
+            browser_page['page'] = context.new_page()
+        return browser_page['page']
+
+    def reset_page():
+        browser_page['page'] = None
+
+    try:
+        print(f'Processing {len(routes_to_fetch)} routes queued for user {user_id}')
+
+        with create_connection() as conn:
+            cursor = conn.cursor()
+
+            def get_new_connection():
+                new_conn = get_connection()
+                retry_connections.append(new_conn)
+                return new_conn
+
+            # Routes already stored (by an earlier attempt at this message, or the prescraper)
+            # need no fetch
+            existing_routes = queries.check_routes_exists(cursor, routes_to_fetch.keys())
+            if existing_routes:
+                queries.release_route_claims(cursor, existing_routes)
+            conn.commit()
+
+            # Each route is leased in route_claims before it is fetched, and the lease is
+            # renewed route by route, so no other worker fetches or analyzes it meanwhile
+            leased_routes = set()
+
+            def lease_routes(route_ids):
+                leased = queries.lease_routes(cursor, route_ids, lease_owner, user_id)
+                conn.commit()
+                leased_routes.update(leased)
+                return leased
+
+            stored_routes = set()
+            stored_elsewhere = set()
+            routes_to_scrape = {
+                route_id: route for route_id, route in routes_to_fetch.items()
+                if int(route_id) not in existing_routes
+            }
+            for route_id, scraped in scrape_routes(
+                    routes_to_scrape,
+                    get_page, reset_page, comment_mode=comment_mode,
+                    fetch_mode=fetch_mode, concurrency=concurrency,
+                    lease_routes=lease_routes):
+                route_id = int(route_id)
+                # Renew, re-check and save in one transaction so the lease can't lapse unseen
+                if route_id not in queries.lease_routes(cursor, [route_id], lease_owner, user_id):
+                    conn.rollback()
+                    print(f"Lease on route {route_id} was taken over by another worker, discarding")
+                    continue
+                if queries.check_routes_exists(cursor, [route_id]):
+                    conn.rollback()
+                    print(f"Route {route_id} was already stored by another worker, skipping")
+                    stored_elsewhere.add(route_id)
+                    continue
+                save_scraped_routes(cursor, scraped, get_new_connection)
+                queries.release_route_claims(cursor, [route_id])
+                conn.commit()
+                stored_routes.add(route_id)
+
+            # Routes leased by another worker are theirs to store and release
+            failed_routes = leased_routes - stored_routes - stored_elsewhere
+            queries.release_route_claims(cursor, stored_elsewhere)
+            queries.release_route_leases(cursor, lease_owner)
+            conn.commit()
+            print(f'Successfully processed {len(stored_routes)} routes')
+            if failed_routes:
+                # Claims stay so the stats rollup waits for the retry instead of counting stubs
+                raise Exception(
+                    f"{len(failed_routes)} routes failed to fetch: {', '.join(str(id) for id in sorted(failed_routes))}")
+
+            # Every scrape waiting on these routes may now be complete, not just the one that queued them
+            for tick_user_id in queries.get_scraped_users_for_routes(cursor, routes_to_fetch.keys()):
+                refresh_stats_if_done(conn, cursor, tick_user_id, True)
+    except Exception as e:
+        print(f"Error processing routes for user {user_id}: {str(e)}")
+        # Free the leases now rather than making the retry wait out ROUTE_LEASE_TIMEOUT
+        try:
+            with create_connection() as conn:
+                cursor = conn.cursor()
+                queries.release_route_leases(cursor, lease_owner)
+                conn.commit()
+        except Exception as release_error:
+            print(f"Failed to release route leases: {str(release_error)}")
+        raise
+    finally:
+        for retry_conn in retry_connections:
+            release_connection(retry_conn)
+        if browser_page['page']:
+            try:
+                browser_page['page'].close()
+            except BaseException:
+                pass
 
 import unicodedata
 
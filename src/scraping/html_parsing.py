@@ -0,0 +1,61 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+HTML_PARSER = 'lxml'
+
+
+class ScopedStrainer(SoupStrainer):
+    """
+    Only builds the top-level elements accepted by `wanted(name, classes, attrs)`
+    plus everything nested inside them; the rest of the page is skipped at parse time.
+    """
+
+    def __init__(self, wanted):
+        super().__init__()
+        self.wanted = wanted
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        attrs = attrs or {}
+        classes = attrs.get('class') or ''
+        if isinstance(classes, str):
+            classes = classes.split()
+        return self.wanted(name, set(classes), attrs)
+
+    def allow_string_creation(self, string):
+        # Loose text between kept elements is never read by the parsers
+        return False
+
+
+def is_route_element(name, classes, attrs):
+    """Containers read by parse_route_data / parse_route_comments_data"""
+    if name == 'div':
+        return bool(
+            classes & {'fr-view', 'comment-body', 'carousel-item'}
+            or {'mb-half', 'small', 'text-warm'} <= classes)
+    if name == 'h2':
+        return 'mt-2' in classes or {'inline-block', 'mr-2'} <= classes
+    if name == 'table':
+        return 'description-details' in classes
+    if name == 'span':
+        return (attrs.get('id') or '').startswith('starsWithAvgText-')
+    return name == 'h1'
+
+
+def is_tick_element(name, classes, attrs):
+    """The ticks table and the pagination links on a user's ticks page"""
+    if name == 'table':
+        return 'route-table' in classes
+    if name == 'div':
+        return 'pagination' in classes
+    return False
+
+
+route_strainer = ScopedStrainer(is_route_element)
+tick_strainer = ScopedStrainer(is_tick_element)
+
+
+def make_route_soup(html_content):
+    return BeautifulSoup(html_content, HTML_PARSER, parse_only=route_strainer)
+
+
+def make_tick_soup(html_content):
+    return BeautifulSoup(html_content, HTML_PARSER, parse_only=tick_strainer)
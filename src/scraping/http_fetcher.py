@@ -0,0 +1,125 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import requests
+import json
+import os
+
+mp_home_url = "https://www.mountainproject.com"
+
+comments_api_url = mp_home_url + \
+    "/comments/forObject/Climb-Lib-Models-Route/{route_id}?sortOrder=oldest&showAll=true"
+
+COOKIES_PATH = "/tmp/cookies.json"
+HTTP_TIMEOUT = (10, 30)  # (connect, read) seconds
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))
+
+# Markup every fully rendered route page has; missing means login wall or error page
+ROUTE_PAGE_MARKER = 'description-details'
+LOGIN_URL_MARKERS = ('/auth/login', '/login')
+
+HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+# One pooled keep-alive session per container
+_session = None
+
+
+def get_session():
+    global _session
+    if _session is None:
+        session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET']
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=HTTP_POOL_SIZE,
+            max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(HEADERS)
+        load_saved_cookies(session)
+        _session = session
+    return _session
+
+
+def load_saved_cookies(session, path=COOKIES_PATH):
+    """Reuse cookies saved by a browser login so HTTP requests share the session"""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path) as cookie_file:
+            cookies = json.load(cookie_file)
+    except (OSError, ValueError) as e:
+        print(f"Could not read saved cookies: {str(e)}")
+        return
+
+    for cookie in cookies:
+        session.cookies.set(
+            cookie['name'],
+            cookie['value'],
+            domain=cookie.get('domain'),
+            path=cookie.get('path', '/'))
+
+
+def requires_auth(response):
+    if response.status_code in (401, 403):
+        return True
+    return any(marker in response.url for marker in LOGIN_URL_MARKERS)
+
+
+def fetch_html(url):
+    """GET a page and return its HTML, or None if it needs a browser"""
+    try:
+        response = get_session().get(url, timeout=HTTP_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"HTTP fetch failed for {url}: {str(e)}")
+        return None
+
+    if requires_auth(response):
+        print(f"{url} requires authentication")
+        return None
+    if response.status_code != 200:
+        print(f"HTTP fetch for {url} returned {response.status_code}")
+        return None
+    return response.text
+
+
+def fetch_comments_html(route_id):
+    """Comments fragment for a route, '' when the route has none, None on failure"""
+    return fetch_html(comments_api_url.format(route_id=route_id))
+
+
+def inject_comments(route_html, comments_html):
+    """Append a fetched comments fragment to the route page so get_comments can parse it"""
+    if not comments_html:
+        return route_html
+    body_close = route_html.rfind('</body>')
+    if body_close == -1:
+        return route_html + comments_html
+    return route_html[:body_close] + comments_html + route_html[body_close:]
+
+
+def fetch_route_html(route_link):
+    """
+    Fetch a route page and its comments without a browser.
+    Returns None when the caller should fall back to Playwright.
+    """
+    route_html = fetch_html(route_link)
+    if route_html is None or ROUTE_PAGE_MARKER not in route_html:
+        return None
+
+    route_id = route_link.split('/route/')[1].split('/')[0]
+    comments_html = fetch_comments_html(route_id)
+    if comments_html is None:
+        return None
+
+    return inject_comments(route_html, comments_html)
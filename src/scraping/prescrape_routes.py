@@ -1,14 +1,15 @@
 from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
 from src.database import queries
 from src.database.utils import create_connection
 import os
 import sys
+import uuid
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 sys.path.append(project_root)
 
-from src.scraping.helper_functions import login_and_save_session, fetch_dynamic_page_content, parse_route_data, parse_route_comments_data, get_total_pages
+from src.scraping.html_parsing import make_route_soup
+from src.scraping.helper_functions import login_and_save_session, fetch_route_content, parse_route_data, parse_route_comments_data, get_total_pages
 
 
 STATE_IDS = {
@@ -112,7 +113,7 @@ def set_route_finder_filters(page, grade, state):
         return False
 
 
-def scrape_high_rated_routes():
+def scrape_high_rated_routes(fetch_mode=None):
     """Main function to scrape all 3+ star routes"""
 
     """grades = [
@@ -130,6 +131,8 @@ def scrape_high_rated_routes():
 
     with create_connection() as conn:  # Single database connection for entire session
         cursor = conn.cursor()
+        known_route_ids = queries.load_route_ids(cursor)
+        lease_owner = uuid.uuid4().hex
 
         with sync_playwright() as playwright:
             try:
@@ -184,24 +187,37 @@ def scrape_high_rated_routes():
                                     route_ids_to_check[route_id] = (
                                         route_name, route_link)
 
-                                # Check if route already exists before
-                                # processing
-
-                                existing_routes = queries.check_routes_exists(
-                                    cursor, route_ids_to_check.keys())
-
                                 for route_id, (route_name, route_link) in route_ids_to_check.items(
                                 ):
                                     print(f'Retrieving data for {route_name}')
 
-                                    if int(route_id) in existing_routes:
+                                    # Check if route already exists before
+                                    # processing
+                                    if queries.route_id_known(known_route_ids, route_id):
                                         print(
                                             f"Route {route_name} with id {route_id} already exists in the database.")
                                         continue
+                                    # Lease the route before fetching it, then re-check: a worker
+                                    # may have stored it since startup
+                                    leased = queries.lease_routes(cursor, [route_id], lease_owner)
+                                    conn.commit()
+                                    if not leased:
+                                        print(
+                                            f"Route {route_name} with id {route_id} is being fetched by a worker.")
+                                        continue
+                                    if queries.check_routes_exists(cursor, [route_id]):
+                                        queries.release_route_claims(cursor, [route_id])
+                                        conn.commit()
+                                        queries.add_route_id(known_route_ids, route_id)
+                                        print(
+                                            f"Route {route_name} with id {route_id} was stored by a worker.")
+                                        continue
 
-                                    route_html_content = fetch_dynamic_page_content(
-                                        page, route_link)
+                                    route_html_content = fetch_route_content(
+                                        route_link, lambda: page, fetch_mode=fetch_mode)
                                     if route_html_content == "BROWSER_CLOSED":
+                                        queries.release_route_leases(cursor, lease_owner, [route_id])
+                                        conn.commit()
                                         print(
                                             "Browser closed, recreating session...")
                                         if context:
@@ -221,11 +237,12 @@ def scrape_high_rated_routes():
                                             "Session recreated, continuing with next route")
                                         continue
                                     if route_html_content is None:
+                                        queries.release_route_leases(cursor, lease_owner, [route_id])
+                                        conn.commit()
                                         print(
                                             f"Skipping route {route_name} due to fetch errors")
                                         continue
-                                    route_soup = BeautifulSoup(
-                                        route_html_content, 'html.parser')
+                                    route_soup = make_route_soup(route_html_content)
 
                                     current_route_data = parse_route_data(
                                         route_soup, route_id, route_name, route_link)
@@ -236,10 +253,14 @@ def scrape_high_rated_routes():
                                         cursor, [current_route_data])
                                     queries.insert_comments_batch(
                                         cursor, current_route_comments_data)
+                                    queries.release_route_claims(cursor, [route_id])
                                     conn.commit()
+                                    queries.add_route_id(known_route_ids, route_id)
                             except Exception as e:
                                 print(f"Error processing page: {str(e)}")
                                 conn.rollback()
+                                queries.release_route_leases(cursor, lease_owner)
+                                conn.commit()
                                 if "context or browser has been closed" in str(
                                         e):
                                     if context:
@@ -259,7 +280,7 @@ def scrape_high_rated_routes():
                     browser.close()
 
 
-def scrape_fifty_classics():
+def scrape_fifty_classics(fetch_mode=None):
     """Scrape data for the Fifty Classic Climbs"""
 
     with create_connection() as conn:
@@ -267,44 +288,67 @@ def scrape_fifty_classics():
 
         cursor.execute("SELECT route_id FROM routes.fifty_classics")
         route_ids = [str(row[0]) for row in cursor.fetchall()]
+        existing_routes = queries.check_routes_exists(cursor, route_ids)
+        lease_owner = uuid.uuid4().hex
 
         with sync_playwright() as playwright:
-            try:
-                browser, context = login_and_save_session(playwright)
-                page = context.new_page()
+            browser = None
+            context = None
+            page = None
+
+            def get_page():
+                # Only log in when a route can't be fetched over plain HTTP
+                nonlocal browser, context, page
+                if page is None:
+                    browser, context = login_and_save_session(playwright)
+                    page = context.new_page()
+                return page
 
+            try:
                 for route_id in route_ids:
                     # Construct and fetch route URL
                     route_link = f"https://www.mountainproject.com/route/{route_id}"
                     print(f"\nProcessing route: {route_link}")
 
                     # Check if route already exists in routes table
-                    existing_routes = queries.check_routes_exists(cursor, [
-                                                                  route_id])
                     if int(route_id) in existing_routes:
                         print(
                             f"Route with ID {route_id} already exists in database.")
                         continue
+                    # Lease the route before fetching it, then re-check: a worker may have
+                    # stored it since startup
+                    leased = queries.lease_routes(cursor, [route_id], lease_owner)
+                    conn.commit()
+                    if not leased:
+                        print(f"Route with ID {route_id} is being fetched by a worker.")
+                        continue
+                    if queries.check_routes_exists(cursor, [route_id]):
+                        queries.release_route_claims(cursor, [route_id])
+                        conn.commit()
+                        print(f"Route with ID {route_id} was stored by a worker.")
+                        continue
 
-                    route_html_content = fetch_dynamic_page_content(
-                        page, route_link)
+                    route_html_content = fetch_route_content(
+                        route_link, get_page, fetch_mode=fetch_mode)
 
                     if route_html_content == "BROWSER_CLOSED":
+                        queries.release_route_leases(cursor, lease_owner, [route_id])
+                        conn.commit()
                         print("Browser closed, recreating session...")
                         if context:
                             context.close()
                         if browser:
                             browser.close()
-                        browser, context = login_and_save_session(playwright)
-                        page = context.new_page()
+                        browser, context, page = None, None, None
                         continue
 
                     if route_html_content is None:
+                        queries.release_route_leases(cursor, lease_owner, [route_id])
+                        conn.commit()
                         print(f"Skipping route {route_id} due to fetch errors")
                         continue
 
-                    route_soup = BeautifulSoup(
-                        route_html_content, 'html.parser')
+                    route_soup = make_route_soup(route_html_content)
 
                     # Get route name from the page
                     route_name = route_soup.select_one('h1').text.strip()
@@ -318,13 +362,17 @@ def scrape_fifty_classics():
                     queries.insert_routes_batch(cursor, [current_route_data])
                     queries.insert_comments_batch(
                         cursor, current_route_comments_data)
+                    queries.release_route_claims(cursor, [route_id])
                     conn.commit()
+                    existing_routes.add(int(route_id))
 
                     print(f"Successfully processed {route_name}")
 
             except Exception as e:
                 print(f"Error: {str(e)}")
                 conn.rollback()
+                queries.release_route_leases(cursor, lease_owner)
+                conn.commit()
             finally:
                 if context:
                     context.close()
@@ -0,0 +1,45 @@
+import json
+import os
+
+import boto3
+
+ROUTE_BATCH_SIZE = 10  # routes per route worker message
+SQS_MAX_BATCH = 10
+
+# Module-level client survives warm Lambda invocations within the same container
+_sqs = {'client': None}
+
+
+def get_sqs():
+    if _sqs['client'] is None:
+        _sqs['client'] = boto3.client('sqs')
+    return _sqs['client']
+
+
+def route_batch_messages(user_id, routes_to_fetch):
+    """SQS entries for {route_id: (route_name, route_link)}, ROUTE_BATCH_SIZE routes per message"""
+    route_items = [[route_id, route_name, route_link]
+                   for route_id, (route_name, route_link) in routes_to_fetch.items()]
+    return [
+        {
+            'Id': str(batch_number),
+            'MessageBody': json.dumps({
+                'user_id': user_id,
+                'routes': route_items[start:start + ROUTE_BATCH_SIZE]
+            })
+        }
+        for batch_number, start in enumerate(range(0, len(route_items), ROUTE_BATCH_SIZE), start=1)
+    ]
+
+
+def queue_route_batches(user_id, routes_to_fetch):
+    """Send routes that need their details fetched to the route worker queue; returns the batch count"""
+    messages = route_batch_messages(user_id, routes_to_fetch)
+    for start in range(0, len(messages), SQS_MAX_BATCH):
+        get_sqs().send_message_batch(
+            QueueUrl=os.environ['ROUTE_QUEUE_URL'],
+            Entries=messages[start:start + SQS_MAX_BATCH]
+        )
+    if messages:
+        print(f"Queued {len(routes_to_fetch)} routes in {len(messages)} route batches")
+    return len(messages)
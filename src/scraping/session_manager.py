@@ -0,0 +1,179 @@
+from playwright.sync_api import sync_playwright
+import json
+import os
+import time
+
+mp_home_url = "https://www.mountainproject.com"
+
+STORAGE_STATE_PATH = "/tmp/storage.json"
+COOKIES_PATH = "/tmp/cookies.json"
+COOKIE_EXPIRY_MARGIN_SECONDS = 300
+
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--single-process',
+    '--no-zygote'
+]
+
+# Module-level state survives warm Lambda invocations within the same container
+_session = {
+    'playwright': None,
+    'browser': None,
+    'context': None
+}
+
+
+def launch_browser(playwright):
+    """Launch headless Chromium with Lambda-safe flags"""
+    print("Starting browser launch sequence...")
+    browser = playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+    print("Browser launched successfully")
+    return browser
+
+
+def login(context):
+    """Log in to Mountain Project in the given context and persist the session to /tmp"""
+    mp_username = os.getenv('MP_USERNAME')
+    mp_password = os.getenv('MP_PASSWORD')
+
+    page = context.new_page()
+    try:
+        page.set_default_navigation_timeout(90000)
+        page.set_default_timeout(90000)
+        page.goto(mp_home_url)
+        print("Navigation complete")
+        page.wait_for_selector("a.sign-in", timeout=10000)
+        print("Sign in button found")
+        page.click("a.sign-in")
+        page.wait_for_selector("#login-modal", timeout=5000)
+        page.fill("input[type='email'][name='email']", mp_username)
+        page.fill("input[type='password'][name='pass']", mp_password)
+        page.click("#login-modal button[type='submit']")
+        print("Login submitted")
+
+        # Let the auth cookies land before we snapshot the session
+        try:
+            page.wait_for_load_state('networkidle', timeout=10000)
+        except Exception as e:
+            print(f"Network did not go idle after login: {str(e)}")
+
+        save_session(context)
+        print("Login successful, session saved!")
+    finally:
+        page.close()
+
+
+def save_session(context):
+    """Write cookies and storage_state to /tmp so later containers can restore them"""
+    cookies = context.cookies()
+    with open(COOKIES_PATH, "w") as cookie_file:
+        json.dump(cookies, cookie_file)
+
+    storage_state = context.storage_state()
+    with open(STORAGE_STATE_PATH, "w") as storage_file:
+        json.dump(storage_state, storage_file)
+
+
+def storage_state_is_valid(path=STORAGE_STATE_PATH):
+    """True when a saved storage_state exists and none of its persistent cookies have expired"""
+    if not os.path.exists(path):
+        return False
+
+    try:
+        with open(path) as storage_file:
+            storage_state = json.load(storage_file)
+    except (OSError, ValueError) as e:
+        print(f"Could not read saved session: {str(e)}")
+        return False
+
+    cookies = storage_state.get('cookies') or []
+    if not cookies:
+        return False
+
+    cutoff = time.time() + COOKIE_EXPIRY_MARGIN_SECONDS
+    for cookie in cookies:
+        expires = cookie.get('expires', -1)
+        # -1 marks a session cookie, which has no expiry of its own
+        if expires != -1 and expires < cutoff:
+            return False
+    return True
+
+
+def is_logged_in(page):
+    """Mountain Project only renders the sign-in link for anonymous visitors"""
+    return page.query_selector("a.sign-in") is None
+
+
+def _browser_is_alive():
+    browser = _session['browser']
+    return browser is not None and browser.is_connected()
+
+
+def get_context():
+    """
+    Return the warm, logged-in browser context for this container.
+
+    Reuses the existing context when the browser is still connected,
+    restores storage_state from /tmp when its cookies are still valid,
+    and only logs in from scratch when neither is available.
+    """
+    if _browser_is_alive() and _session['context'] is not None:
+        print("Reusing warm browser context")
+        return _session['context']
+
+    close_session()
+
+    if _session['playwright'] is None:
+        _session['playwright'] = sync_playwright().start()
+
+    browser = launch_browser(_session['playwright'])
+    _session['browser'] = browser
+
+    if storage_state_is_valid():
+        print("Restoring saved session from /tmp")
+        _session['context'] = browser.new_context(
+            storage_state=STORAGE_STATE_PATH)
+    else:
+        _session['context'] = browser.new_context()
+        login(_session['context'])
+
+    print("Context created successfully")
+    return _session['context']
+
+
+def ensure_logged_in(page):
+    """Log in again only when the restored session turns out to be anonymous"""
+    if is_logged_in(page):
+        return page
+
+    print("Session is not authenticated, logging in again...")
+    current_url = page.url
+    login(page.context)
+    if current_url and current_url != 'about:blank':
+        page.goto(current_url, timeout=90000)
+    return page
+
+
+def reset_session():
+    """Throw away the current browser and start a fresh logged-in context"""
+    print("Browser closed, recreating session...")
+    close_session()
+    return get_context()
+
+
+def close_session():
+    """Close the browser and context but keep Playwright running for reuse"""
+    if _session['context'] is not None:
+        try:
+            _session['context'].close()
+        except BaseException:
+            pass
+    if _session['browser'] is not None:
+        try:
+            _session['browser'].close()
+        except BaseException:
+            pass
+    _session['context'] = None
+    _session['browser'] = None
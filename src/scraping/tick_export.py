@@ -0,0 +1,132 @@
+import csv
+import io
+from datetime import datetime, timezone
+
+from src.analysis import patterns
+from src.database import queries
+from src.scraping import http_fetcher
+from src.scraping.helper_functions import parse_location, parse_route_type, sanitize_text
+
+TICK_EXPORT_URL = 'https://www.mountainproject.com/user/{user_id}/tick-export'
+DANGER_RATINGS = ['PG', 'PG13', 'R', 'X']
+
+
+def fetch_tick_export(user_id):
+    """A user's whole ticklist as CSV text in one request, or None if it can't be fetched"""
+    return http_fetcher.fetch_html(TICK_EXPORT_URL.format(user_id=user_id))
+
+
+def split_rating(rating):
+    """Split the export's combined Rating ('5.10a PG13', 'V4', '5.9 C2') the way get_grade does"""
+    grade_types = {
+        'yds_rating': None,
+        'hueco_rating': None,
+        'aid_rating': None,
+        'danger_rating': None
+    }
+    for word in (rating or '').split():
+        if word.startswith('5.'):
+            grade_types['yds_rating'] = word
+        elif word.startswith('V') and len(word) > 1 and (word[1].isdigit() or word[1] == '-'):
+            grade_types['hueco_rating'] = word
+        elif (word.startswith('A') or word.startswith('C')) and len(word) > 1 and word[1].isdigit():
+            grade_types['aid_rating'] = word
+        elif word in DANGER_RATINGS:
+            grade_types['danger_rating'] = word
+    return grade_types
+
+
+def parse_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_tick_export(csv_text, user_id):
+    """
+    Stream the tick export into the shapes insert_ticks_batch and insert_routes_batch(stub=True) take.
+    Returns (tick_data, route_stubs); route_stubs is keyed by route id.
+    """
+    tick_data = []
+    route_stubs = {}
+    insert_date = datetime.now(timezone.utc).isoformat()
+
+    for row in csv.DictReader(io.StringIO(csv_text)):
+        route_url = row.get('URL') or ''
+        if '/route/' not in route_url:
+            continue
+        route_id = route_url.split('/route/')[1].split('/')[0]
+
+        tick_type = row.get('Style') or None
+        if tick_type and row.get('Lead Style'):
+            tick_type = f"{tick_type} / {row['Lead Style']}"
+        if tick_type not in patterns.VALID_TICK_TYPES:
+            tick_type = None
+
+        tick_data.append({
+            'user_id': user_id,
+            'route_id': route_id,
+            'date': row.get('Date') or None,
+            'type': tick_type,
+            'note': (row.get('Notes') or '').strip() or None,
+            'pitches_climbed': parse_int(row.get('Pitches')),
+            'insert_date': insert_date
+        })
+
+        if route_id not in route_stubs:
+            avg_stars = row.get('Avg Stars')
+            route_stubs[route_id] = {
+                'route_id': route_id,
+                'route_name': sanitize_text(row.get('Route')),
+                'route_url': route_url,
+                **split_rating(row.get('Rating')),
+                'avg_stars': float(avg_stars) if avg_stars and float(avg_stars) >= 0 else None,
+                **parse_location(row.get('Location')),
+                'route_type': parse_route_type(row.get('Route Type'))['route_type'],
+                'length_ft': parse_int(row.get('Length')),
+                'insert_date': insert_date
+            }
+
+    return tick_data, route_stubs
+
+
+def ingest_tick_export(cursor, user_id):
+    """
+    Upsert the user's ticks from their tick export, with stub routes so every tick has a route
+    row, then delete their stored ticks the export no longer has. Raises if any row is rejected,
+    so the caller rolls back instead of committing a partial ticklist.
+    Returns {route_id: (route_name, route_link)} for routes whose details still need fetching,
+    or None if the export couldn't be downloaded. Caller commits.
+    """
+    csv_text = fetch_tick_export(user_id)
+    if csv_text is None:
+        return None
+
+    tick_data, route_stubs = parse_tick_export(csv_text, user_id)
+    print(f"Tick export has {len(tick_data)} ticks on {len(route_stubs)} routes")
+    if not tick_data:
+        # Never sync a user's ticks down to nothing from an empty download
+        print("Tick export has no ticks, treating it as unavailable")
+        return None
+
+    existing_routes = queries.check_routes_exists(cursor, route_stubs.keys())
+    missing_routes = {
+        route_id: stub for route_id, stub in route_stubs.items()
+        if int(route_id) not in existing_routes
+    }
+    stubs_inserted, failed_stubs = queries.insert_routes_batch(
+        cursor, list(missing_routes.values()), stub=True)
+    if failed_stubs:
+        raise Exception(f"Tick export rejected {len(failed_stubs)} route stubs for user {user_id}")
+
+    ticks_inserted, failed_ticks = queries.insert_ticks_batch(cursor, tick_data)
+    if failed_ticks:
+        raise Exception(f"Tick export rejected {len(failed_ticks)} ticks for user {user_id}")
+
+    # Only once every export tick is stored: ticks deleted or edited on Mountain Project go away
+    queries.delete_user_ticks_missing_from(cursor, user_id, tick_data)
+    return {
+        route_id: (stub['route_name'], stub['route_url'])
+        for route_id, stub in missing_routes.items()
+    }
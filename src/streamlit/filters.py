@@ -9,6 +9,7 @@ sys.path.append(project_root)
 
 import src.analysis.mp_racked_metrics as metrics
 from src.analysis.fa_queries import get_all_top_first_ascensionists
+from src.analysis.grades import sort_grades
 
 def commitment_grade_filter(df):
     """Commitment grade filter"""
@@ -116,16 +117,6 @@ def route_type_filter(df=None):
         key='climbing_type_filter'
     )
 
-def generate_route_type_where_clause(route_types):
-    if not route_types or 'All' in route_types:
-        return ""
-    
-    type_conditions = []
-    for route_type in route_types:
-        type_conditions.append(f"r.route_type ILIKE '%{route_type}%'")
-    
-    return f"WHERE ({' OR '.join(type_conditions)})"
-
 def route_tag_filter(df=None, conn=None, user_id=None, year_start=None, year_end=None):  
     tag_selections = {}
     tag_types = ['style', 'feature', 'descriptor', 'rock_type']
@@ -314,8 +305,7 @@ def grade_filter(conn, route_types=None, user_id=None, year_start=None, year_end
             grade_types['YDS'].append(grade)
 
     for grade_type in grade_types:
-        grade_types[grade_type] = sorted(list(set(grade_types[grade_type])), 
-                                       key=metrics.grade_sort_key)  
+        grade_types[grade_type] = sort_grades(set(grade_types[grade_type]))
     col1, col2 = st.columns([1, 3])
     with col1:
         with st.popover("Grade Filter", use_container_width=True):
@@ -335,8 +325,8 @@ def grade_filter(conn, route_types=None, user_id=None, year_start=None, year_end
                         key='min_grade'
                     )
                 with col2:
-                    max_grade_options = [g for g in grade_types[grade_system] 
-                                       if metrics.grade_sort_key(g) >= metrics.grade_sort_key(min_grade)]
+                    # Options are already sorted, so everything from min_grade on
+                    max_grade_options = grade_types[grade_system][grade_types[grade_system].index(min_grade):]
                     max_grade = st.selectbox(
                         "Maximum",
                         options=max_grade_options,
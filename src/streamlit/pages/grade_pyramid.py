@@ -4,7 +4,7 @@ import plotly.graph_objects as go
 import pandas as pd
 import os
 import sys
-from src.analysis.mp_racked_metrics import grade_sort_key
+from src.analysis.grades import sort_grades
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 sys.path.append(project_root)
@@ -307,8 +307,7 @@ all_grades = set(sends_df['grade'].tolist())
 if not falls_df.empty:
     all_grades.update(falls_df['grade'].tolist())
 
-ordered_grades = sorted(list(all_grades), 
-                       key=lambda x: grade_sort_key(x)) 
+ordered_grades = sort_grades(all_grades)
 
 fig = create_figure(sends_df, falls_df, ordered_grades)
 
@@ -26,8 +26,8 @@ conn = st.connection('postgresql', type='sql')
 
 if 'filter_expander_state' not in st.session_state:
     st.session_state.filter_expander_state = False
-if 'offset' not in st.session_state:
-    st.session_state.offset = 0
+if 'route_cursor' not in st.session_state:
+    st.session_state.route_cursor = None
 if 'all_loaded_routes' not in st.session_state:
     st.session_state.all_loaded_routes = []
 if 'jump_index' not in st.session_state:
@@ -114,7 +114,7 @@ current_filters = {
 
 
 if st.session_state.previous_filters != current_filters:
-    st.session_state.offset = 0
+    st.session_state.route_cursor = None
     st.session_state.all_loaded_routes = []
     st.session_state.previous_filters = current_filters
     st.rerun()
@@ -123,7 +123,7 @@ routes_container = st.container(height=1000, border=False)
 with routes_container:
     new_routes = metrics.get_routes_for_route_finder(
         conn,
-        offset=st.session_state.offset,
+        after=st.session_state.route_cursor,
         routes_per_page=ROUTES_PER_PAGE,
         tag_selections=tag_selections,
         route_types=route_types,
@@ -178,8 +178,9 @@ with routes_container:
 
     col1, col2, col3 = st.columns([1, 1, 1])
     with col2:
-        if st.button("Load More Routes"):
-            st.session_state.offset += ROUTES_PER_PAGE
+        if st.button("Load More Routes") and st.session_state.all_loaded_routes:
+            st.session_state.route_cursor = metrics.route_finder_cursor(
+                st.session_state.all_loaded_routes[-1])
             st.rerun()
 
 filter_container.float(
@@ -16,7 +16,7 @@ sys.path.append(project_root)
 from src.analysis.filters_ctes import available_years, get_pitch_preference_lengths
 from src.streamlit.filters import render_filters
 from src.streamlit.styles import get_spotify_style
-from src.analysis.filters_ctes import add_user_filter
+from src.analysis.filters_ctes import add_user_filter, metric_params
 from streamlit_cookies_controller import CookieController
 from streamlit_extras.stylable_container import stylable_container 
 
@@ -855,11 +855,11 @@ with tab2:
         elif period_type == 'month':
             try:
                 month_num = int(period_value)
-                period_filter = f"AND EXTRACT(MONTH FROM date) = {month_num}"
+                period_filter = "AND EXTRACT(MONTH FROM date) = :month_num"
             except (TypeError, ValueError):
                 # If it's a month name, convert it to number
                 month_num = datetime.strptime(period_value, '%B').month
-                period_filter = f"AND EXTRACT(MONTH FROM date) = {month_num}"
+                period_filter = "AND EXTRACT(MONTH FROM date) = :month_num"
 
         daily_climbs_query = f"""
         {estimated_lengths_cte}
@@ -871,12 +871,14 @@ with tab2:
         LEFT JOIN estimated_lengths el ON el.id = t.route_id
         WHERE 1=1
         {add_user_filter(user_id)}
-        AND EXTRACT(YEAR FROM date) BETWEEN {year_start} AND {year_end}
+        AND EXTRACT(YEAR FROM date) BETWEEN :year_start AND :year_end
         {period_filter}
         GROUP BY t.date
         ORDER BY t.date
         """
-        daily_climbs = conn.query(daily_climbs_query)
+        daily_climbs = conn.query(daily_climbs_query, params=metric_params(
+            user_id, year_start, year_end,
+            month_num=month_num if period_type == 'month' else None))
 
         years = list(range(year_end, year_start - 1, -1))
         latest_year = years[0]
@@ -965,7 +967,7 @@ with tab2:
                 LEFT JOIN estimated_lengths el ON el.id = t.route_id
                 WHERE 1=1
                 {add_user_filter(user_id)}
-                AND EXTRACT(YEAR FROM date) BETWEEN {year_start} AND {year_end}
+                AND EXTRACT(YEAR FROM date) BETWEEN :year_start AND :year_end
                 GROUP BY
                     EXTRACT(YEAR FROM t.date),
                         CASE
@@ -1002,7 +1004,7 @@ with tab2:
                 LEFT JOIN estimated_lengths el ON el.id = t.route_id
                 WHERE 1=1
                 {add_user_filter(user_id)}
-                AND EXTRACT(YEAR FROM date) BETWEEN {year_start} AND {year_end}
+                AND EXTRACT(YEAR FROM date) BETWEEN :year_start AND :year_end
                 GROUP BY EXTRACT(YEAR FROM t.date)
                 ORDER BY period
                 """
@@ -1019,7 +1021,7 @@ with tab2:
                 LEFT JOIN estimated_lengths el ON el.id = t.route_id
                 WHERE 1=1
                 {add_user_filter(user_id)}
-                AND EXTRACT(YEAR FROM date) = {year_start}
+                AND EXTRACT(YEAR FROM date) = :year_start
                 GROUP BY
                     EXTRACT(MONTH FROM t.date),
                     TO_CHAR(DATE_TRUNC('month', t.date), 'Month')
@@ -1027,7 +1029,7 @@ with tab2:
                     EXTRACT(MONTH FROM t.date)
                 """
         query = metrics_query
-        return conn.query(query)
+        return conn.query(query, params=metric_params(user_id, year_start, year_end))
 
     data = get_metrics_query(
         period_type,
@@ -15,8 +15,8 @@ sqs = boto3.client('sqs',
         aws_access_key_id=st.secrets["aws"]["access_key_id"],
         aws_secret_access_key=st.secrets["aws"]["secret_access_key"])
 
-def trigger_user_scrape(user_id):
-    """Send message to SQS to trigger scrape"""
+def trigger_user_scrape(user_id, action='new_user_scrape'):
+    """Send message to SQS to trigger scrape; action 'refresh_user_scrape' only fetches new ticks"""
 
     new_scrape_queue_url = st.secrets["aws"]["new_scrape_queue_url"]
 
@@ -27,7 +27,7 @@ def trigger_user_scrape(user_id):
     message = {
         'user_id': user_id,
         'source': 'streamlit_app',
-        'action': 'new_user_scrape'
+        'action': action
     }
     try:
         sqs.send_message(
@@ -86,7 +86,7 @@ def verify_user_exists(conn, user_id):
                         info_msg.empty()
                         details_msg.empty()
                         button_cols.empty()
-                        if trigger_user_scrape(user_id):
+                        if trigger_user_scrape(user_id, action='refresh_user_scrape'):
                             st.session_state.waiting_for_update = True
                             st.session_state.initial_delay = True
                             st.session_state.start_time = datetime.now()
@@ -342,9 +342,11 @@ def check_queue(queue_url, sqs):
 def check_queue_status(user_id, sqs):
     # Check queue status and look for user's job
     main_queue_url = st.secrets["aws"]["queue_url"]
+    route_queue_url = st.secrets["aws"]["route_queue_url"]
     dlq_url = st.secrets["aws"]["dlq_url"]
 
     main_visible, main_inflight = check_queue(main_queue_url, sqs)
+    route_visible, route_inflight = check_queue(route_queue_url, sqs)
     dlq_visible, dlq_inflight = check_queue(dlq_url, sqs)
     
     """
@@ -357,15 +359,17 @@ def check_queue_status(user_id, sqs):
         st.write(f"  DLQ - Visible: {dlq_visible}, In-flight: {dlq_inflight}")
     """
 
-    total_messages = main_visible + main_inflight + dlq_visible + dlq_inflight
+    total_messages = (main_visible + main_inflight + route_visible + route_inflight
+                      + dlq_visible + dlq_inflight)
 
     if total_messages == 0:
         return False, 0
     
     user_in_main = check_messages(main_queue_url, sqs, user_id)
+    user_in_routes = check_messages(route_queue_url, sqs, user_id)
     user_in_dlq = check_messages(dlq_url, sqs, user_id)
     
-    return (user_in_main or user_in_dlq or total_messages > 0), total_messages
+    return (user_in_main or user_in_routes or user_in_dlq or total_messages > 0), total_messages
 
 def verify_data_inserted(conn, user_id):
     verify_query = """
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark of the precompiled FA parser against the baseline copy in
+legacy_fa_parsing.py, checking both give identical output first.
+Run with: python src/tests/benchmarks/bench_fa_parsing.py
+"""
+import os
+import sys
+import random
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.insert(0, project_root)
+
+from src.analysis import fa_parsing
+from src.tests.benchmarks import legacy_fa_parsing
+
+SAMPLE_FA_STRINGS = [
+    'Warren Harding, Wayne Merry, George Whitmore, 1958. FFA: Lynn Hill, 1993',
+    'Royal Robbins, Mike Sherrick, Jerry Gallwas 1957',
+    'FA: Jim Bridwell and Billy Westbay, 1975',
+    'Herb and Jan Conn, 1950s',
+    'Ron Kauk, 1978',
+    'unknown',
+    'FA: John Long, Lynn Hill, Richard Harrison 5/12/79',
+    'P1: Bob Kamps 1967, P2-3: Tom Higgins and Chuck Kroger 1970',
+    'FA: Chouinard/Frost 1960. FFA: Henry Barber, summer 1973',
+    'Todd Skinner and Paul Piana, June 1988',
+    'FA: Fred Beckey & Eric Bjornstad, 9/1962; FCA unknown',
+    "John Gill early 60's",
+    'Layton Kor, Huntley Ingalls c. 1961',
+    'FA: Alex Honnold (solo) 2008',
+    'Unknown, probably 1970s',
+    'FA - Mark Hudon & Max Jones, 1978. FFA - Peter Croft et al. 1987',
+    'Dan Osman',
+    'FA: Tom Frost, Yvon Chouinard, Oct 1964',
+    'Greg Collum and friends - Spring 1985?',
+    'Lead by Bill Forrest with Kevin Donald in 1972. First free ascent by Jim Erickson, 1975',
+    'Tony Yaniro 4-20-79',
+    'fa: the Bird 63',
+    'Rich Romano, Paul Sibley, originally aided, bolted by Kris Hampton 2004',
+    'FA Sean Patrick, ca. 1999-2000',
+    '',
+    None,
+]
+NAME_POOL = [
+    'Lynn Hill', 'John Bachar', 'Peter Croft', 'Beth Rodden', 'Tommy Caldwell',
+    'Steph Davis', 'Chris Sharma', 'Kurt Smith', 'Alan Watts', 'Jim Collins',
+    'Mari Gingery', 'Catherine Destivelle', 'Hans Florine', 'Mike Graham'
+]
+CONNECTORS = [', ', ' and ', ' & ', '/', ' with ']
+PREFIXES = ['', 'FA: ', 'FA ', 'fa - ', 'FFA: ', 'P1: ', 'First ascent by ']
+SUFFIXES = ['', ' 1984', ', 1991', ' 7/14/02', ', summer 1976', " 70's", ' circa 1968', ' (solo)', '?']
+CORPUS_SIZE = 20000
+
+
+def build_corpus(size=CORPUS_SIZE, seed=42):
+    rng = random.Random(seed)
+    corpus = list(SAMPLE_FA_STRINGS)
+    while len(corpus) < size:
+        names = rng.sample(NAME_POOL, rng.randint(1, 3))
+        fa_string = rng.choice(PREFIXES) + rng.choice(CONNECTORS).join(names) + rng.choice(SUFFIXES)
+        if rng.random() < 0.2:
+            ffa_names = rng.sample(NAME_POOL, rng.randint(1, 2))
+            fa_string += '. FFA: ' + ' and '.join(ffa_names) + rng.choice(SUFFIXES)
+        corpus.append(fa_string)
+    return corpus
+
+
+def check_equivalence(corpus):
+    for fa_string in corpus:
+        expected = legacy_fa_parsing.parse_fa_data(fa_string)
+        actual = fa_parsing.parse_fa_data(fa_string)
+        assert actual == expected, f"Mismatch for {fa_string!r}: {actual} != {expected}"
+    batch = fa_parsing.parse_fa_batch(corpus)
+    assert batch == [legacy_fa_parsing.parse_fa_data(s) for s in corpus]
+
+
+def time_it(label, fn, corpus):
+    start = time.perf_counter()
+    fn(corpus)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<38}{elapsed * 1000:>10.1f} ms{len(corpus) / elapsed:>12.0f} strings/s")
+    return elapsed
+
+
+def main():
+    corpus = build_corpus()
+    check_equivalence(corpus)
+    print(f"Outputs identical on {len(corpus)} FA strings\n")
+
+    fa_parsing.clean_name.cache_clear()
+    legacy = time_it('legacy parse_fa_data loop', lambda c: [legacy_fa_parsing.parse_fa_data(s) for s in c], corpus)
+    fa_parsing.clean_name.cache_clear()
+    compiled = time_it('compiled parse_fa_data loop', lambda c: [fa_parsing.parse_fa_data(s) for s in c], corpus)
+    fa_parsing.clean_name.cache_clear()
+    batch = time_it('parse_fa_batch', fa_parsing.parse_fa_batch, corpus)
+    print(f"\nspeedup: {legacy / compiled:.1f}x per call, {legacy / batch:.1f}x batched")
+
+
+if __name__ == '__main__':
+    main()
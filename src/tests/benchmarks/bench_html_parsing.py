@@ -0,0 +1,59 @@
+"""
+Compare the old full-document html.parser soup against the scoped lxml soup
+on the saved fixtures. Run with: python src/tests/benchmarks/bench_html_parsing.py
+"""
+import os
+import sys
+import timeit
+from bs4 import BeautifulSoup
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.insert(0, project_root)
+
+from src.scraping.html_parsing import make_route_soup, make_tick_soup
+from src.scraping.helper_functions import parse_route_data, parse_route_comments_data, parse_tick_details
+
+FIXTURES_DIR = os.path.join(project_root, 'src', 'tests', 'fixtures')
+ROUTE_FIXTURES = [
+    'route_trad_multipitch.html',
+    'route_boulder.html',
+    'route_sport_no_comments.html'
+]
+RUNS = 20
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as fixture:
+        return fixture.read()
+
+
+def parse_route(soup):
+    parse_route_data(soup, '1', 'Route', 'https://www.mountainproject.com/route/1/x')
+    parse_route_comments_data(soup, '1')
+
+
+def parse_ticks(soup):
+    tick_table = soup.find('table', class_='table route-table hidden-xs-down')
+    tick_rows = tick_table.find_all('tr', class_='route-row')
+    for row in tick_rows[1::2]:
+        parse_tick_details(row.find('td', class_='text-warm small pt-0'), {'route_id': '1'}, 'user')
+
+
+def time_ms(fn):
+    return min(timeit.repeat(fn, number=1, repeat=RUNS)) * 1000
+
+
+def main():
+    cases = [(name, make_route_soup, parse_route) for name in ROUTE_FIXTURES]
+    cases.append(('ticks_page.html', make_tick_soup, parse_ticks))
+
+    print(f"{'fixture':<32}{'KB':>6}{'html.parser ms':>16}{'scoped lxml ms':>16}{'speedup':>9}")
+    for name, make_soup, parse in cases:
+        html = load_fixture(name)
+        old_ms = time_ms(lambda: parse(BeautifulSoup(html, 'html.parser')))
+        new_ms = time_ms(lambda: parse(make_soup(html)))
+        print(f"{name:<32}{len(html) / 1024:>6.0f}{old_ms:>16.2f}{new_ms:>16.2f}{old_ms / new_ms:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
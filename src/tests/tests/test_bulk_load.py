@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sys
+from datetime import datetime
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.insert(0, project_root)
+
+from array import array
+from src.database.queries import (
+    add_route_id, coerce_rows, dedupe_rows, format_copy_value, hash_text, route_id_known,
+    run_bulk_load, COMMENT_COLUMN_DEFS, TICK_COLUMN_DEFS)
+
+
+def test_format_copy_value_escapes_copy_text_format():
+    assert format_copy_value(None) == '\\N'
+    assert format_copy_value('a\tb\nc\\d') == 'a\\tb\\nc\\\\d'
+    assert format_copy_value(12) == '12'
+
+
+def test_coerce_rows_rejects_bad_rows_individually():
+    ticks = [
+        {'user_id': '1', 'route_id': '105', 'date': 'Oct 12, 2024', 'type': 'Lead',
+         'note': None, 'pitches_climbed': None, 'insert_date': '2024-10-13T00:00:00+00:00'},
+        {'user_id': '1', 'route_id': 'abc', 'date': 'Oct 12, 2024', 'type': '',
+         'note': 'x', 'pitches_climbed': 2, 'insert_date': None},
+        {'user_id': '1', 'route_id': None, 'date': None, 'type': '',
+         'note': None, 'pitches_climbed': None, 'insert_date': None},
+    ]
+    valid, failed = coerce_rows(
+        ticks, TICK_COLUMN_DEFS, {'user_id', 'route_id'},
+        lambda tick, error: {'route_id': tick['route_id'], 'error': error})
+
+    assert len(valid) == 1
+    assert valid[0][0] == 0
+    assert valid[0][2] == 105
+    assert valid[0][3] == datetime(2024, 10, 12)
+    assert [f['route_id'] for f in failed] == ['abc', None]
+
+
+def test_hash_text_matches_pgcrypto_digest():
+    # SELECT encode(digest('Great route!', 'sha256'), 'hex')
+    assert hash_text('Great route!') == hashlib.sha256(b'Great route!').hexdigest()
+    assert hash_text('') == 'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855'
+    assert hash_text(None) is None
+
+
+def test_dedupe_rows_skips_batch_duplicates():
+    rows = [
+        [0, 105, 'a', 'h1', None],
+        [1, 105, 'a', 'h1', None],
+        [2, 106, 'b', 'h2', None],
+        [3, 107, 'c', 'h3', None],
+    ]
+    unique, keys = dedupe_rows(
+        rows, COMMENT_COLUMN_DEFS, ['route_id', 'comment_hash'])
+
+    assert [row[0] for row in unique] == [0, 2, 3]
+    assert keys == {(105, 'h1'), (106, 'h2'), (107, 'h3')}
+
+
+def test_route_id_array_membership_and_insert():
+    route_ids = array('I', [105717310, 105748657, 106997654])
+    assert route_id_known(route_ids, '105748657')
+    assert not route_id_known(route_ids, 105748658)
+    add_route_id(route_ids, '105748658')
+    add_route_id(route_ids, 105748658)
+    add_route_id(route_ids, 100)
+    assert list(route_ids) == [100, 105717310, 105748657, 105748658, 106997654]
+
+
+class MergeCursor:
+    """Stages COPYed rows and fails the merge whenever a staged comment is 'bad'"""
+
+    def __init__(self):
+        self.staged = []
+        self.merged = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        if sql.startswith('TRUNCATE'):
+            self.staged = []
+        elif sql.strip().startswith('INSERT'):
+            if any(row[2] == 'bad' for row in self.staged):
+                raise ValueError('check constraint violated')
+            self.merged.extend(self.staged)
+            self.rowcount = len(self.staged)
+
+    def copy_expert(self, sql, buffer):
+        self.staged = [line.split('\t') for line in buffer.read().splitlines()]
+        self.rowcount = len(self.staged)
+
+
+def test_run_bulk_load_rejects_only_failing_rows():
+    comments = [{'route_id': 105, 'comment': text, 'comment_hash': text, 'insert_date': None}
+                for text in ['a', 'bad', 'c', 'd', 'bad', 'f', 'g']]
+    cursor = MergeCursor()
+    inserted_count, failed = run_bulk_load(
+        cursor, 'comments', comments, COMMENT_COLUMN_DEFS,
+        required={'route_id', 'comment'},
+        describe_failure=lambda comment, error: {'comment': comment['comment'], 'error': error},
+        staging_table='comments_staging',
+        merge_sql='INSERT INTO routes.RouteComments SELECT * FROM comments_staging',
+        key_columns=['route_id', 'comment_hash'])
+
+    assert inserted_count == 5
+    assert [row[2] for row in cursor.merged] == ['a', 'c', 'd', 'f', 'g']
+    assert failed == [{'comment': 'bad', 'error': 'check constraint violated'}]
@@ -0,0 +1,31 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.insert(0, project_root)
+
+from src.analysis.fa_parsing import parse_fa_data, parse_fa_batch
+from src.tests.benchmarks import legacy_fa_parsing
+from src.tests.benchmarks.bench_fa_parsing import build_corpus
+
+
+def test_parse_fa_data_matches_legacy_parser():
+    for fa_string in build_corpus(size=2000):
+        assert parse_fa_data(fa_string) == legacy_fa_parsing.parse_fa_data(fa_string)
+
+
+def test_parse_fa_batch():
+    fa_strings = [
+        'Warren Harding, Wayne Merry, George Whitmore, 1958. FFA: Lynn Hill, 1993',
+        None,
+        'Ron Kauk, 1978',
+        'Ron Kauk, 1978'
+    ]
+    results = parse_fa_batch(fa_strings)
+
+    assert len(results) == 4
+    assert results[1] == []
+    assert {'name': 'Lynn Hill', 'type': 'FFA', 'year': '1993'} in results[0]
+    assert results[2] == [{'name': 'Ron Kauk', 'type': 'FA', 'year': '1978'}]
+    # Duplicates get their own dicts so callers can mutate them safely
+    assert results[2] == results[3] and results[2][0] is not results[3][0]
@@ -0,0 +1,50 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.insert(0, project_root)
+
+import pandas as pd
+from src.analysis.grades import (get_grade_group, grade_sort_key, grade_sort_value, group_grades,
+                                 route_grade_columns, sort_grades)
+
+
+def test_grade_sort_value_matches_grade_sort_key_order():
+    grades = ['5.6', '5.9', '5.9+', '5.10-', '5.10a', '5.10a/b', '5.10', '5.10d', '5.11+',
+              'V-easy', 'V0', 'V0-1', 'V1-', 'V1+', 'V10', 'C1', 'C3+', 'A0', 'A2-', 'A5']
+    assert sorted(grades, key=grade_sort_key) == sorted(grades, key=grade_sort_value)
+
+
+def test_route_grade_columns():
+    columns = route_grade_columns({
+        'route_type': 'Trad, Aid',
+        'yds_rating': '5.9',
+        'aid_rating': 'A2+'
+    })
+    assert columns['primary_type'] == 'Aid'
+    assert columns['is_trad'] and columns['is_aid'] and not columns['is_tr']
+    assert columns['route_grade'] == 'A2+'
+
+    columns = route_grade_columns({'route_type': 'Sport, TR', 'yds_rating': '5.11c'})
+    assert columns['primary_type'] == 'Sport'
+    assert columns['is_tr']
+    assert columns['grade_group_base'] == '5.11'
+    assert columns['grade_group_granular'] == '5.11+'
+
+
+def test_route_grade_columns_unparseable():
+    columns = route_grade_columns({'route_type': None, 'yds_rating': '5.'})
+    assert columns['primary_type'] == 'Other'
+    assert columns['grade_sort_value'] is None
+    assert columns['grade_group_base'] is None
+
+
+def test_group_grades_matches_get_grade_group():
+    grades = pd.Series(['5.10a', '5.9+', 'V3', 'A2', '5.12', '5.13c/d', 'Easy 5th'])
+    for level in ['base', 'granular']:
+        assert group_grades(grades, level).tolist() == [get_grade_group(grade, level) for grade in grades]
+
+
+def test_sort_grades():
+    grades = ['5.11a', 'V2', '5.9', 'A1', '5.10', 'V-easy']
+    assert sort_grades(grades) == sorted(grades, key=grade_sort_key)
@@ -0,0 +1,86 @@
+import os
+import sys
+import pytest
+from bs4 import BeautifulSoup
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.insert(0, project_root)
+
+from src.scraping.html_parsing import make_route_soup, make_tick_soup
+from src.scraping.helper_functions import (parse_route_data, parse_route_comments_data, parse_tick_details,
+                                           parse_tick_rows, tick_key)
+
+FIXTURES_DIR = os.path.join(project_root, 'src', 'tests', 'fixtures')
+ROUTE_FIXTURES = [
+    'route_trad_multipitch.html',
+    'route_boulder.html',
+    'route_sport_no_comments.html'
+]
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as fixture:
+        return fixture.read()
+
+
+def without_insert_date(rows):
+    return [{k: v for k, v in row.items() if k != 'insert_date'} for row in rows]
+
+
+@pytest.mark.parametrize('fixture_name', ROUTE_FIXTURES)
+def test_route_parsing_matches_full_parse(fixture_name):
+    html = load_fixture(fixture_name)
+    full_soup = BeautifulSoup(html, 'html.parser')
+    scoped_soup = make_route_soup(html)
+    link = 'https://www.mountainproject.com/route/105924807/the-nose'
+
+    expected = parse_route_data(full_soup, '105924807', 'Route', link)
+    actual = parse_route_data(scoped_soup, '105924807', 'Route', link)
+    assert without_insert_date([actual]) == without_insert_date([expected])
+
+    expected_comments = parse_route_comments_data(full_soup, '105924807')
+    actual_comments = parse_route_comments_data(scoped_soup, '105924807')
+    assert without_insert_date(actual_comments) == without_insert_date(expected_comments)
+    assert full_soup.select_one('h1').text.strip() == scoped_soup.select_one('h1').text.strip()
+
+
+def test_route_fixture_fields():
+    route_soup = make_route_soup(load_fixture('route_trad_multipitch.html'))
+    route = parse_route_data(route_soup, '105924807', 'The Nose', 'link')
+
+    assert route['yds_rating'] == '5.9'
+    assert route['aid_rating'] == 'C2'
+    assert route['danger_rating'] == 'PG13'
+    assert route['num_votes'] == 2873
+    assert route['pitches'] == 31
+    assert route['commitment_grade'] == 'VI'
+    assert route['main_area'] == 'Yosemite National Park'
+    assert len(parse_route_comments_data(route_soup, '105924807')) == 45
+
+
+def test_tick_parsing_matches_full_parse():
+    html = load_fixture('ticks_page.html')
+    current_route_data = {'route_id': '105700000'}
+
+    def parse_ticks(soup):
+        tick_table = soup.find('table', class_='table route-table hidden-xs-down')
+        tick_rows = tick_table.find_all('tr', class_='route-row')
+        details = [row.find('td', class_='text-warm small pt-0') for row in tick_rows[1::2]]
+        return [parse_tick_details(d, current_route_data, 'user') for d in details]
+
+    expected = parse_ticks(BeautifulSoup(html, 'html.parser'))
+    actual = parse_ticks(make_tick_soup(html))
+    assert len(actual) == 50
+    assert without_insert_date(actual) == without_insert_date(expected)
+
+
+def test_tick_keys_from_tick_rows():
+    route_ids_to_check, tick_details_map = parse_tick_rows(make_tick_soup(load_fixture('ticks_page.html')))
+    keys = [
+        tick_key(parse_tick_details(details, {'route_id': route_id}, 'user'))
+        for route_id, details_list in tick_details_map.items()
+        for details in details_list
+    ]
+    assert set(tick_details_map) == set(route_ids_to_check)
+    assert len(keys) == 50
+    assert all(isinstance(key[0], int) and len(key[3]) == 64 for key in keys)
@@ -0,0 +1,26 @@
+import json
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.insert(0, project_root)
+
+from src.scraping.route_queue import ROUTE_BATCH_SIZE, route_batch_messages
+
+
+def test_route_batch_messages_split_routes_into_batches():
+    routes_to_fetch = {
+        str(route_id): (f"Route {route_id}", f"https://www.mountainproject.com/route/{route_id}")
+        for route_id in range(ROUTE_BATCH_SIZE * 2 + 3)
+    }
+    messages = route_batch_messages('user', routes_to_fetch)
+
+    assert [message['Id'] for message in messages] == ['1', '2', '3']
+    bodies = [json.loads(message['MessageBody']) for message in messages]
+    assert [len(body['routes']) for body in bodies] == [ROUTE_BATCH_SIZE, ROUTE_BATCH_SIZE, 3]
+    assert bodies[0]['user_id'] == 'user'
+    assert bodies[0]['routes'][0] == ['0', 'Route 0', 'https://www.mountainproject.com/route/0']
+
+
+def test_route_batch_messages_empty():
+    assert route_batch_messages('user', {}) == []
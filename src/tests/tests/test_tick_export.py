@@ -0,0 +1,103 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.insert(0, project_root)
+
+from src.database import queries
+from src.scraping import tick_export
+from src.scraping.helper_functions import parse_tick_details, parse_tick_rows
+from src.scraping.html_parsing import make_tick_soup
+from src.scraping.tick_export import parse_tick_export, split_rating
+
+FIXTURES_DIR = os.path.join(project_root, 'src', 'tests', 'fixtures')
+
+
+def load_export(name='tick_export.csv'):
+    with open(os.path.join(FIXTURES_DIR, name)) as fixture:
+        return fixture.read()
+
+
+class TicksTable:
+    """routes.Ticks keyed by its unique constraint, for the queries ingest_tick_export runs"""
+
+    def __init__(self):
+        self.rows = {}
+
+    @staticmethod
+    def key(tick):
+        valid, _ = queries.coerce_rows([tick], queries.TICK_COLUMN_DEFS, {'user_id', 'route_id'}, None)
+        (key,) = queries.dedupe_rows(
+            valid, queries.TICK_COLUMN_DEFS, ['user_id', 'route_id', 'date', 'type', 'note_hash'])[1]
+        return key
+
+    def insert_ticks_batch(self, cursor, tick_data, **kwargs):
+        for tick in tick_data:
+            tick.update(type=tick['type'] or '', note_hash=queries.hash_text(tick.get('note') or ''))
+            self.rows.setdefault(self.key(tick), dict(tick))
+        return len(tick_data), []
+
+    def delete_user_ticks_missing_from(self, cursor, user_id, tick_data):
+        keys = {self.key(tick) for tick in tick_data}
+        self.rows = {key: tick for key, tick in self.rows.items()
+                     if tick['user_id'] != user_id or key in keys}
+
+
+def test_parse_tick_export_ticks():
+    tick_data, route_stubs = parse_tick_export(load_export(), 'user')
+
+    assert len(tick_data) == 5
+    assert [tick['route_id'] for tick in tick_data[:2]] == ['105748490', '105748490']
+    assert tick_data[0]['type'] == 'Lead / Onsight'
+    assert tick_data[0]['note'] == 'Classic, crowded by 9am.'
+    assert tick_data[1]['type'] == 'Follow'
+    assert tick_data[1]['note'] is None
+    assert tick_data[2]['type'] is None  # boulder 'Send' isn't a tick type the HTML parser keeps
+    assert tick_data[3]['type'] == 'Lead / Fell/Hung'
+    assert tick_data[3]['pitches_climbed'] == 31
+
+
+def test_parse_tick_export_route_stubs():
+    tick_data, route_stubs = parse_tick_export(load_export(), 'user')
+
+    assert list(route_stubs) == ['105748490', '105717367', '105924807', '105749188']
+    nose = route_stubs['105924807']
+    assert nose['route_name'] == 'The Nose'
+    assert nose['yds_rating'] == '5.9' and nose['aid_rating'] == 'C2'
+    assert nose['route_type'] == 'Trad, Aid'
+    assert nose['length_ft'] == 2900
+    assert nose['main_area'] == 'Yosemite National Park'
+    assert nose['specific_location'] == 'Valley North Side > El Capitan'
+    assert route_stubs['105749188']['avg_stars'] is None
+    assert route_stubs['105717367']['hueco_rating'] == 'V8'
+
+
+def test_split_rating():
+    assert split_rating('5.12a R') == {
+        'yds_rating': '5.12a', 'hueco_rating': None, 'aid_rating': None, 'danger_rating': 'R'}
+    assert split_rating(None)['yds_rating'] is None
+
+
+def test_export_and_ticks_page_store_the_same_tick_once(monkeypatch):
+    table = TicksTable()
+    monkeypatch.setattr(queries, 'insert_ticks_batch', table.insert_ticks_batch)
+    monkeypatch.setattr(queries, 'delete_user_ticks_missing_from', table.delete_user_ticks_missing_from)
+    monkeypatch.setattr(queries, 'check_routes_exists', lambda cursor, route_ids: set())
+    monkeypatch.setattr(queries, 'insert_routes_batch', lambda cursor, routes_data, **kwargs: (0, []))
+    monkeypatch.setattr(tick_export, 'fetch_tick_export',
+                        lambda user_id: load_export('tick_export_ticks_page.csv'))
+
+    route_ids_to_check, tick_details_map = parse_tick_rows(make_tick_soup(load_export('ticks_page.html')))
+    page_tick = parse_tick_details(tick_details_map['105700074'][0], {'route_id': '105700074'}, 'user')
+    assert page_tick['note'] == 'Layback talus haul talus talus corner fist.'
+    (export_tick,), _ = parse_tick_export(load_export('tick_export_ticks_page.csv'), 'user')
+    for tick in (page_tick, export_tick):
+        tick.update(type=tick['type'] or '', note_hash=queries.hash_text(tick.get('note') or ''))
+    assert TicksTable.key(page_tick) == TicksTable.key(export_tick)
+    deleted_tick = parse_tick_details(tick_details_map['105700111'][0], {'route_id': '105700111'}, 'user')
+    table.insert_ticks_batch(None, [page_tick, deleted_tick])
+
+    tick_export.ingest_tick_export(None, 'user')
+
+    # The export's copy of the page tick is the same row; ticks no longer in the export are gone
+    assert [tick['route_id'] for tick in table.rows.values()] == ['105700074']